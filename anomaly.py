@@ -0,0 +1,129 @@
+"""
+Rilevamento vettoriale (NumPy) di anomalie di latenza su tutta la flotta.
+
+A ogni ciclo, per gli host con una nuova misura di RTT:
+  - baseline EWMA di media e varianza per host (alpha MP_ANOMALY_ALPHA, default 0.1)
+  - z-score della misura rispetto alla baseline; outlier se z > MP_ANOMALY_Z (default 4) dopo
+    MP_ANOMALY_WARMUP misure (default 10). La deviazione standard ha un minimo di
+    MP_ANOMALY_MIN_STD_MS (default 2 ms), così le linee molto stabili non diventano outlier
+    per variazioni di pochi decimi di millisecondo
+  - spostamento correlato di un gruppo (connection_group, es. tutte le linee 'EOLO - ...'):
+    almeno MP_ANOMALY_GROUP_MIN outlier (default 5) e almeno MP_ANOMALY_GROUP_FRACTION
+    (default 0.3) degli host misurati del gruppo. Indica tipicamente un problema lato carrier
+
+Ogni ciclo produce al più un evento di anomalia, con tutti i gruppi coinvolti; un gruppo già
+segnalato non viene segnalato di nuovo per MP_ANOMALY_COOLDOWN secondi (default 3600).
+Tutte le operazioni per ciclo sono su array: nessun loop Python per host (solo quando cambia
+l'elenco degli host si riallineano le baseline).
+"""
+import os
+import numpy as np
+
+
+class LatencyDetector:
+    def __init__(self, alpha=None, z_threshold=None, warmup=None, min_std=None,
+                 group_min=None, group_fraction=None, cooldown=None):
+        env = os.environ.get
+        self.alpha = float(alpha if alpha is not None else env('MP_ANOMALY_ALPHA', 0.1))
+        self.z_threshold = float(z_threshold if z_threshold is not None else env('MP_ANOMALY_Z', 4))
+        self.warmup = int(warmup if warmup is not None else env('MP_ANOMALY_WARMUP', 10))
+        self.min_std = float(min_std if min_std is not None else env('MP_ANOMALY_MIN_STD_MS', 2))
+        self.group_min = int(group_min if group_min is not None else env('MP_ANOMALY_GROUP_MIN', 5))
+        self.group_fraction = float(group_fraction if group_fraction is not None
+                                    else env('MP_ANOMALY_GROUP_FRACTION', 0.3))
+        self.cooldown = float(cooldown if cooldown is not None else env('MP_ANOMALY_COOLDOWN', 3600))
+        self.ips = []
+        self.mean = np.zeros(0)
+        self.var = np.zeros(0)
+        self.count = np.zeros(0, dtype=np.int32)
+        self.group_idx = np.zeros(0, dtype=np.int32)   # -1 = nessun gruppo
+        self.group_names = []
+        self.last_alert = {}    # gruppo -> istante dell'ultima segnalazione
+
+    def _realign(self, ips, groups):
+        """Riporta le baseline sulle righe del nuovo elenco di host (host nuovi senza baseline)."""
+        old = {ip: i for i, ip in enumerate(self.ips)}
+        n = len(ips)
+        src = np.fromiter((old.get(ip, -1) for ip in ips), dtype=np.int64, count=n)
+        keep = src >= 0
+        mean, var, count = np.zeros(n), np.zeros(n), np.zeros(n, dtype=np.int32)
+        mean[keep] = self.mean[src[keep]]
+        var[keep] = self.var[src[keep]]
+        count[keep] = self.count[src[keep]]
+        self.mean, self.var, self.count = mean, var, count
+
+        names = {}
+        labels = [groups.get(ip) or '' for ip in ips]
+        self.group_idx = np.fromiter((names.setdefault(g, len(names)) if g else -1 for g in labels),
+                                     dtype=np.int32, count=n)
+        self.group_names = list(names)
+        self.ips = list(ips)
+
+    def update(self, ips, rtt, fresh, now, groups=None):
+        """Aggiorna le baseline con le misure del ciclo e restituisce l'evento di anomalia (dict) o None.
+
+        ips: elenco host (righe); rtt: RTT in ms per riga (NaN = nessuna risposta);
+        fresh: maschera booleana delle righe misurate in questo ciclo; groups: callable che
+        restituisce {ip: gruppo}, invocato solo se l'elenco degli host è cambiato.
+        """
+        if ips != self.ips:
+            self._realign(ips, groups() if groups else {})
+        x = np.asarray(rtt, dtype=np.float64)
+        valid = np.asarray(fresh, dtype=bool) & ~np.isnan(x)
+        if not valid.any():
+            return None
+
+        warm = valid & (self.count >= self.warmup)
+        dev = np.where(valid, x - self.mean, 0.0)
+        std = np.maximum(np.sqrt(self.var), self.min_std)
+        z = dev / std
+        outlier = warm & (z > self.z_threshold)
+
+        baseline = self.mean.copy()
+        # prima misura: la baseline parte dal valore osservato
+        first = valid & (self.count == 0)
+        self.mean[first] = x[first]
+        upd = valid & ~first
+        a = self.alpha
+        self.mean[upd] += a * dev[upd]
+        self.var[upd] = (1 - a) * (self.var[upd] + a * dev[upd] ** 2)
+        self.count[valid] += 1
+
+        n_out = int(outlier.sum())
+        if not n_out:
+            return None
+
+        groups_out = []
+        if self.group_names:
+            g = self.group_idx
+            measured = np.bincount(g[warm & (g >= 0)], minlength=len(self.group_names))
+            shifted = np.bincount(g[outlier & (g >= 0)], minlength=len(self.group_names))
+            fraction = np.divide(shifted, measured, out=np.zeros(len(measured)), where=measured > 0)
+            flagged = np.nonzero((shifted >= self.group_min) & (fraction >= self.group_fraction))[0]
+            for gi in flagged:
+                name = self.group_names[gi]
+                if now - self.last_alert.get(name, float('-inf')) < self.cooldown:
+                    continue
+                self.last_alert[name] = now
+                rows = outlier & (g == gi)
+                groups_out.append({
+                    'group': name,
+                    'hosts': int(measured[gi]),
+                    'outliers': int(shifted[gi]),
+                    'fraction': round(float(fraction[gi]), 2),
+                    'median_z': round(float(np.median(z[rows])), 1),
+                    'rtt_now_ms': round(float(np.median(x[rows])), 1),
+                    'rtt_baseline_ms': round(float(np.median(baseline[rows])), 1),
+                })
+        if not groups_out:
+            return None
+        rows = np.nonzero(outlier)[0]
+        top = rows[np.argsort(-z[rows])[:20]]
+        return {
+            'type': 'anomaly',
+            'ts': round(now, 3),
+            'outliers': n_out,
+            'groups': groups_out,
+            'top_hosts': [{'ip': self.ips[i], 'rtt_ms': round(float(x[i]), 1), 'z': round(float(z[i]), 1)}
+                          for i in top],
+        }
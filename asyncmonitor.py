@@ -0,0 +1,72 @@
+"""
+Interfaccia asyncio del monitor, per chi incorpora Monitor in un'applicazione asincrona.
+
+I probe restano quelli di Monitor.iter_results() e girano in un thread; ogni risultato arriva
+all'event loop appena terminano i probe del suo host:
+
+    am = AsyncMonitor(monitor)
+    async with aclosing(am.results(deadline=30)) as results:
+        async for r in results:
+            if r['status'] != r['prev']:
+                ...
+
+Cancellare il task che itera (o chiudere il generatore) interrompe il ciclo: i probe ancora in
+coda non partono, quelli in corso finiscono da soli entro il loro timeout e gli host non sondati
+restano dovuti al ciclo successivo. Il generatore termina dopo la chiusura del ciclo (prossimo
+probe ed evento 'cycle' già registrati).
+"""
+import asyncio
+from threading import Event, Thread
+from monitor import Monitor
+
+
+class AsyncMonitor:
+    def __init__(self, monitor=None, **kwargs):
+        self.monitor = monitor if monitor is not None else Monitor(**kwargs)
+
+    async def results(self, conns=None, due=False, deadline=None):
+        """Risultati di un ciclo (vedi Monitor.iter_results) man mano che arrivano.
+        due=True sonda solo le connessioni il cui probe è scaduto (come ping_due)."""
+        loop = asyncio.get_running_loop()
+        items = asyncio.Queue()
+        cancel = Event()
+        ended = False
+
+        def post(kind, value=None):
+            try:
+                loop.call_soon_threadsafe(items.put_nowait, (kind, value))
+            except RuntimeError:
+                cancel.set()        # event loop chiuso: nessuno legge più i risultati
+
+        def produce():
+            try:
+                targets = self.monitor.due_connections() if due else conns
+                for result in self.monitor.iter_results(targets, deadline=deadline, cancel=cancel):
+                    post('result', result)
+            except Exception as e:
+                post('error', e)
+            finally:
+                post('end')
+
+        Thread(target=produce, name='mp_ping-async', daemon=True).start()
+        try:
+            while True:
+                kind, value = await items.get()
+                if kind == 'end':
+                    ended = True
+                    return
+                if kind == 'error':
+                    raise value
+                yield value
+        finally:
+            cancel.set()
+            if not ended:
+                # attende la chiusura del ciclo nel thread; i risultati arrivati nel frattempo sono scartati
+                while (await items.get())[0] != 'end':
+                    pass
+
+    async def ping_all(self, deadline=None):
+        return [r async for r in self.results(deadline=deadline)]
+
+    async def ping_due(self, deadline=None):
+        return [r async for r in self.results(due=True, deadline=deadline)]
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Benchmark del tempo per ciclo dell'analisi di latenza (LatencyDetector) sull'intera flotta.
+
+Uso: python benchmarks/bench_anomaly.py [N_HOST] [CICLI]
+"""
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from anomaly import LatencyDetector  # noqa: E402
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    cycles = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    ips = [f'10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}' for i in range(n)]
+    groups = {ip: ('EOLO', 'TIM', 'FASTWEB', 'VODAFONE')[i % 4] for i, ip in enumerate(ips)}
+    rng = np.random.default_rng(1)
+    base = rng.uniform(5, 60, n).astype(np.float32)
+    fresh = np.ones(n, dtype=bool)
+    detector = LatencyDetector()
+    detector.update(ips, base, fresh, 0.0, groups=lambda: groups)   # allineamento iniziale, escluso
+
+    times = []
+    events = 0
+    for c in range(cycles):
+        rtt = base + rng.normal(0, 1, n).astype(np.float32)
+        rtt[rng.random(n) < 0.01] = np.nan                          # 1% senza risposta
+        if c == cycles - 1:
+            rtt[::4] += 80                                          # spostamento di tutto il gruppo EOLO
+        start = time.perf_counter()
+        event = detector.update(ips, rtt, fresh, float(c))
+        times.append(time.perf_counter() - start)
+        events += event is not None
+    times = np.array(times[10:]) * 1000
+    print(f'host: {n}, cicli: {cycles}')
+    print(f'tempo per ciclo: media {times.mean():.2f} ms | p95 {np.percentile(times, 95):.2f} ms | max {times.max():.2f} ms')
+    print(f'eventi di anomalia: {events}')
+
+
+if __name__ == '__main__':
+    main()
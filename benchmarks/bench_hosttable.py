@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Benchmark memoria dello stato runtime per host: rappresentazione a dict (last_status,
+down_times, metriche per host) contro HostTable (array paralleli).
+
+Uso: python benchmarks/bench_hosttable.py [N_HOST]
+"""
+import os
+import sys
+import gc
+import tracemalloc
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from hosttable import HostTable, to_epoch  # noqa: E402
+
+TZ = ZoneInfo('Europe/Rome')
+
+
+def make_ips(n):
+    return [f'10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}' for i in range(n)]
+
+
+def stats(i):
+    return {'sent': 5, 'received': 5, 'loss': 0.0, 'rtt_min': 10.0 + i % 7, 'rtt_avg': 12.5 + i % 7,
+            'rtt_max': 15.0 + i % 7, 'jitter': 1.25}
+
+
+def build_dicts(ips):
+    last_status = {ip: 'UP' for ip in ips}
+    down_times = {ip: datetime.now(TZ) for ip in ips[::10]}
+    metrics = {ip: stats(i) for i, ip in enumerate(ips)}
+    return last_status, down_times, metrics
+
+
+def build_table(ips):
+    table = HostTable()
+    for i, ip in enumerate(ips):
+        table.set_state(ip, 'UP')
+        table.set_metrics(ip, stats(i))
+    for ip in ips[::10]:
+        table.down_since[table.row(ip)] = to_epoch(datetime.now(TZ).timestamp())
+    return table
+
+
+def measure(builder, ips):
+    gc.collect()
+    tracemalloc.start()
+    obj = builder(ips)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del obj
+    return current
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    ips = make_ips(n)   # le stringhe IP sono condivise con le connessioni: escluse dalla misura
+    legacy = measure(build_dicts, ips)
+    compact = measure(build_table, ips)
+    print(f'host: {n}')
+    print(f'dict:      {legacy / 1e6:8.2f} MB  ({legacy / n:6.1f} byte/host)')
+    print(f'HostTable: {compact / 1e6:8.2f} MB  ({compact / n:6.1f} byte/host)')
+    print(f'riduzione: {legacy / compact:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
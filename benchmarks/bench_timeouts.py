@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Confronto tra timeout fisso e timeout adattivi per host (rto.py) sulla simulazione in tempo
+virtuale: flotta mista LAN / DSL / satellite con perdita casuale degli echo e disservizi.
+Per ciascuna variante stampa durata stimata dei cicli, tempo di rilevamento e DOWN senza
+disservizio.
+
+Uso: python benchmarks/bench_timeouts.py [N_HOST] [GIORNI] [PERDITA_%]
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from simulate import Scenario, Simulation  # noqa: E402
+
+# (quota, RTT in secondi): LAN, DSL/FWA, satellite
+RTT_MIX = [(0.6, 0.002), (0.3, 0.040), (0.1, 0.600)]
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    days = float(sys.argv[2]) if len(sys.argv) > 2 else 2.0
+    loss = float(sys.argv[3]) / 100.0 if len(sys.argv) > 3 else 0.01
+    os.environ.setdefault('MP_FEED_SOCKET', '')
+    os.environ.setdefault('MP_SHM_PATH', '')
+    os.environ.setdefault('MP_MAINTENANCE_FILE', '')
+    print(f'host: {n}, giorni: {days}, perdita: {loss:.1%}, mix RTT: '
+          + ', '.join(f'{share:.0%} {rtt * 1000:g} ms' for share, rtt in RTT_MIX))
+    for adaptive in (False, True):
+        scenario = Scenario.generate(n, days, outages_per_day=0.2, mean_outage=1800.0, seed=1,
+                                     rtt_mix=RTT_MIX, loss=loss, jitter=0.3)
+        sim = Simulation(scenario, interval=900, adaptive=adaptive, seed=1)
+        try:
+            result = sim.run()
+        finally:
+            sim.close()
+        probing = result['probing']
+        detect = [st['detect'] for st in result['latency'].values() if st.get('detect')]
+        count = sum(st['count'] for st in detect)
+        avg = sum(st['avg'] * st['count'] for st in detect) / count if count else 0.0
+        print(f"timeout {'adattivo' if adaptive else 'fisso   '}: ciclo media {probing['cycle_s']['avg']:.2f}s "
+              f"p95 {probing['cycle_s']['p95']:.2f}s | rilevamento medio {avg:.1f}s | "
+              f"DOWN senza disservizio {len(result['false_down'])} | "
+              f"probe ripetuti {probing['timeouts']['retried']} (risposto {probing['timeouts']['recovered']})")
+
+
+if __name__ == '__main__':
+    main()
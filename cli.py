@@ -3,9 +3,17 @@
 import click
 import signal
 import sys
-from monitor import Monitor
+from monitor import Monitor, connection_group
+from scheduler import TIERS
+from sweep import IcmpSweeper, parse_network, sweep_order
+from pacer import Pacer
+from profiler import Profiler
+from maintenance import MaintenanceSchedule, validate_window, window_hosts, window_occurrences
 import json
 import os
+import time
+from datetime import datetime
+from zoneinfo import ZoneInfo
 
 def _read_status_file(status_path):
     if not os.path.exists(status_path):
@@ -19,6 +27,17 @@ def _read_status_file(status_path):
         click.echo(f"Errore leggendo {status_path}: {e}")
         return None
 
+def _parse_ts(value):
+    """Converte una data ISO (es. 2025-01-31 o 2025-01-31T14:05) in epoch.
+    Le date senza fuso orario sono interpretate in Europe/Rome."""
+    try:
+        dt = datetime.fromisoformat(value)
+    except ValueError:
+        raise click.BadParameter(f"Data non valida: {value} (usa formato ISO, es. 2025-01-31T14:05)")
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=ZoneInfo('Europe/Rome'))
+    return dt.timestamp()
+
 def _get_status_icon(status):
     if status == 'UP':
         return '🟢'
@@ -26,6 +45,10 @@ def _get_status_icon(status):
         return '🔴'
     elif status == 'CHECKING':
         return '🟡'
+    elif status == 'DEGRADED':
+        return '🟠'
+    elif status == 'UNRESOLVED':
+        return '🔷'
     elif status == 'UNKNOWN':
         return '❓'
     else:
@@ -43,9 +66,12 @@ def monitor():
 @monitor.command()
 @click.option('--config', default=None, help='Path file connessioni JSON')
 @click.option('--interval', default=None, type=int, help='Intervallo ping in secondi')
-def start(config, interval):
+@click.option('--profile', is_flag=True, help='Avvia subito la profilazione CPU/memoria (SIGUSR2 la ferma e la riattiva)')
+@click.option('--profile-dir', default=None, help='Directory dei report di profilazione (default MP_PROFILE_DIR)')
+def start(config, interval, profile, profile_dir):
     """Avvia il monitor come daemon."""
     monitor = Monitor(config_path=config, interval=interval)
+    profiler = Profiler(profile_dir)
     def handle_sigterm(signum, frame):
         click.echo('Ricevuto SIGTERM, arresto monitor...')
         try:
@@ -58,24 +84,56 @@ def start(config, interval):
             monitor.stop()
         except Exception:
             pass
+    def handle_sigusr2(signum, frame):
+        # il gestore gira nel thread principale: cProfile segue il ciclo di monitoraggio
+        try:
+            reports = profiler.toggle()
+        except Exception as e:
+            monitor.logger.error(f'Errore profilazione: {e}')
+            return
+        if profiler.active:
+            monitor.logger.info('Profilazione avviata')
+        else:
+            monitor.logger.info(f"Profilazione fermata, report: {', '.join(reports)}")
     signal.signal(signal.SIGTERM, handle_sigterm)
     signal.signal(signal.SIGINT, handle_sigint)
+    signal.signal(signal.SIGUSR2, handle_sigusr2)
+    if profile:
+        profiler.start()
+        click.echo(f'Profilazione attiva, report in {profiler.directory} alla fermata (SIGUSR2) o all\'uscita.')
     click.echo('Monitor avviato. Premi Ctrl+C per uscire.')
     try:
         monitor.run_monitor_loop()
     except KeyboardInterrupt:
         click.echo('Interrotto da tastiera.')
+    finally:
+        if profiler.active:
+            click.echo(f"Report di profilazione: {', '.join(profiler.stop())}")
 
 @monitor.command()
-def status():
-    """Mostra lo stato corrente delle connessioni."""
+@click.option('--at', 'at', default=None, help='Stato in un istante passato (ISO, es. 2025-01-31T14:05)')
+@click.option('--from', 'date_from', default=None, help='Inizio intervallo per le transizioni (ISO)')
+@click.option('--to', 'date_to', default=None, help='Fine intervallo per le transizioni (ISO, default adesso)')
+@click.option('--ip', 'ips', multiple=True, help='Limita a uno o più IP (ripetibile)')
+@click.option('--backup-dir', default=None, help='Directory dei backup di status (default MP_BACKUP_DIR)')
+@click.option('--live', is_flag=True, help='Legge lo stato live dalla memoria condivisa del daemon')
+def status(at, date_from, date_to, ips, backup_dir, live):
+    """Mostra lo stato corrente delle connessioni (o in un istante/intervallo passato)."""
     monitor = Monitor()
+    if live:
+        _status_live(monitor, ips)
+        return
+    if at or date_from:
+        _status_history(monitor, at, date_from, date_to, ips, backup_dir)
+        return
     data = _read_status_file(monitor.status_path)
     if not data:
         click.echo("Nessun dato di stato disponibile.")
         return
     ts = data.get('timestamp')
     last = data.get('last_status', {})
+    if ips:
+        last = {ip: st for ip, st in last.items() if ip in ips}
     click.echo(f"\n\nStatus snapshot: {ts}\n")
     for ip, st in last.items():
         status_icon = _get_status_icon(st)
@@ -84,9 +142,202 @@ def status():
     up_count = sum(1 for st in last.values() if st == 'UP')
     down_count = sum(1 for st in last.values() if st == 'DOWN')
     checking_count = sum(1 for st in last.values() if st == 'CHECKING')
+    degraded_count = sum(1 for st in last.values() if st == 'DEGRADED')
+    unresolved_count = sum(1 for st in last.values() if st == 'UNRESOLVED')
     # connessioni in pausa lette dalla configurazione
     paused_count = sum(1 for c in monitor.connections if not c.get('enabled', True))
-    click.echo(f"\nTotali: UP={up_count} | DOWN={down_count} | CHECKING={checking_count} | Pausa={paused_count}\n")
+    maintenance_count = len((data.get('maintenance') or {}).get('active') or {})
+    click.echo(f"\nTotali: UP={up_count} | DEGRADED={degraded_count} | DOWN={down_count} | CHECKING={checking_count} "
+               f"| DNS={unresolved_count} | Pausa={paused_count} | Manutenzione={maintenance_count}\n")
+    # tempi di rilevamento per tier (secondi dall'ultimo probe riuscito)
+    detect = data.get('detect') or {}
+    for tier_name in TIERS:
+        for kind, label in (('detect', 'rilevamento'), ('confirm', 'conferma DOWN')):
+            st = detect.get(tier_name, {}).get(kind)
+            if st:
+                click.echo(f"Tier {tier_name:<8} {label}: media {st['avg']}s | p95 {st['p95']}s | max {st['max']}s ({st['count']} eventi)")
+    pacer = data.get('pacer')
+    if pacer and pacer.get('sent'):
+        click.echo(f"Limitatore ICMP ({pacer['pps']:g} pps): {pacer['sent']} echo, {pacer['throttled']} rallentati, "
+                   f"attesa media {pacer['wait_avg']}s, max {pacer['wait_max']}s")
+
+@monitor.command()
+@click.option('--filter', 'filter_keyword', default=None, help='Filtro per nome, IP o stato')
+@click.option('--json', 'as_json', is_flag=True, help='Stampa gli eventi come JSON (una riga per evento)')
+def watch(filter_keyword, as_json):
+    """Segue in tempo reale le transizioni di stato pubblicate dal daemon."""
+    from feed import subscribe
+    monitor = Monitor()
+    fk = (filter_keyword or '').lower()
+    try:
+        for event in subscribe(monitor.feed_path):
+            if event.get('type') == 'dropped':
+                click.echo(f"⚠️  {event['count']} eventi persi (client troppo lento)", err=True)
+                continue
+            if event.get('type') == 'cycle':
+                if as_json:
+                    click.echo(json.dumps(event, ensure_ascii=False))
+                continue
+            if event.get('type') == 'anomaly':
+                if not as_json:
+                    for g in event['groups']:
+                        click.echo(f"⚠️  Anomalia di latenza {g['group']}: {g['outliers']}/{g['hosts']} linee, "
+                                   f"RTT {g['rtt_baseline_ms']} -> {g['rtt_now_ms']} ms")
+                    continue
+            if fk and not any(fk in str(event.get(k) or '').lower() for k in ('name', 'ip', 'to')):
+                continue
+            if as_json:
+                click.echo(json.dumps(event, ensure_ascii=False))
+                continue
+            ts = datetime.fromtimestamp(event['ts'], ZoneInfo('Europe/Rome')).strftime('%H:%M:%S')
+            merged = f" (+{event['coalesced'] - 1} intermedie)" if event.get('coalesced') else ''
+            click.echo(f"{ts} {_get_status_icon(event['to'])} {event.get('name') or ''} ({event['ip']}): "
+                       f"{event.get('from')} -> {event['to']}{merged}")
+    except (FileNotFoundError, ConnectionRefusedError) as e:
+        click.echo(f"Feed non disponibile ({monitor.feed_path}): il daemon è in esecuzione? {e}")
+    except KeyboardInterrupt:
+        pass
+
+def _status_live(monitor, ips):
+    """Stato live dal segmento di memoria condivisa pubblicato dal daemon (MP_SHM_PATH)."""
+    from shmstatus import read_live_status
+    try:
+        updated, hosts = read_live_status(monitor.shm_path)
+    except (FileNotFoundError, RuntimeError) as e:
+        click.echo(f"Stato live non disponibile ({monitor.shm_path}): {e}")
+        return
+    if ips:
+        hosts = [h for h in hosts if h['ip'] in ips]
+    ts = datetime.fromtimestamp(updated, ZoneInfo('Europe/Rome')).strftime('%Y-%m-%d %H:%M:%S')
+    click.echo(f"\n\nStato live: {ts}\n")
+    for h in hosts:
+        st = h['status']
+        rtt = f"{h['rtt']} ms" if h['rtt'] is not None else ''
+        click.echo(f"{_get_status_icon(st)} {h['ip']:<15}\t{st}\t{rtt}")
+    counts = {s: sum(1 for h in hosts if h['status'] == s) for s in ('UP', 'DEGRADED', 'DOWN', 'CHECKING')}
+    click.echo("\nTotali: " + " | ".join(f"{k}={v}" for k, v in counts.items()) + "\n")
+
+def _status_history(monitor, at, date_from, date_to, ips, backup_dir):
+    """Stato point-in-time (--at) o transizioni in un intervallo (--from/--to) da backup e storico."""
+    import mp_status_backup
+    import snapshots
+    index = snapshots.SnapshotIndex(backup_dir or mp_status_backup.MP_BACKUP_DIR)
+    fmt = lambda t: datetime.fromtimestamp(t, ZoneInfo('Europe/Rome')).strftime('%Y-%m-%d %H:%M:%S')
+    if at:
+        ts = _parse_ts(at)
+        snap, states = snapshots.status_at(ts, index, monitor.history, ips or None)
+        source = f"snapshot {snap[1]} + storico" if snap else "solo storico"
+        click.echo(f"\n\nStato al {fmt(ts)} ({source})\n")
+        if not states:
+            click.echo("Nessun dato disponibile per l'istante richiesto.")
+            return
+        for ip, st in states.items():
+            click.echo(f"{_get_status_icon(st)} {ip:<15}\t{st}")
+        click.echo("")
+        return
+    start = _parse_ts(date_from)
+    end = _parse_ts(date_to) if date_to else time.time()
+    snaps = index.between(start, end)
+    click.echo(f"\n\nIntervallo {fmt(start)} - {fmt(end)}: {len(snaps)} snapshot\n")
+    for t, fname in snaps:
+        click.echo(f"  {fmt(t)}  {fname}")
+    transitions = snapshots.transitions_between(monitor.history, start, end, ips or None)
+    click.echo(f"\nTransizioni: {len(transitions)}\n")
+    for rec in transitions:
+        click.echo(f"{fmt(rec['ts'])}  {rec['ip']:<15} {rec.get('from')} -> {_get_status_icon(rec.get('to'))} {rec.get('to')}  {rec.get('name') or ''}")
+    click.echo("")
+
+@monitor.command()
+@click.option('--from', 'date_from', required=True, help='Inizio finestra (ISO, es. 2025-01-01)')
+@click.option('--to', 'date_to', default=None, help='Fine finestra (ISO, default adesso)')
+@click.option('--by', type=click.Choice(['host', 'group']), default='host', help='Aggregazione per host o per gruppo')
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'json']), default='csv', help='Formato di output')
+@click.option('--output', default=None, help='File di output (default stdout)')
+def report(date_from, date_to, by, fmt, output):
+    """Report di disponibilità (availability, MTTR, MTBF, outage) dallo storico transizioni."""
+    import report as report_mod
+    monitor = Monitor()
+    start = _parse_ts(date_from)
+    end = min(_parse_ts(date_to), time.time()) if date_to else time.time()
+    if end <= start:
+        raise click.BadParameter("La fine della finestra deve essere successiva all'inizio")
+    groups = {c['ip']: connection_group(c) for c in monitor.connections}
+    rows = report_mod.build_report(monitor.history.iter_records(), start, end, host_groups=groups, by=by)
+    text = report_mod.format_rows(rows, fmt)
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(text)
+        click.echo(f"Report scritto in {output} ({len(rows)} righe)")
+    else:
+        click.echo(text)
+
+@monitor.command()
+@click.option('--hosts', default=10000, show_default=True, help='Host simulati (scenario generato)')
+@click.option('--days', default=7.0, show_default=True, help='Giorni simulati (scenario generato)')
+@click.option('--outages-per-day', default=0.05, show_default=True, help='Disservizi medi per host al giorno')
+@click.option('--mean-outage', default=1800.0, show_default=True, help='Durata media di un disservizio (secondi)')
+@click.option('--seed', default=None, type=int, help='Seme casuale (scenario riproducibile)')
+@click.option('--replay', is_flag=True, help='Riproduce i disservizi registrati nello storico invece di generarli')
+@click.option('--from', 'date_from', default=None, help='Inizio dello storico da riprodurre (ISO)')
+@click.option('--to', 'date_to', default=None, help='Fine dello storico da riprodurre (ISO)')
+@click.option('--interval', default=None, type=int, help='Intervallo ping in secondi (default MP_PING_INTERVAL)')
+@click.option('--retries', default=None, type=int, help='Tentativi di conferma DOWN (default MP_PING_RETRIES)')
+@click.option('--retry-interval', default=None, type=int, help='Secondi tra i tentativi (default MP_PING_RETRY_INTERVAL)')
+@click.option('--exact', is_flag=True, help='Ogni probe passa dalla macchina a stati (più lento)')
+@click.option('--rtt-mix', default=None, help="Profili di latenza 'quota:ms,...' (es. 0.6:2,0.3:40,0.1:600)")
+@click.option('--loss', default=0.0, show_default=True, help='Perdita casuale degli echo (percentuale)')
+@click.option('--jitter', default=0.0, show_default=True, help="Dispersione lognormale dell'RTT (sigma)")
+@click.option('--fixed-timeout', is_flag=True, help='Timeout fisso invece dei timeout adattivi per host')
+@click.option('--alerts', 'alerts_path', default=None, help='Scrive le email simulate in un file JSONL')
+@click.option('--json', 'as_json', is_flag=True, help='Stampa il report completo in JSON')
+def simulate(hosts, days, outages_per_day, mean_outage, seed, replay, date_from, date_to,
+             interval, retries, retry_interval, exact, rtt_mix, loss, jitter, fixed_timeout, alerts_path, as_json):
+    """Simula la macchina a stati in tempo virtuale e misura allarmi, tempi di rilevamento e risorse."""
+    import simulate as simulate_mod
+    try:
+        mix = simulate_mod.parse_rtt_mix(rtt_mix)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    if replay:
+        monitor = Monitor()
+        since = _parse_ts(date_from) if date_from else None
+        until = _parse_ts(date_to) if date_to else None
+        scenario = simulate_mod.Scenario.from_history(
+            monitor.connections, monitor.history.iter_records(since, until), since, until)
+    else:
+        scenario = simulate_mod.Scenario.generate(hosts, days, outages_per_day, mean_outage, seed,
+                                                  rtt_mix=mix, loss=loss / 100.0, jitter=jitter)
+    sim = simulate_mod.Simulation(scenario, interval=interval, retries=retries, retry_interval=retry_interval,
+                                  exact=exact, adaptive=not fixed_timeout, seed=seed)
+    try:
+        result = sim.run()
+    finally:
+        sim.close()
+    if alerts_path:
+        with open(alerts_path, 'w', encoding='utf-8') as f:
+            for alert in sim.alerts:
+                f.write(json.dumps(alert, ensure_ascii=False) + '\n')
+    if as_json:
+        click.echo(json.dumps(result, indent=2, ensure_ascii=False))
+        return
+    res = result['resources']
+    click.echo(f"Simulati {result['hosts']} host per {result['simulated_s'] / 86400:.1f} giorni in {res['wall_s']}s "
+               f"(x{res['speedup']}), CPU {res['cpu_s']}s, RSS max {res['peak_rss_mb']} MB")
+    click.echo(f"Disservizi: {result['outages']} ({result['short_outages']} più brevi della conferma DOWN)")
+    click.echo('Email: ' + (' | '.join(f'{k}={v}' for k, v in sorted(result['alerts'].items())) or 'nessuna'))
+    for tier_name in TIERS:
+        for kind, label in (('detect', 'rilevamento'), ('confirm', 'conferma DOWN'), ('recover', 'rientro UP')):
+            st = result['latency'].get(tier_name, {}).get(kind)
+            if st:
+                click.echo(f"Tier {tier_name:<8} {label}: media {st['avg']}s | p95 {st['p95']}s | max {st['max']}s ({st['count']} eventi)")
+    click.echo(f"Disservizi lunghi non segnalati: {len(result['missed'])} | DOWN senza disservizio: {len(result['false_down'])}")
+    probing, to = result['probing'], result['probing']['timeouts']
+    click.echo(f"Ciclo stimato ({probing['workers']} worker): media {probing['cycle_s']['avg']}s | "
+               f"p95 {probing['cycle_s']['p95']}s | max {probing['cycle_s']['max']}s | "
+               f"timeout {'adattivo' if to['adaptive'] else 'fisso'}, ripetuti {to['retried']} "
+               f"(risposto {to['recovered']})")
+    click.echo(f"Cicli {res['cycles']}, probe {res['probes']}, transizioni {res['transitions']}, "
+               f"passi di conferma {res['task_steps']}, scritture di stato {res['status_dumps']}")
 
 @cli.group()
 def conn():
@@ -95,10 +346,15 @@ def conn():
 
 @conn.command()
 @click.option('--name', required=True, help='Nome connessione')
-@click.option('--ip', required=True, help='Indirizzo IP')
-def add(name, ip):
+@click.option('--ip', required=True, help='Indirizzo IP (v4 o v6) o hostname')
+@click.option('--probe', default=None, help="Tipo di probe: 'icmp' (default) o 'tcp:PORT'")
+@click.option('--tier', default=None, help='Priorità: critical, high, normal (default) o low')
+def add(name, ip, probe, tier):
     monitor = Monitor()
-    monitor.add_connection(name, ip)
+    try:
+        monitor.add_connection(name, ip, probe=probe, tier=tier)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
     click.echo(f'Aggiunta connessione {name} ({ip})')
 
 @conn.command()
@@ -123,6 +379,78 @@ def resume(ip):
     monitor.resume_connection(ip)
     click.echo(f'Connessione {ip} riattivata')
 
+@conn.command()
+@click.option('--ip', required=True, help='Indirizzo IP')
+@click.option('--probe', 'probe_spec', required=True, help="Tipo di probe: 'icmp' o 'tcp:PORT'")
+def probe(ip, probe_spec):
+    """Imposta il tipo di probe di una connessione."""
+    monitor = Monitor()
+    try:
+        monitor.set_probe(ip, probe_spec)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    click.echo(f'Connessione {ip}: probe {probe_spec}')
+
+@conn.command()
+@click.option('--ip', required=True, help='Indirizzo IP')
+@click.option('--tier', required=True, help='Priorità: critical, high, normal o low')
+def tier(ip, tier):
+    """Imposta il tier di priorità di una connessione."""
+    monitor = Monitor()
+    try:
+        monitor.set_tier(ip, tier)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    click.echo(f'Connessione {ip}: tier {tier}')
+
+@conn.command()
+@click.argument('cidr')
+@click.option('--add', 'do_add', is_flag=True, help="Aggiunge all'inventario i nuovi host che rispondono")
+@click.option('--name-template', default='{ip}', show_default=True,
+              help='Nome delle nuove connessioni: segnaposto {ip}, {n} (progressivo) e {network}')
+@click.option('--tier', default=None, help='Tier delle nuove connessioni (critical, high, normal, low)')
+@click.option('--timeout', default=1.0, type=float, show_default=True, help='Attesa massima della risposta (secondi)')
+@click.option('--pps', default=None, type=float, help='Echo al secondo (default MP_SWEEP_PPS o 2000)')
+def sweep(cidr, do_add, name_template, tier, timeout, pps):
+    """Scansiona una rete (es. 10.20.0.0/22) e mostra gli host che rispondono al ping."""
+    try:
+        network = parse_network(cidr)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    monitor = Monitor()
+    known = {c['ip'] for c in monitor.connections}
+    pps = pps if pps is not None else float(os.environ.get('MP_SWEEP_PPS', 2000))
+    sweeper = IcmpSweeper(pacer=Pacer(pps=pps, burst=min(pps, 100)), timeout=timeout)
+    addresses = sweep_order(network)
+    click.echo(f'Scansione di {network} ({len(addresses)} indirizzi, {pps:g} echo/s)...')
+    start = time.monotonic()
+    found = []
+    try:
+        # le risposte arrivano in ordine sparso: le mostriamo subito, l'elenco finale è ordinato
+        for ip, rtt in sweeper.stream(addresses):
+            is_new = ip not in known
+            found.append((ip, rtt, is_new))
+            click.echo(f"🟢 {ip:<15} {rtt * 1000:7.1f} ms  {'nuovo' if is_new else 'già presente'}")
+    except PermissionError:
+        click.echo('Permessi insufficienti per i socket ICMP (serve root, CAP_NET_RAW o net.ipv4.ping_group_range)')
+        sys.exit(1)
+    except KeyboardInterrupt:
+        click.echo('Scansione interrotta.')
+    new = sorted((ip for ip, _, is_new in found if is_new), key=lambda ip: tuple(map(int, ip.split('.'))))
+    click.echo(f'\n{len(found)} host rispondono su {sweeper.sent} sondati ({len(new)} nuovi) '
+               f'in {time.monotonic() - start:.1f}s')
+    if not do_add or not new:
+        return
+    try:
+        conns = [monitor.new_connection(name_template.format(ip=ip, n=n, network=network), ip, tier=tier)
+                 for n, ip in enumerate(new, 1)]
+    except (KeyError, IndexError) as e:
+        raise click.BadParameter(f'Segnaposto non valido nel template del nome: {e}')
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    added = monitor.add_connections(conns)
+    click.echo(f'Aggiunte {len(added)} connessioni')
+
 @conn.command()
 @click.option('--filter', 'filter_keyword', default=None, help='Filtro per nome o IP')
 def list(filter_keyword):
@@ -147,8 +475,111 @@ def list(filter_keyword):
     up_count = sum(1 for c in conns if c['status'] == 'UP')
     down_count = sum(1 for c in conns if c['status'] == 'DOWN')
     checking_count = sum(1 for c in conns if c['status'] == 'CHECKING')
+    degraded_count = sum(1 for c in conns if c['status'] == 'DEGRADED')
     paused_count = sum(1 for c in conns if not c.get('enabled', True))
-    click.echo(f"\nTotali: UP={up_count} | DOWN={down_count} | CHECKING={checking_count} | Pausa={paused_count}\n")
+    click.echo(f"\nTotali: UP={up_count} | DEGRADED={degraded_count} | DOWN={down_count} | CHECKING={checking_count} | Pausa={paused_count}\n")
     
+@cli.group()
+def maint():
+    """Finestre di manutenzione programmata (MP_MAINTENANCE_FILE)."""
+    pass
+
+@maint.command('add')
+@click.option('--id', 'window_id', required=True, help='Identificativo della finestra (sostituisce una finestra con lo stesso id)')
+@click.option('--name', default=None, help='Descrizione (es. Lavori EOLO)')
+@click.option('--target', 'targets', multiple=True, required=True,
+              help='IP o hostname, group:NOME oppure rete CIDR (ripetibile)')
+@click.option('--start', 'date_start', default=None, help='Inizio della finestra singola (ISO)')
+@click.option('--end', 'date_end', default=None, help='Fine della finestra singola (ISO)')
+@click.option('--cron', default=None, help="Inizio delle finestre ricorrenti in formato cron, es. '0 2 * * 0'")
+@click.option('--duration', default=None, type=float, help='Durata in minuti (ricorrenti, o singole senza --end)')
+def maint_add(window_id, name, targets, date_start, date_end, cron, duration):
+    """Aggiunge una finestra singola (--start/--end) o ricorrente (--cron/--duration)."""
+    window = {'id': window_id, 'name': name or window_id, 'targets': [*targets]}
+    if cron:
+        if date_start or date_end:
+            raise click.UsageError('Usare --cron oppure --start/--end, non entrambi')
+        window['cron'] = cron
+        window['duration'] = (duration or 0) * 60
+    else:
+        if not date_start or not (date_end or duration):
+            raise click.UsageError('Indicare --start e --end (o --duration), oppure --cron e --duration')
+        window['start'] = _parse_ts(date_start)
+        window['end'] = _parse_ts(date_end) if date_end else window['start'] + duration * 60
+    try:
+        MaintenanceSchedule().add(window)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    click.echo(f"Aggiunta finestra di manutenzione {window_id}")
+
+@maint.command('remove')
+@click.option('--id', 'window_id', required=True, help='Identificativo della finestra')
+def maint_remove(window_id):
+    removed = MaintenanceSchedule().remove(window_id)
+    click.echo(f'Rimosse {removed} finestre di manutenzione')
+
+@maint.command('list')
+def maint_list():
+    """Elenca le finestre con la prossima occorrenza (o quella in corso) e gli host coinvolti."""
+    schedule = MaintenanceSchedule()
+    windows = schedule.load()
+    if not windows:
+        click.echo(f'Nessuna finestra di manutenzione ({schedule.path})')
+        return
+    monitor = Monitor()
+    now = time.time()
+    tz = ZoneInfo('Europe/Rome')
+    fmt = lambda ts: datetime.fromtimestamp(ts, tz).strftime('%Y-%m-%d %H:%M')
+    for raw in windows:
+        try:
+            w = validate_window(raw)
+        except (ValueError, TypeError) as e:
+            click.echo(f"⚠️  {raw.get('id')}: {e}")
+            continue
+        when = f"cron '{w['cron']}' per {w['duration'] / 60:g} min" if w.get('cron') else f"{fmt(w['start'])} -> {fmt(w['end'])}"
+        hosts = len(window_hosts(w, monitor.connections, connection_group))
+        occurrences = window_occurrences(w, now, now + schedule.horizon)
+        if occurrences and occurrences[0][0] <= now:
+            state = f"IN CORSO fino a {fmt(occurrences[0][1])}"
+        elif occurrences:
+            state = f"prossima {fmt(occurrences[0][0])}"
+        elif not w.get('cron') and w['end'] <= now:
+            state = 'terminata'
+        else:
+            state = 'nessuna occorrenza nei prossimi giorni'
+        click.echo(f"{w['id']:<20} {w.get('name') or '':<25} {when} | {state} | {hosts} host | {', '.join(w['targets'])}")
+
+@cli.group()
+def db():
+    """Gestione database SQLite (MP_PING_DB)."""
+    pass
+
+@db.command()
+@click.option('--db', 'db_path', default=None, help='Path database SQLite (default MP_PING_DB)')
+def migrate(db_path):
+    """Importa connections.json, status.json e history.jsonl nel database."""
+    db_path = db_path or os.environ.get('MP_PING_DB')
+    if not db_path:
+        raise click.UsageError('Specificare --db oppure la variabile MP_PING_DB')
+    monitor = Monitor(db_path=db_path)
+    added, n_hist = monitor.migrate_to_db()
+    click.echo(f'Migrazione completata in {db_path}: {added} connessioni, {n_hist} transizioni importate')
+
+@db.command()
+@click.option('--db', 'db_path', default=None, help='Path database SQLite (default MP_PING_DB)')
+@click.option('--status-file', default=None, help='Status JSON da scrivere (default MP_STATUS_FILE)')
+@click.option('--connections-file', default=None, help='Se indicato esporta anche le connessioni in JSON')
+def export(db_path, status_file, connections_file):
+    """Esporta lo stato (e opzionalmente le connessioni) dal database in JSON."""
+    db_path = db_path or os.environ.get('MP_PING_DB')
+    if not db_path:
+        raise click.UsageError('Specificare --db oppure la variabile MP_PING_DB')
+    monitor = Monitor(db_path=db_path, status_path=status_file)
+    monitor._atomic_write_json(monitor.status_path, monitor.store.export_status())
+    click.echo(f'Stato esportato in {monitor.status_path}')
+    if connections_file:
+        monitor._atomic_write_json(connections_file, monitor.store.list_connections())
+        click.echo(f'Connessioni esportate in {connections_file}')
+
 if __name__ == '__main__':
     cli() 
\ No newline at end of file
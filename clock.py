@@ -0,0 +1,98 @@
+"""
+Orologio del monitor: tempo reale (SystemClock) o virtuale (VirtualClock) per simulazioni e test.
+
+Monitor legge l'ora e attende solo tramite il proprio clock. I task in background (worker di
+conferma DOWN) sono generatori che restituiscono, a ogni passo, i secondi da attendere prima
+del passo successivo: SystemClock li esegue in un thread con time.sleep, VirtualClock li
+esegue in ordine di scadenza su un heap di eventi, senza thread e senza attese reali.
+"""
+import time
+import heapq
+from datetime import datetime
+from threading import Thread
+
+
+class SystemClock:
+    def time(self):
+        return time.time()
+
+    def now(self, tz=None):
+        return datetime.now(tz)
+
+    def sleep(self, seconds, wake=None):
+        """Attende `seconds` secondi; con `wake` (threading.Event) l'attesa si interrompe se viene impostato."""
+        if wake is not None:
+            wake.wait(seconds)
+        else:
+            time.sleep(seconds)
+
+    def spawn(self, steps, name=None):
+        """Esegue il generatore `steps` in un thread daemon; restituisce il Thread."""
+        def run():
+            for delay in steps:
+                if delay > 0:
+                    time.sleep(delay)
+        thread = Thread(target=run, name=name, daemon=True)
+        thread.start()
+        return thread
+
+
+class VirtualTask:
+    def __init__(self, steps, name=None):
+        self.steps = steps
+        self.name = name
+        self.done = False
+
+    def is_alive(self):
+        return not self.done
+
+    def join(self, timeout=None):
+        # nel tempo virtuale il task avanza solo con VirtualClock.run_until
+        pass
+
+
+class VirtualClock:
+    """Tempo simulato: avanza solo con run_until/sleep, eseguendo nel frattempo i task scaduti."""
+
+    def __init__(self, start=0.0):
+        self._now = float(start)
+        self._heap = []     # (istante, progressivo, task)
+        self._seq = 0
+        self.steps = 0      # passi di task eseguiti
+
+    def time(self):
+        return self._now
+
+    def now(self, tz=None):
+        return datetime.fromtimestamp(self._now, tz)
+
+    def sleep(self, seconds, wake=None):
+        self.run_until(self._now + max(seconds, 0.0))
+
+    def _schedule(self, when, task):
+        self._seq += 1
+        heapq.heappush(self._heap, (when, self._seq, task))
+
+    def spawn(self, steps, name=None):
+        """Registra il generatore `steps`: il primo passo viene eseguito al prossimo run_until."""
+        task = VirtualTask(steps, name)
+        self._schedule(self._now, task)
+        return task
+
+    def next_event(self):
+        """Istante del prossimo passo di task in attesa (None se non ce ne sono)."""
+        return self._heap[0][0] if self._heap else None
+
+    def run_until(self, when):
+        """Porta il tempo a `when` eseguendo in ordine i passi dei task che scadono prima."""
+        while self._heap and self._heap[0][0] <= when:
+            at, _, task = heapq.heappop(self._heap)
+            self._now = max(self._now, at)
+            self.steps += 1
+            try:
+                delay = next(task.steps)
+            except StopIteration:
+                task.done = True
+                continue
+            self._schedule(self._now + max(delay, 0.0), task)
+        self._now = max(self._now, when)
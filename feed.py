@@ -0,0 +1,213 @@
+"""
+Feed delle transizioni di stato per sottoscrittori locali (wallboard NOC, bot di chat).
+
+Il daemon apre un socket Unix (MP_FEED_SOCKET, default /run/mp_ping/feed.sock) e scrive a
+ogni client una riga JSON per transizione:
+  {"type": "transition", "ts": ..., "ip": ..., "name": ..., "from": ..., "to": ...}
+
+publish() non blocca mai: accoda l'evento nella coda limitata di ogni sottoscrittore
+(MP_FEED_QUEUE eventi, default 1000) e sveglia il thread del feed, che scrive sui socket
+non bloccanti tramite un selector. Per i client lenti gli eventi ancora in coda per lo
+stesso IP vengono fusi (resta il 'from' originale, 'to' e 'ts' dell'ultimo, campo
+'coalesced'); se la coda è comunque piena si scartano i più vecchi e al client arriva
+{"type": "dropped", "count": N} prima degli eventi successivi.
+"""
+import os
+import json
+import time
+import socket
+import selectors
+from collections import OrderedDict
+from threading import Lock, Thread, Event
+
+DEFAULT_PATH = '/run/mp_ping/feed.sock'
+CHUNK = 64 * 1024
+
+
+class Subscriber:
+    """Coda limitata di un client: eventi per IP in ordine di arrivo, fusi se lo stesso IP cambia ancora."""
+
+    def __init__(self, sock, maxlen=1000):
+        self.sock = sock
+        self.maxlen = maxlen
+        self.pending = OrderedDict()    # ip -> evento
+        self.dropped = 0
+        self.buffer = b''
+
+    def push(self, event):
+        # solo le transizioni si fondono per IP; gli altri eventi (es. anomalie) restano distinti
+        ip = event.get('ip') if event.get('type') == 'transition' else object()
+        queued = self.pending.get(ip)
+        if queued is not None:
+            merged = dict(event)
+            merged['from'] = queued.get('from')
+            merged['coalesced'] = queued.get('coalesced', 1) + 1
+            self.pending[ip] = merged
+            return
+        if len(self.pending) >= self.maxlen:
+            self.pending.popitem(last=False)
+            self.dropped += 1
+        self.pending[ip] = event
+
+    def fill(self):
+        """Sposta eventi dalla coda al buffer di invio; True se c'è qualcosa da scrivere."""
+        if not self.buffer:
+            lines = []
+            size = 0
+            if self.dropped:
+                lines.append(json.dumps({'type': 'dropped', 'count': self.dropped}))
+                self.dropped = 0
+            while self.pending and size < CHUNK:
+                _, event = self.pending.popitem(last=False)
+                line = json.dumps(event, ensure_ascii=False)
+                lines.append(line)
+                size += len(line) + 1
+            if lines:
+                self.buffer = ('\n'.join(lines) + '\n').encode('utf-8')
+        return bool(self.buffer)
+
+
+class ChangeFeed:
+    def __init__(self, path=DEFAULT_PATH, maxlen=None):
+        self.path = path
+        self.maxlen = maxlen or int(os.environ.get('MP_FEED_QUEUE', 1000))
+        self.subscribers = {}       # socket -> Subscriber
+        self.lock = Lock()
+        self.running = Event()
+        self.published = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if os.path.exists(path):
+            os.unlink(path)     # socket rimasto da un'esecuzione precedente
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(path)
+        os.chmod(path, 0o660)
+        self.server.listen(64)
+        self.server.setblocking(False)
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+        self.sel = selectors.DefaultSelector()
+        self.sel.register(self.server, selectors.EVENT_READ)
+        self.sel.register(self._wake_r, selectors.EVENT_READ)
+        self.running.set()
+        self.thread = Thread(target=self._serve, name='mp_ping-feed', daemon=True)
+        self.thread.start()
+
+    def publish(self, event):
+        """Accoda l'evento a tutti i sottoscrittori senza mai bloccare il chiamante."""
+        with self.lock:
+            if not self.subscribers:
+                return
+            for sub in self.subscribers.values():
+                sub.push(event)
+            self.published += 1
+        try:
+            self._wake_w.send(b'\0')
+        except (BlockingIOError, OSError):
+            pass    # socketpair pieno: il thread del feed è già stato svegliato
+
+    def _drop(self, sock):
+        with self.lock:
+            self.subscribers.pop(sock, None)
+        try:
+            self.sel.unregister(sock)
+        except (KeyError, ValueError):
+            pass
+        sock.close()
+
+    def _serve(self):
+        while self.running.is_set():
+            for key, mask in self.sel.select(1.0):
+                sock = key.fileobj
+                if sock is self.server:
+                    try:
+                        conn, _ = self.server.accept()
+                    except OSError:
+                        continue
+                    conn.setblocking(False)
+                    with self.lock:
+                        self.subscribers[conn] = Subscriber(conn, self.maxlen)
+                    self.sel.register(conn, selectors.EVENT_READ)
+                elif sock is self._wake_r:
+                    try:
+                        while self._wake_r.recv(4096):
+                            pass
+                    except (BlockingIOError, OSError):
+                        pass
+                else:
+                    if mask & selectors.EVENT_READ:
+                        # i client non inviano dati: una lettura vuota è una chiusura
+                        try:
+                            if not sock.recv(4096):
+                                self._drop(sock)
+                                continue
+                        except BlockingIOError:
+                            pass
+                        except OSError:
+                            self._drop(sock)
+                            continue
+                    if mask & selectors.EVENT_WRITE:
+                        # il buffer di invio è usato solo da questo thread
+                        sub = self.subscribers.get(sock)
+                        if sub is None:
+                            continue
+                        try:
+                            sent = sock.send(sub.buffer)
+                        except BlockingIOError:
+                            sent = 0
+                        except OSError:
+                            self._drop(sock)
+                            continue
+                        sub.buffer = sub.buffer[sent:]
+
+            # registra la scrittura solo per i client con dati in attesa
+            with self.lock:
+                items = [(sock, sub.fill()) for sock, sub in self.subscribers.items()]
+            for sock, writable in items:
+                events = selectors.EVENT_READ | (selectors.EVENT_WRITE if writable else 0)
+                try:
+                    if self.sel.get_key(sock).events != events:
+                        self.sel.modify(sock, events)
+                except (KeyError, ValueError):
+                    pass
+
+    def close(self):
+        self.running.clear()
+        try:
+            self._wake_w.send(b'\0')
+        except OSError:
+            pass
+        self.thread.join(5)
+        for sock in list(self.subscribers):
+            self._drop(sock)
+        self.sel.close()
+        self.server.close()
+        self._wake_r.close()
+        self._wake_w.close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+
+def subscribe(path=DEFAULT_PATH, timeout=None):
+    """Client: si connette al feed e restituisce gli eventi (dict) man mano che arrivano."""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    sock.connect(path)
+    try:
+        with sock.makefile('r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+    finally:
+        sock.close()
+
+
+def transition_event(ip, name, prev, status, ts=None):
+    return {'type': 'transition', 'ts': round(ts or time.time(), 3), 'ip': ip, 'name': name,
+            'from': prev, 'to': status}
@@ -0,0 +1,142 @@
+"""
+Modello della lista connessioni della GUI (script.py), indipendente da Tk.
+
+La Treeview della GUI ha un numero fisso di righe ("slot") e mostra solo la finestra
+visibile dell'elenco: ConnectionRows tiene l'ordinamento, lo stato e l'RTT di ogni
+connessione, la posizione di scorrimento e i totali (aggiornati in modo incrementale),
+così un aggiornamento di stato costa O(1) e il ridisegno tocca solo gli slot visibili.
+"""
+import math
+from collections import Counter
+
+STATUS_ICONS = {
+    'UP': '✅',
+    'DOWN': '❌',
+    'CHECKING': '🟡',
+    'DEGRADED': '🟠',
+    'UNRESOLVED': '🔷',
+}
+PAUSED_ICON = '⏸️'
+UNKNOWN_ICON = '❓'
+
+
+def sort_key(connection):
+    # Rimuove la parte fino al primo trattino incluso per determinare la chiave di ordinamento
+    name = connection["name"]
+    return name.split("-", 1)[-1].strip().lower()  # Prende tutto dopo il primo trattino
+
+
+class ConnectionRows:
+    def __init__(self, height=25):
+        self.height = height
+        self.offset = 0             # indice della prima connessione visibile
+        self.rows = []              # connessioni ordinate per sort_key
+        self.index = {}             # ip -> posizione in rows
+        self.status = {}            # ip -> stato
+        self.rtt = {}               # ip -> ms (None = nessuna risposta)
+        self.counts = Counter()     # stato -> connessioni (tutte, anche in pausa)
+        self.paused = 0
+        self.selected = set()       # IP selezionati (la selezione segue le righe durante lo scorrimento)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def load(self, connections, statuses=None, rtts=None):
+        """Ricarica l'elenco (all'avvio e dopo aggiunte/rimozioni/modifiche)."""
+        statuses = statuses or {}
+        rtts = rtts or {}
+        self.rows = sorted((dict(c) for c in connections), key=sort_key)
+        self.index = {c['ip']: i for i, c in enumerate(self.rows)}
+        self.status = {c['ip']: statuses.get(c['ip']) or 'UNKNOWN' for c in self.rows}
+        self.rtt = {ip: rtts.get(ip) for ip in self.index}
+        self.counts = Counter(self.status.values())
+        self.paused = sum(1 for c in self.rows if not c.get('enabled', True))
+        self.selected &= self.index.keys()
+        self.offset = self._clamp(self.offset)
+
+    def update(self, ip, status=None, rtt=False):
+        """Aggiorna stato e/o RTT (rtt=False lascia invariato). True se la riga è cambiata."""
+        if ip not in self.index:
+            return False
+        changed = False
+        if status is not None and self.status[ip] != status:
+            self.counts[self.status[ip]] -= 1
+            self.counts[status] += 1
+            self.status[ip] = status
+            changed = True
+        if rtt is not False:
+            if rtt is not None and math.isnan(rtt):
+                rtt = None
+            if self.rtt.get(ip) != rtt:
+                self.rtt[ip] = rtt
+                changed = True
+        return changed
+
+    def totals(self):
+        return {'total': len(self.rows), 'paused': self.paused, 'unknown': self.counts['UNKNOWN'],
+                'up': self.counts['UP'], 'down': self.counts['DOWN'],
+                'checking': self.counts['CHECKING'], 'degraded': self.counts['DEGRADED']}
+
+    def values(self, ip):
+        """Valori delle colonne (stato, nome, ip, rtt) della riga dell'IP."""
+        conn = self.rows[self.index[ip]]
+        if not conn.get('enabled', True):
+            icon = PAUSED_ICON
+        else:
+            icon = STATUS_ICONS.get(self.status[ip], UNKNOWN_ICON)
+        rtt = self.rtt.get(ip)
+        return (icon, conn['name'], ip, '' if rtt is None else f'{rtt:.1f} ms')
+
+    # finestra visibile
+
+    def _clamp(self, offset):
+        return max(0, min(offset, len(self.rows) - self.height))
+
+    def scroll(self, delta):
+        """Sposta la finestra di `delta` righe. True se l'offset è cambiato."""
+        return self.scroll_to(self.offset + delta)
+
+    def scroll_to(self, offset):
+        offset = self._clamp(int(offset))
+        if offset == self.offset:
+            return False
+        self.offset = offset
+        return True
+
+    def see(self, index):
+        """Scorre il minimo indispensabile per rendere visibile la riga `index`."""
+        if index < self.offset:
+            return self.scroll_to(index)
+        if index >= self.offset + self.height:
+            return self.scroll_to(index - self.height + 1)
+        return False
+
+    def visible(self):
+        """IP delle righe visibili, nell'ordine degli slot."""
+        return [c['ip'] for c in self.rows[self.offset:self.offset + self.height]]
+
+    def slot_of(self, ip):
+        """Slot in cui è mostrato l'IP, None se fuori dalla finestra visibile."""
+        i = self.index.get(ip)
+        if i is None or not self.offset <= i < self.offset + self.height:
+            return None
+        return i - self.offset
+
+    def fraction(self):
+        """(primo, ultimo) visibile come frazioni dell'elenco, nel formato di Scrollbar.set."""
+        if not self.rows:
+            return 0.0, 1.0
+        n = len(self.rows)
+        return self.offset / n, min(self.offset + self.height, n) / n
+
+    def first_selected(self):
+        """Prima connessione selezionata nell'ordine dell'elenco (None se nessuna)."""
+        if not self.selected:
+            return None
+        return self.rows[min(self.index[ip] for ip in self.selected)]
+
+    def search(self, name_query=None, ip_query=None):
+        """Indici delle connessioni con il nome che contiene name_query o con IP uguale a ip_query."""
+        name_query = (name_query or '').lower()
+        return [i for i, c in enumerate(self.rows)
+                if (name_query and name_query in c['name'].lower()) or (ip_query and c['ip'] == ip_query)]
@@ -0,0 +1,78 @@
+import os
+import json
+import time
+from threading import Lock
+
+
+class TransitionLog:
+    """Storico append-only delle transizioni di stato (una riga JSON per evento).
+
+    Ogni riga ha la forma {"ts": epoch, "ip": ..., "name": ..., "from": ..., "to": ...}.
+    Le righe sono scritte in ordine cronologico dal daemon (unico scrittore).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = Lock()
+
+    def append(self, ip, name, prev, new, ts=None):
+        record = {
+            'ts': round(ts if ts is not None else time.time(), 3),
+            'ip': ip,
+            'name': name,
+            'from': prev,
+            'to': new,
+        }
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+
+    @staticmethod
+    def _line_ts(line):
+        try:
+            return json.loads(line).get('ts', float('-inf'))
+        except ValueError:
+            return float('-inf')
+
+    def _seek(self, f, ts):
+        """Ricerca binaria sugli offset del file: posiziona f sulla prima riga con ts >= ts."""
+        f.seek(0, os.SEEK_END)
+        lo, hi = 0, f.tell()
+        while lo < hi:
+            mid = (lo + hi) // 2
+            f.seek(mid)
+            if mid > 0:
+                f.readline()    # allinea all'inizio della riga successiva
+            line = f.readline()
+            if line and self._line_ts(line) < ts:
+                lo = mid + 1
+            else:
+                hi = mid
+        f.seek(lo)
+        if lo > 0:
+            f.readline()
+
+    def iter_records(self, since=None, until=None):
+        """Itera i record dello storico (opzionalmente filtrati per intervallo [since, until]).
+        Con `since` la lettura parte da una ricerca binaria invece che dall'inizio del file."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            if since is not None:
+                self._seek(f, since)
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    # riga troncata (es. crash durante la scrittura): la saltiamo
+                    continue
+                ts = rec.get('ts')
+                if since is not None and ts < since:
+                    continue
+                if until is not None and ts > until:
+                    break
+                yield rec
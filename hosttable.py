@@ -0,0 +1,304 @@
+"""
+Rappresentazione compatta dello stato runtime degli host (pensata per 100k+ host).
+
+Ogni host è una riga in array paralleli (modulo `array`): stato come piccolo intero, IP
+impaccato a 128 bit (IPv4 come IPv4-mapped), ultimo RTT/loss/jitter, istante dell'ultimo
+cambio di stato, inizio DOWN e contatori di conferma. Gli istanti sono epoch in secondi interi
+(uint32, validi fino al 2106: 4 byte invece di 8), troncati con to_epoch() alla scrittura. L'indice ip -> riga è una tabella hash
+ad indirizzamento aperto in un array('i') (4-8 byte per host, contro ~65 di un dict con valori int);
+le stringhe IP sono le stesse già presenti nelle connessioni.
+
+Le forme dict/JSON (last_status, metrics) vengono prodotte solo ai confini di I/O
+(status_dict(), metrics_dict()); StatusView e DownTimesView espongono la tabella con
+l'interfaccia dict usata finora da Monitor.
+"""
+import math
+import time
+import ipaddress
+from array import array
+from datetime import datetime
+from collections.abc import MutableMapping
+
+# codici di stato (indice nella tupla); None = mai osservato. I nuovi stati vanno aggiunti in coda
+# perché i codici sono letti anche dai client del segmento condiviso (shmstatus)
+STATES = (None, 'UNKNOWN', 'UP', 'DEGRADED', 'CHECKING', 'DOWN', 'UNRESOLVED')
+STATE_CODES = {s: i for i, s in enumerate(STATES)}
+
+_NAN = float('nan')
+_MASK64 = (1 << 64) - 1
+_EMPTY = -1
+_TOMBSTONE = -2
+
+
+def to_epoch(t):
+    """Istante (epoch float) -> secondi interi per le colonne uint32, troncato: una durata misurata
+    da un istante salvato non risulta mai più corta del vero. 0 resta 0 (= nessun valore)."""
+    return int(t) if t and t > 0 else 0
+
+
+def pack_ip(ip):
+    """IP -> (hi, lo) a 64 bit ciascuno; (0, 0) se non è un IP letterale."""
+    try:
+        addr = ipaddress.ip_address(ip)
+    except ValueError:
+        return 0, 0
+    if addr.version == 4:
+        value = (0xFFFF << 32) | int(addr)
+    else:
+        value = int(addr)
+    return value >> 64, value & _MASK64
+
+
+def unpack_ip(hi, lo):
+    value = (hi << 64) | lo
+    if value == 0:
+        return None
+    addr = ipaddress.IPv6Address(value)
+    return str(addr.ipv4_mapped or addr)
+
+
+class HostTable:
+    def __init__(self, ips=(), clock=time.time):
+        self.clock = clock              # istante dei cambi di stato (orologio del monitor)
+        self.ips = []                   # riga -> ip
+        self._slots = array('i', [_EMPTY]) * 8   # indice hash ip -> riga
+        self._used = 0                  # slot occupati (righe + tombstone)
+        self.addr_hi = array('Q')
+        self.addr_lo = array('Q')
+        self.state = array('B')
+        self.changed = array('I')       # epoch ultimo cambio di stato
+        self.down_since = array('I')    # epoch inizio DOWN (0 = non DOWN)
+        self.attempts = array('H')      # tentativi di conferma eseguiti
+        self.next_due = array('I')      # epoch del prossimo tentativo di conferma (0 = nessuno)
+        self.next_check = array('I')    # epoch del prossimo probe secondo l'intervallo del tier
+        self.last_ok = array('I')       # epoch dell'ultimo probe riuscito
+        self.rtt = array('f')           # ms, NaN = nessuna risposta
+        self.loss = array('f')          # %, NaN = nessuna misura
+        self.jitter = array('f')        # ms, NaN = non calcolato
+        self.srtt = array('f')          # ms, RTT medio per il timeout adattivo (rto.py), NaN = nessuna misura
+        self.rttvar = array('f')        # ms, variabilità dell'RTT per il timeout adattivo
+        for ip in ips:
+            self.add(ip)
+
+    def __len__(self):
+        return len(self.ips)
+
+    def __contains__(self, ip):
+        return self.row(ip) is not None
+
+    # --- indice hash (linear probing) --------------------------------------
+
+    def _probe(self, ip):
+        """Restituisce (slot dell'ip o None, primo slot libero utilizzabile)."""
+        slots = self._slots
+        mask = len(slots) - 1
+        i = hash(ip) & mask
+        free = None
+        while True:
+            row = slots[i]
+            if row == _EMPTY:
+                return None, (i if free is None else free)
+            if row == _TOMBSTONE:
+                if free is None:
+                    free = i
+            elif self.ips[row] == ip:
+                return i, free
+            i = (i + 1) & mask
+
+    def _rebuild(self, size):
+        self._slots = array('i', [_EMPTY]) * size
+        self._used = len(self.ips)
+        mask = size - 1
+        for row, ip in enumerate(self.ips):
+            i = hash(ip) & mask
+            while self._slots[i] != _EMPTY:
+                i = (i + 1) & mask
+            self._slots[i] = row
+
+    def row(self, ip):
+        """Riga dell'host oppure None."""
+        slot, _ = self._probe(ip)
+        return None if slot is None else self._slots[slot]
+
+    def add(self, ip, status=None):
+        slot, free = self._probe(ip)
+        if slot is not None:
+            return self._slots[slot]
+        row = len(self.ips)
+        if self._slots[free] == _EMPTY:
+            self._used += 1
+        self._slots[free] = row
+        self.ips.append(ip)
+        hi, lo = pack_ip(ip)
+        self.addr_hi.append(hi)
+        self.addr_lo.append(lo)
+        self.state.append(STATE_CODES[status])
+        self.changed.append(0)
+        self.down_since.append(0)
+        self.attempts.append(0)
+        self.next_due.append(0)
+        self.next_check.append(0)
+        self.last_ok.append(0)
+        self.rtt.append(_NAN)
+        self.loss.append(_NAN)
+        self.jitter.append(_NAN)
+        self.srtt.append(_NAN)
+        self.rttvar.append(_NAN)
+        # fattore di carico massimo 2/3
+        if self._used * 3 >= len(self._slots) * 2:
+            self._rebuild(len(self._slots) * 2)
+        return row
+
+    def remove(self, ip):
+        """Rimuove la riga spostando al suo posto l'ultima (gli array restano compatti)."""
+        slot, _ = self._probe(ip)
+        if slot is None:
+            raise KeyError(ip)
+        row = self._slots[slot]
+        self._slots[slot] = _TOMBSTONE
+        last = len(self.ips) - 1
+        columns = (self.ips, self.addr_hi, self.addr_lo, self.state, self.changed, self.down_since,
+                   self.attempts, self.next_due, self.next_check, self.last_ok,
+                   self.rtt, self.loss, self.jitter, self.srtt, self.rttvar)
+        if row != last:
+            moved, _ = self._probe(self.ips[last])
+            self._slots[moved] = row
+            for col in columns:
+                col[row] = col[last]
+        for col in columns:
+            col.pop()
+
+    def sync(self, ips):
+        """Allinea la tabella all'elenco di IP configurati (aggiunge i nuovi, rimuove gli assenti)."""
+        wanted = set(ips)
+        for ip in [ip for ip in self.ips if ip not in wanted]:
+            self.remove(ip)
+        for ip in ips:
+            self.add(ip)
+        # elimina i tombstone accumulati dalle rimozioni
+        size = 8
+        while len(self.ips) * 3 >= size * 2:
+            size *= 2
+        self._rebuild(size)
+
+    def get_state(self, ip):
+        row = self.row(ip)
+        if row is None:
+            raise KeyError(ip)
+        return STATES[self.state[row]]
+
+    def set_state(self, ip, status, ts=None):
+        row = self.add(ip)
+        code = STATE_CODES[status]
+        if self.state[row] != code:
+            self.state[row] = code
+            self.changed[row] = to_epoch(ts or self.clock())
+        return row
+
+    def set_metrics(self, ip, stats):
+        row = self.add(ip)
+        self.rtt[row] = _NAN if stats.get('rtt_avg') is None else stats['rtt_avg']
+        self.loss[row] = _NAN if stats.get('loss') is None else stats['loss']
+        self.jitter[row] = _NAN if stats.get('jitter') is None else stats['jitter']
+
+    # --- forme dict ai confini di I/O -------------------------------------
+
+    def status_dict(self):
+        return {ip: STATES[code] for ip, code in zip(self.ips, self.state)}
+
+    def metrics_dict(self):
+        out = {}
+        for ip, rtt, loss, jitter in zip(self.ips, self.rtt, self.loss, self.jitter):
+            if math.isnan(loss):
+                continue
+            out[ip] = {
+                'loss': round(loss, 1),
+                'rtt_avg': None if math.isnan(rtt) else round(rtt, 2),
+                'jitter': None if math.isnan(jitter) else round(jitter, 2),
+            }
+        return out
+
+
+    def runtime_dict(self):
+        """Stato di avanzamento per host da salvare nel checkpoint (solo gli host con valori non nulli)."""
+        out = {}
+        for ip, changed, ds, att, due in zip(self.ips, self.changed, self.down_since, self.attempts, self.next_due):
+            entry = {}
+            if changed:
+                entry['changed'] = changed
+            if ds:
+                entry['down_since'] = ds
+            if att:
+                entry['attempts'] = att
+            if due:
+                entry['next_due'] = due
+            if entry:
+                out[ip] = entry
+        return out
+
+    def restore_runtime(self, ip, runtime, metrics=None):
+        """Ripristina lo stato di avanzamento (runtime_dict) e l'ultima misura (metrics_dict) di un host noto."""
+        row = self.row(ip)
+        if row is None:
+            return
+        runtime = runtime or {}
+        self.changed[row] = to_epoch(runtime.get('changed'))
+        self.down_since[row] = to_epoch(runtime.get('down_since'))
+        self.attempts[row] = min(int(runtime.get('attempts') or 0), 65535)
+        self.next_due[row] = to_epoch(runtime.get('next_due'))
+        if metrics:
+            self.set_metrics(ip, metrics)
+
+
+class StatusView(MutableMapping):
+    """Vista dict ip -> stato (stringa) sopra HostTable."""
+
+    def __init__(self, table):
+        self.table = table
+
+    def __getitem__(self, ip):
+        return self.table.get_state(ip)
+
+    def __setitem__(self, ip, status):
+        self.table.set_state(ip, status)
+
+    def __delitem__(self, ip):
+        self.table.remove(ip)
+
+    def __iter__(self):
+        return iter(list(self.table.ips))
+
+    def __len__(self):
+        return len(self.table)
+
+    def __contains__(self, ip):
+        return ip in self.table
+
+
+class DownTimesView(MutableMapping):
+    """Vista dict ip -> datetime di inizio DOWN sopra HostTable (solo gli host con inizio DOWN registrato)."""
+
+    def __init__(self, table, tz):
+        self.table = table
+        self.tz = tz
+
+    def __getitem__(self, ip):
+        row = self.table.row(ip)
+        if row is None or not self.table.down_since[row]:
+            raise KeyError(ip)
+        return datetime.fromtimestamp(self.table.down_since[row], self.tz)
+
+    def __setitem__(self, ip, when):
+        self.table.down_since[self.table.add(ip)] = to_epoch(when.timestamp())
+
+    def __delitem__(self, ip):
+        row = self.table.row(ip)
+        if row is None or not self.table.down_since[row]:
+            raise KeyError(ip)
+        self.table.down_since[row] = 0
+
+    def __iter__(self):
+        return iter([ip for ip, ds in zip(self.table.ips, self.table.down_since) if ds])
+
+    def __len__(self):
+        return sum(1 for ds in self.table.down_since if ds)
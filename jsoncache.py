@@ -0,0 +1,82 @@
+"""
+Cache dei file JSON già letti (connections.json, status.json) per i consumer di lunga durata.
+
+La chiave di validità è (st_dev, st_ino, st_mtime_ns, st_size): se il file non è cambiato
+basta una stat per restituire la struttura già parsata. La scrittura atomica con os.replace
+crea un nuovo inode, quindi invalida sempre la voce. I dati restituiti sono immutabili
+(dict -> MappingProxyType, list -> tuple) perché condivisi tra chiamanti; usare thaw()
+per ottenerne una copia modificabile.
+"""
+import os
+import json
+from types import MappingProxyType
+from threading import Lock
+import portalocker
+
+
+def freeze(obj):
+    if isinstance(obj, dict):
+        return MappingProxyType({k: freeze(v) for k, v in obj.items()})
+    if isinstance(obj, list):
+        return tuple(freeze(v) for v in obj)
+    return obj
+
+
+def thaw(obj):
+    if isinstance(obj, MappingProxyType):
+        return {k: thaw(v) for k, v in obj.items()}
+    if isinstance(obj, tuple):
+        return [thaw(v) for v in obj]
+    return obj
+
+
+def _stat_key(st):
+    return (st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+class JsonFileCache:
+    def __init__(self):
+        self._entries = {}      # path -> (chiave stat, dati immutabili)
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, path):
+        """Restituisce il contenuto parsato (immutabile) di path, None se il file non esiste.
+        Un file vuoto vale None. Solleva ValueError se il JSON non è valido."""
+        try:
+            key = _stat_key(os.stat(path))
+        except FileNotFoundError:
+            with self._lock:
+                self._entries.pop(path, None)
+            return None
+        with self._lock:
+            entry = self._entries.get(path)
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        with open(path, 'r') as f:
+            portalocker.lock(f, portalocker.LOCK_SH)
+            try:
+                # la chiave viene dal file effettivamente aperto (potrebbe essere stato sostituito nel frattempo)
+                key = _stat_key(os.fstat(f.fileno()))
+                content = f.read()
+            finally:
+                portalocker.unlock(f)
+        data = freeze(json.loads(content)) if content.strip() else None
+        with self._lock:
+            self._entries[path] = (key, data)
+        return data
+
+    def invalidate(self, path=None):
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(path, None)
+
+
+# cache condivisa dal processo
+file_cache = JsonFileCache()
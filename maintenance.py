@@ -0,0 +1,273 @@
+"""
+Finestre di manutenzione programmata: durante una finestra gli host coinvolti sono sondati
+meno spesso, le conferme DOWN non partono e le email sono soppresse; alla fine della finestra
+gli host vengono verificati subito tutti insieme.
+
+Le finestre sono in MP_MAINTENANCE_FILE (default /opt/mp_ping/maintenance.json), una lista di:
+  {"id": "eolo-notte", "name": "Lavori EOLO", "targets": ["group:EOLO", "10.20.0.0/22", "1.2.3.4"],
+   "start": 1767225600, "end": 1767232800}                 finestra singola (epoch)
+  {"id": "backup", "targets": [...], "cron": "0 2 * * 0", "duration": 7200}
+                                                           ricorrente: inizio cron, durata in secondi
+I target sono IP/hostname (come nel campo `ip` della connessione), gruppi (`group:NOME`, vedi
+monitor.connection_group) o reti CIDR. Le espressioni cron (minuto ora giorno mese giorno-settimana,
+con *, liste, intervalli e passi) sono valutate nel fuso Europe/Rome.
+
+Le occorrenze dei prossimi MP_MAINTENANCE_HORIZON secondi (default 7 giorni) sono espanse per host
+in un indice di intervalli ordinati e fusi: sapere se un host è in manutenzione costa una bisect,
+O(log n) nel numero di intervalli dell'host.
+"""
+import os
+import json
+import ipaddress
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+import portalocker
+from jsoncache import file_cache, thaw
+
+DEFAULT_PATH = '/opt/mp_ping/maintenance.json'
+DEFAULT_HORIZON = 7 * 86400
+LOCAL_TZ = ZoneInfo('Europe/Rome')
+
+# (nome, minimo, massimo) dei campi cron
+CRON_FIELDS = (('minuto', 0, 59), ('ora', 0, 23), ('giorno', 1, 31), ('mese', 1, 12), ('giorno-settimana', 0, 7))
+
+
+def _parse_cron_field(spec, name, low, high):
+    values = set()
+    for part in spec.split(','):
+        expr, _, step = part.partition('/')
+        step = int(step) if step else 1
+        if expr == '*':
+            first, last = low, high
+        elif '-' in expr:
+            first, last = (int(v) for v in expr.split('-', 1))
+        else:
+            first = last = int(expr)
+            if step > 1:
+                last = high
+        if step < 1 or first < low or last > high or first > last:
+            raise ValueError(f"campo {name} fuori intervallo: '{spec}'")
+        values.update(range(first, last + 1, step))
+    return values
+
+
+def parse_cron(expr):
+    """'M H DOM MON DOW' -> (minuti, ore, giorni, mesi, giorni settimana, dom ristretto, dow ristretto).
+    Solleva ValueError se l'espressione non è valida."""
+    fields = expr.split()
+    if len(fields) != 5:
+        raise ValueError(f"Espressione cron non valida: '{expr}' (servono 5 campi: minuto ora giorno mese giorno-settimana)")
+    try:
+        parsed = [_parse_cron_field(f, *spec) for f, spec in zip(fields, CRON_FIELDS)]
+    except ValueError as e:
+        raise ValueError(f"Espressione cron non valida: '{expr}' ({e})")
+    dow = {d % 7 for d in parsed[4]}    # 0 e 7 sono entrambi domenica
+    return parsed[0], parsed[1], parsed[2], parsed[3], dow, fields[2] != '*', fields[4] != '*'
+
+
+def cron_occurrences(expr, since, until, tz=LOCAL_TZ):
+    """Istanti (epoch) in [since, until) che soddisfano l'espressione cron, in ordine."""
+    minutes, hours, days, months, dows, dom_set, dow_set = parse_cron(expr)
+    out = []
+    day = datetime.fromtimestamp(since, tz).date()
+    last = datetime.fromtimestamp(until, tz).date()
+    while day <= last:
+        if day.month in months:
+            dom_ok = day.day in days
+            dow_ok = (day.weekday() + 1) % 7 in dows
+            # come in cron: con giorno e giorno-settimana entrambi ristretti basta uno dei due
+            if (dom_ok or dow_ok) if dom_set and dow_set else (dom_ok and dow_ok):
+                for h in sorted(hours):
+                    for m in sorted(minutes):
+                        ts = datetime(day.year, day.month, day.day, h, m, tzinfo=tz).timestamp()
+                        if since <= ts < until:
+                            out.append(ts)
+        day += timedelta(days=1)
+    return out
+
+
+def validate_window(window):
+    """Controlla e normalizza una finestra (dict). Solleva ValueError se non valida."""
+    w = dict(window)
+    if not w.get('id'):
+        raise ValueError('Finestra di manutenzione senza id')
+    targets = w.get('targets')
+    if isinstance(targets, str):
+        targets = [targets]
+    if not targets:
+        raise ValueError(f"Finestra {w['id']}: nessun target (IP, group:NOME o CIDR)")
+    for t in targets:
+        if '/' in t and not t.startswith('group:'):
+            try:
+                ipaddress.ip_network(t, strict=False)
+            except ValueError:
+                raise ValueError(f"Finestra {w['id']}: rete non valida '{t}'")
+    w['targets'] = [str(t).strip() for t in targets]
+    if w.get('cron'):
+        parse_cron(w['cron'])
+        w['duration'] = float(w.get('duration') or 0)
+        if w['duration'] <= 0:
+            raise ValueError(f"Finestra {w['id']}: durata mancante per la finestra ricorrente")
+    else:
+        if w.get('start') is None or w.get('end') is None:
+            raise ValueError(f"Finestra {w['id']}: indicare start/end oppure cron/duration")
+        w['start'], w['end'] = float(w['start']), float(w['end'])
+        if w['end'] <= w['start']:
+            raise ValueError(f"Finestra {w['id']}: la fine deve seguire l'inizio")
+    return w
+
+
+def window_occurrences(window, since, until):
+    """Intervalli (inizio, fine) della finestra che si sovrappongono a [since, until)."""
+    if window.get('cron'):
+        duration = window['duration']
+        return [(s, s + duration) for s in cron_occurrences(window['cron'], since - duration, until)
+                if s + duration > since]
+    if window['end'] > since and window['start'] < until:
+        return [(window['start'], window['end'])]
+    return []
+
+
+class IntervalIndex:
+    """Intervalli [inizio, fine) per chiave, ordinati e fusi: ricerca con bisect in O(log n)."""
+
+    def __init__(self):
+        self._starts = {}
+        self._ends = {}
+
+    def __len__(self):
+        return len(self._starts)
+
+    def add(self, key, start, end):
+        self._starts.setdefault(key, []).append((start, end))
+
+    def build(self):
+        """Ordina e fonde gli intervalli aggiunti: da chiamare dopo gli add, prima delle ricerche."""
+        for key, intervals in self._starts.items():
+            merged = []
+            for start, end in sorted(intervals):
+                if merged and start <= merged[-1][1]:
+                    merged[-1][1] = max(merged[-1][1], end)
+                else:
+                    merged.append([start, end])
+            self._starts[key] = [s for s, _ in merged]
+            self._ends[key] = [e for _, e in merged]
+
+    def find(self, key, t):
+        """Fine dell'intervallo della chiave che contiene t, None se t non cade in nessun intervallo."""
+        starts = self._starts.get(key)
+        if not starts:
+            return None
+        i = bisect_right(starts, t) - 1
+        if i >= 0 and t < self._ends[key][i]:
+            return self._ends[key][i]
+        return None
+
+    def next_start(self, key, t):
+        """Inizio del primo intervallo della chiave successivo a t (None se non ce ne sono)."""
+        starts = self._starts.get(key)
+        if not starts:
+            return None
+        i = bisect_right(starts, t)
+        return starts[i] if i < len(starts) else None
+
+
+class MaintenanceSchedule:
+    def __init__(self, path=None, horizon=None):
+        self.path = path if path is not None else os.environ.get('MP_MAINTENANCE_FILE', DEFAULT_PATH)
+        self.horizon = float(horizon or os.environ.get('MP_MAINTENANCE_HORIZON', DEFAULT_HORIZON))
+        self.index = IntervalIndex()
+        self._source = None         # (dati del file, elenco connessioni, lunghezza) dell'indice
+        self._until = 0.0           # fine dell'orizzonte espanso
+
+    def load(self):
+        """Finestre configurate (lista di dict modificabili); [] se il file non esiste o non è configurato."""
+        if not self.path:
+            return []
+        data = file_cache.load(self.path)
+        return thaw(data) if data is not None else []
+
+    def save(self, windows):
+        with open(self.path, 'w') as f:
+            portalocker.lock(f, portalocker.LOCK_EX)
+            json.dump(windows, f, indent=4)
+            portalocker.unlock(f)
+        file_cache.invalidate(self.path)
+
+    def add(self, window):
+        """Aggiunge (o sostituisce, a parità di id) una finestra. Solleva ValueError se non valida."""
+        window = validate_window(window)
+        windows = [w for w in self.load() if w.get('id') != window['id']]
+        windows.append(window)
+        self.save(windows)
+        return window
+
+    def remove(self, window_id):
+        windows = self.load()
+        kept = [w for w in windows if w.get('id') != window_id]
+        if len(kept) != len(windows):
+            self.save(kept)
+        return len(windows) - len(kept)
+
+    def refresh(self, connections, now, group=None):
+        """Ricostruisce l'indice se il file o le connessioni sono cambiati, o se l'orizzonte espanso
+        sta per finire. `group(conn)` restituisce il gruppo della connessione (target group:NOME)."""
+        try:
+            data = file_cache.load(self.path) if self.path else None
+        except (OSError, ValueError):
+            data = self._source[0] if self._source else None   # file in scrittura o non valido: teniamo l'indice
+        source = (data, connections, len(connections))
+        if (self._source is not None and all(a is b for a, b in zip(source[:2], self._source[:2]))
+                and source[2] == self._source[2] and now < self._until - self.horizon / 2):
+            return False
+        self._source = source
+        self._until = now + self.horizon
+        self.index = self._build(thaw(data) if data else [], connections, now, group)
+        return True
+
+    def _build(self, windows, connections, now, group):
+        index = IntervalIndex()
+        for raw in windows:
+            try:
+                window = validate_window(raw)
+            except (ValueError, TypeError):
+                continue
+            occurrences = window_occurrences(window, now, self._until)
+            if not occurrences:
+                continue
+            for ip in window_hosts(window, connections, group):
+                for start, end in occurrences:
+                    index.add(ip, start, end)
+        index.build()
+        return index
+
+    def active_until(self, ip, now):
+        """Fine della manutenzione in corso per l'IP, None se l'host non è in manutenzione."""
+        return self.index.find(ip, now)
+
+    def next_start(self, ip, now):
+        return self.index.next_start(ip, now)
+
+
+def window_hosts(window, connections, group=None):
+    """IP delle connessioni coinvolte dalla finestra (target esatti, group:NOME, reti CIDR)."""
+    exact, groups, networks = set(), set(), []
+    for t in window['targets']:
+        if t.startswith('group:'):
+            groups.add(t[len('group:'):].strip())
+        elif '/' in t:
+            networks.append(ipaddress.ip_network(t, strict=False))
+        else:
+            exact.add(t)
+    return [conn['ip'] for conn in connections
+            if conn['ip'] in exact or (groups and group and group(conn) in groups)
+            or (networks and _in_networks(conn['ip'], networks))]
+
+
+def _in_networks(ip, networks):
+    try:
+        addr = ipaddress.ip_address(ip)
+    except ValueError:
+        return False    # hostname: solo target esatti o per gruppo
+    return any(addr in net for net in networks)
@@ -1,21 +1,68 @@
 import os
 import json
 import time
+import queue
 import logging
 import portalocker
-from datetime import datetime
+import numpy as np
+from datetime import timezone
+from functools import partial
 from zoneinfo import ZoneInfo
 from ping3 import ping
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from threading import Lock, Event, Thread
+from history import TransitionLog
+from store import SqliteStore
+from jsoncache import file_cache, thaw
+from hosttable import HostTable, StatusView, DownTimesView, STATE_CODES, to_epoch
+from collections.abc import Mapping, Sequence
+from shmstatus import ShmStatusWriter, DEFAULT_PATH as SHM_DEFAULT_PATH
+from probes import IcmpProber, EchoPipeline, TcpProber, parse_probe, summarize, format_stats
+from pacer import Pacer
+from anomaly import LatencyDetector
+from resolver import ResolverCache, normalize_target, is_ip
+from feed import ChangeFeed, transition_event, DEFAULT_PATH as FEED_DEFAULT_PATH
+from clock import SystemClock
+from maintenance import MaintenanceSchedule
+from rto import AdaptiveTimeout
+from scheduler import load_tier_config, connection_tier, parse_tier, wfq_order, DetectStats
+
+
+# esiti di _probe_one diversi da un RTT: hostname non risolto, risoluzione DNS ancora in corso
+_UNRESOLVED = object()
+_RESOLVING = object()
+
+
+def _icmp_ping(ip, timeout):
+    # risolto a runtime così i test possono sostituire monitor.ping
+    return ping(ip, timeout=timeout)
+
+
+def connection_group(conn):
+    """Gruppo di appartenenza di una connessione: campo 'group' se presente,
+    altrimenti il prefisso del nome prima di ' - ' (es. 'EOLO - Cliente' -> 'EOLO')."""
+    group = conn.get('group')
+    if group:
+        return group
+    name = conn.get('name') or ''
+    if ' - ' in name:
+        return name.split(' - ', 1)[0].strip()
+    return ''
 
 class Monitor:
-    def __init__(self, config_path=None, status_path=None, interval=None):
+    def __init__(self, config_path=None, status_path=None, interval=None, history_path=None, db_path=None,
+                 clock=None):
         self.config_path = config_path or os.environ.get('MP_PING_CONFIG', '/opt/mp_ping/connections.json')
         self.status_path = status_path or os.environ.get('MP_STATUS_FILE', '/opt/mp_ping/status.json')
+        self.history_path = history_path or os.environ.get('MP_HISTORY_FILE', '/opt/mp_ping/history.jsonl')
         self.interval = interval or int(os.environ.get('MP_PING_INTERVAL', 900))
+        # backend SQLite opzionale: se configurato sostituisce connections.json e history.jsonl
+        self.db_path = db_path if db_path is not None else os.environ.get('MP_PING_DB')
+        self.store = SqliteStore(self.db_path) if self.db_path else None
+        # ora e attese passano dal clock (VirtualClock per simulazioni e test a tempo accelerato)
+        self.clock = clock if clock is not None else SystemClock()
 
         # parametri retry per conferma DOWN
         self.retries = int(os.environ.get('MP_PING_RETRIES', 10))
@@ -23,24 +70,106 @@ class Monitor:
 
         self.lock = Lock()
         self.connections = self.load_connections()
-        # carica stato iniziale da snapshot se presente
+        self._conn_index = None     # (elenco, lunghezza, {ip: connessione}) per _connection
+        # carica stato iniziale da snapshot (o dal database) se presente, compreso lo stato di
+        # avanzamento per host (inizio DOWN, tentativi di conferma, prossimo tentativo, ultimo RTT);
+        # status.json si legge anche con il database per gli host silenziati dalla manutenzione
         snapshot = self._read_json_with_lock(self.status_path) or {}
-        last = snapshot.get('last_status') if isinstance(snapshot, dict) else None
-        if isinstance(last, dict):
-            self.last_status = {conn['ip']: last.get(conn['ip']) for conn in self.connections}
+        if not isinstance(snapshot, Mapping):
+            snapshot = {}
+        if self.store:
+            states = self.store.get_states()
+            last = {ip: st['status'] for ip, st in states.items()}
+            runtime = {ip: {'changed': st['since'], 'down_since': st['down_since'],
+                            'attempts': st['attempts'], 'next_due': st['next_due']} for ip, st in states.items()}
+            metrics = {ip: {'rtt_avg': st['rtt']} for ip, st in states.items() if st['rtt'] is not None}
         else:
-            self.last_status = {conn['ip']: None for conn in self.connections}
-        
+            last = snapshot.get('last_status')
+            runtime = snapshot.get('runtime')
+            metrics = snapshot.get('metrics')
+        # host messi DOWN senza avvisi durante una manutenzione
+        maintenance = snapshot.get('maintenance')
+        silenced = maintenance.get('silenced') if isinstance(maintenance, Mapping) else None
+        if not isinstance(last, Mapping):
+            last = {}
+        if not isinstance(runtime, Mapping):
+            runtime = {}
+        if not isinstance(metrics, Mapping):
+            metrics = {}
+
+        # stato runtime degli host in una tabella compatta (array paralleli); last_status e
+        # down_times sono viste dict sulla tabella, i dict JSON si producono solo in dump_status
         self.local_tz = ZoneInfo('Europe/Rome')
-        self.down_times = {}
+        self.hosts = HostTable(clock=self.clock.time)
+        for conn in self.connections:
+            ip = conn['ip']
+            st = last.get(ip)
+            self.hosts.add(ip, st if st in STATE_CODES else None)
+            self.hosts.restore_runtime(ip, runtime.get(ip), metrics.get(ip))
+        self.last_status = StatusView(self.hosts)
+        self.silenced = set(silenced) if isinstance(silenced, Sequence) and not isinstance(silenced, str) else set()
+        self.down_times = DownTimesView(self.hosts, self.local_tz)
         self.logger = self.setup_logger()
 
         # controllo del loop e struttura per retry threads
         self.running = Event()
         self.running.set()
+        self._wake = Event()        # interrompe l'attesa tra due cicli (stop, nuove connessioni)
         self.retry_threads = {}     # ip -> Thread
         self.retry_lock = Lock()    # protegge retry_threads
 
+        # checkpoint dello stato durante le conferme (oltre a quello di fine ciclo)
+        self.checkpoint_interval = int(os.environ.get('MP_CHECKPOINT_INTERVAL', 30))
+        self.dump_lock = Lock()     # un solo writer di status.json alla volta
+        self._last_checkpoint = 0.0
+        self._dirty = False         # stato cambiato dalle conferme e non ancora scritto
+
+        # segmento di memoria condivisa con lo stato live (aperto solo dal daemon in run_monitor_loop)
+        self.shm_path = os.environ.get('MP_SHM_PATH', SHM_DEFAULT_PATH)
+        self.shm = None
+
+        # feed delle transizioni per i sottoscrittori locali (`monitor watch`), aperto in run_monitor_loop
+        self.feed_path = os.environ.get('MP_FEED_SOCKET', FEED_DEFAULT_PATH)
+        self.feed = None
+
+        # storico delle transizioni (usato da `monitor report`)
+        self.history = self.store.history if self.store else TransitionLog(self.history_path)
+
+        # backend di probe selezionati dal campo `probe` della connessione
+        self.probe_timeout = 2
+        # secondi concessi ai probe di un ciclo (0 = nessun limite): gli host rimasti passano al ciclo dopo
+        self.cycle_deadline = float(os.environ.get('MP_CYCLE_DEADLINE', 0))
+        # timeout per host ricavati dagli RTT recenti (MP_ADAPTIVE_TIMEOUT=0 per il timeout fisso)
+        self.timeouts = AdaptiveTimeout(self.probe_timeout)
+        # risoluzione asincrona (con cache TTL) dei target indicati per hostname
+        self.resolver = ResolverCache()
+        # unico limitatore ICMP per ciclo, conferme e raffiche
+        self.pacer = Pacer()
+        self._sync_pacer_groups()
+        self.probers = {
+            'icmp': IcmpProber(_icmp_ping, pacer=self.pacer, pipeline=EchoPipeline(pacer=self.pacer)),
+            'tcp': TcpProber(),
+        }
+
+        # tier di priorità: ordine weighted-fair nel ciclo, intervalli e concorrenza riservata
+        self.tiers = load_tier_config()
+        self.detect_stats = DetectStats()
+
+        # finestre di manutenzione: probe diradati, niente conferme né email, verifica alla fine
+        self.maintenance = MaintenanceSchedule()
+        self.maintenance_factor = float(os.environ.get('MP_MAINTENANCE_INTERVAL_FACTOR', 4))
+
+        # analisi di latenza sull'intera flotta a fine ciclo (MP_ANOMALY=0 per disattivarla)
+        self.anomaly = LatencyDetector() if os.environ.get('MP_ANOMALY', '1') != '0' else None
+
+        # modalità multi-probe: N echo per host per ciclo e soglie dello stato DEGRADED
+        self.burst = int(os.environ.get('MP_PING_BURST', 1))
+        self.degraded_thresholds = {
+            'loss': float(os.environ.get('MP_DEGRADED_LOSS', 20)),          # % pacchetti persi
+            'rtt_ms': float(os.environ.get('MP_DEGRADED_RTT_MS', 0)),       # 0 = disabilitata
+            'jitter_ms': float(os.environ.get('MP_DEGRADED_JITTER_MS', 0)), # 0 = disabilitata
+        }
+
 
     def _atomic_write_json(self, path: str, data):
         tmp = path + '.tmp'
@@ -49,45 +178,133 @@ class Monitor:
             f.flush()
             os.fsync(f.fileno())
         os.replace(tmp, path)
+        file_cache.invalidate(path)
 
 
     def _read_json_with_lock(self, path, lock_mode='r'):
-        """Legge un JSON con portalocker (shared lock). Restituisce None se non esiste o errore."""
-        if not os.path.exists(path):
-            return None
+        """Legge un JSON con portalocker (shared lock). Restituisce None se non esiste o errore.
+        Il risultato è immutabile e condiviso: se il file non è cambiato (stessa stat) non viene riparsato."""
         try:
-            with open(path, lock_mode) as f:
-                # lock shared per lettura
-                portalocker.lock(f, portalocker.LOCK_SH)
-                try:
-                    data = json.load(f)
-                finally:
-                    portalocker.unlock(f)
-            return data
+            return file_cache.load(path)
         except Exception:
             return None
-        
 
-    def _confirm_down_worker(self, name, ip):
+
+    def _set_status(self, ip, status, name=None):
+        """Imposta last_status[ip] e registra la transizione nello storico se lo stato cambia.
+        Restituisce lo stato precedente."""
+        with self.lock:
+            prev = self.last_status.get(ip)
+            self.last_status[ip] = status
+            if prev != status and self.shm:
+                self._publish_row(ip)
+        if prev != status:
+            ts = self.clock.time()
+            if self.feed:
+                self.feed.publish(transition_event(ip, name, prev, status, ts))
+            try:
+                if self.store:
+                    self.store.set_state(ip, status, ts)
+                self.history.append(ip, name, prev, status, ts)
+            except Exception as e:
+                self.logger.error(f"Errore scrittura storico transizioni per {ip}: {e}")
+        return prev
+
+
+    def _open_shm(self):
+        """Crea il segmento di memoria condivisa per i lettori live (disattivato con MP_SHM_PATH vuota)."""
+        if not self.shm_path:
+            return
+        try:
+            self.shm = ShmStatusWriter(self.shm_path, capacity=max(1024, 2 * len(self.hosts)))
+            with self.lock:
+                self.shm.publish(self.hosts)
+        except Exception as e:
+            self.shm = None
+            self.logger.error(f"Impossibile creare il segmento condiviso {self.shm_path}: {e}")
+
+
+    def _open_feed(self):
+        """Apre il socket del feed delle transizioni (disattivato con MP_FEED_SOCKET vuota).
+        Un feed già impostato (es. la coda della GUI) viene mantenuto."""
+        if not self.feed_path or self.feed:
+            return
+        try:
+            self.feed = ChangeFeed(self.feed_path)
+        except Exception as e:
+            self.feed = None
+            self.logger.error(f"Impossibile aprire il feed {self.feed_path}: {e}")
+
+
+    def _publish_row(self, ip):
+        # chiamare con self.lock acquisito: il seqlock richiede un solo scrittore alla volta
+        try:
+            row = self.hosts.row(ip)
+            if row is not None:
+                self.shm.update_row(self.hosts, row)
+        except Exception as e:
+            self.logger.error(f"Errore aggiornamento segmento condiviso per {ip}: {e}")
+
+
+    def _set_attempts(self, ip, n, next_due=0.0):
+        """Aggiorna il contatore dei tentativi di conferma eseguiti e l'istante del prossimo tentativo."""
+        with self.lock:
+            row = self.hosts.row(ip)
+            if row is not None:
+                self.hosts.attempts[row] = n
+                self.hosts.next_due[row] = to_epoch(next_due)
+
+
+    def _confirm_down_worker(self, name, ip, start=0, first_delay=None):
         """Worker che esegue self.retries tentativi a intervalli self.retry_interval.
         Se uno dei tentativi torna UP, si cancella la conferma e si riporta lo stato a UP.
         Se tutti falliscono, si invia la mail di DOWN e si imposta lo stato a DOWN.
+        Dopo un riavvio riprende dal tentativo `start`, attendendo `first_delay` secondi per il primo.
+        È un generatore che restituisce i secondi da attendere prima di ogni tentativo: lo esegue
+        self.clock (thread con attese reali o tempo virtuale, vedi clock.py).
         """
         try:
-            for attempt in range(self.retries):
-                # aspetta il retry interval
-                time.sleep(self.retry_interval)
+            attempt, delay = start, first_delay
+            pending_dns = 0     # tentativi con la risoluzione DNS ancora in corso
+            while attempt < self.retries:
+                # aspetta il retry interval (o il tempo residuo del tentativo interrotto dal riavvio)
+                delay = self.retry_interval if delay is None else delay
+                self._set_attempts(ip, attempt, self.clock.time() + delay)
+                yield delay
+                delay = None
+
+                if self._in_maintenance(ip, refresh=True) is not None:
+                    # finestra di manutenzione iniziata durante la conferma: DOWN senza email,
+                    # la verifica a fine finestra riavvia la conferma se l'host non è tornato
+                    if self.last_status.get(ip) == 'CHECKING':
+                        self._silence_down(name, ip)
+                    return
 
                 try:
-                    resp = ping(ip, timeout=2)
+                    # l'ultimo tentativo usa il timeout fisso: un host solo più lento del solito
+                    # non viene mai confermato DOWN dai timeout adattivi
+                    resp = self._probe_one(ip, adaptive=attempt < self.retries - 1)
                 except Exception as e:
                     self.logger.debug(f"Errore ping in confirm worker per {ip}: {e}")
                     resp = None
 
+                if resp is _RESOLVING:
+                    # DNS lento: il tentativo non dice nulla sull'host e viene ripetuto, ma al massimo
+                    # self.retries volte; poi il nome conta come non risolto (UNRESOLVED, non DOWN)
+                    pending_dns += 1
+                    self.logger.debug(f"Confirm attempt {attempt+1}/{self.retries} per {ip}: risoluzione DNS in corso "
+                                      f"({pending_dns}/{self.retries}).")
+                    if pending_dns < self.retries:
+                        continue
+                    resp = _UNRESOLVED
+                if resp is _UNRESOLVED:
+                    # il nome non si risolve più: stato UNRESOLVED, distinto da DOWN, e fine della conferma
+                    self.logger.info(f"{name} ({ip}) non risolto durante la conferma: nessuna email DOWN.")
+                    self._apply_unresolved({**self._connection(ip), 'name': name})
+                    return
                 if resp:
                     # recovered during confirmation
-                    with self.lock:
-                        self.last_status[ip] = 'UP'
+                    self._set_status(ip, 'UP', name)
                     self.logger.info(f"{name} ({ip}) recuperato durante conferma (attempt {attempt+1}). Nessuna email DOWN inviata.")
                     # rimuovi eventuale down_time se impostato
                     if ip in self.down_times:
@@ -95,13 +312,16 @@ class Monitor:
                     break
                 else:
                     self.logger.debug(f"Confirm attempt {attempt+1}/{self.retries} per {ip} ancora DOWN.")
+                    self._set_attempts(ip, attempt + 1)
+                    self._checkpoint()
+                    attempt += 1
 
             else:
                 # eseguito se il loop non ha fatto break: tutti i tentativi falliti -> conferma DOWN
-                with self.lock:
-                    self.last_status[ip] = 'DOWN'
+                self._set_status(ip, 'DOWN', name)
                 # registra down start time
-                self.down_times[ip] = datetime.now(self.local_tz)
+                self.down_times[ip] = self.clock.now(self.local_tz)
+                self._record_detect(ip, 'confirm')
                 # invia email DOWN
                 self.logger.info(f"{name} ({ip}) DOWN confermato dopo {self.retries} tentativi.")
                 try:
@@ -112,6 +332,10 @@ class Monitor:
                     self.logger.error(f"Errore invio email DOWN per {ip}: {e}")
 
         finally:
+            self._set_attempts(ip, 0)
+            # niente scrittura forzata: in una raffica di disservizi sarebbero N riscritture complete
+            # (se l'intervallo non è trascorso _checkpoint lascia la modifica al loop)
+            self._checkpoint()
             # cleanup: rimuovi il thread dalla mappa
             with self.retry_lock:
                 try:
@@ -120,6 +344,45 @@ class Monitor:
                     pass
 
 
+    def _checkpoint(self, force=False):
+        """Salva lo stato durante le conferme, al massimo una volta ogni self.checkpoint_interval secondi
+        (o subito con force), così un riavvio riprende dal tentativo in corso. Le modifiche rimaste non
+        scritte (_dirty) sono salvate dal loop entro checkpoint_interval."""
+        now = self.clock.time()
+        # controllo e aggiornamento sotto il lock: conferme e loop concorrenti non scrivono due volte
+        with self.lock:
+            if not force and now - self._last_checkpoint < self.checkpoint_interval:
+                self._dirty = True
+                return
+            self._last_checkpoint = now
+        self.dump_status()
+
+
+    def resume_pending(self):
+        """Dopo un riavvio: riprende le conferme DOWN interrotte dal punto in cui erano e riesegue
+        subito il probe degli host DOWN o DEGRADED, senza attendere il ciclo completo.
+        Restituisce i risultati del probe prioritario."""
+        now = self.clock.time()
+        names = {c['ip']: c.get('name') for c in self.connections}
+        with self.lock:
+            h = self.hosts
+            checking = [(ip, h.attempts[row], h.next_due[row]) for row, ip in enumerate(h.ips)
+                        if h.state[row] == STATE_CODES['CHECKING'] and ip in names]
+        for ip, attempts, due in checking:
+            delay = max(0.0, due - now) if due else 0.0
+            self.logger.info(f"Ripresa conferma DOWN per {names[ip]} ({ip}) dal tentativo {attempts + 1}/{self.retries}")
+            self.schedule_confirm_down(names[ip], ip, start=min(attempts, self.retries), first_delay=delay)
+
+        pending = [c for c in self.connections if c.get('enabled', True)
+                   and self.last_status.get(c['ip']) in ('DOWN', 'DEGRADED')]
+        if not pending:
+            return []
+        probed = self._probe_targets(pending)
+        results = [self._apply_observation(conn, probed.get(conn['ip'], [None])) for conn in pending]
+        self.dump_status()
+        return results
+
+
     def setup_logger(self):
         logger = logging.getLogger('mp_ping')
         if logger.handlers:
@@ -146,55 +409,121 @@ class Monitor:
 
 
     def load_connections(self):
-        if not os.path.exists(self.config_path):
-            return []
-        with open(self.config_path, 'r') as f:
-            portalocker.lock(f, portalocker.LOCK_SH)
-            data = json.load(f)
-            portalocker.unlock(f)
-        return data
+        if self.store:
+            return self.store.list_connections()
+        # copia modificabile della struttura in cache (riparsata solo se il file è cambiato)
+        data = file_cache.load(self.config_path)
+        return thaw(data) if data is not None else []
 
 
     def save_connections(self):
         for _ in range(5):
             try:
-                with open(self.config_path, 'w') as f:
+                # file temporaneo + os.replace sotto il lock: un lettore concorrente vede il file vecchio
+                # o quello nuovo, mai uno troncato (che varrebbe come inventario vuoto)
+                with open(self.config_path, 'a') as f:
                     portalocker.lock(f, portalocker.LOCK_EX)
-                    json.dump(self.connections, f, indent=4)
-                    portalocker.unlock(f)
+                    try:
+                        tmp = self.config_path + '.tmp'
+                        with open(tmp, 'w') as out:
+                            json.dump(self.connections, out, indent=4)
+                            out.flush()
+                            os.fsync(out.fileno())
+                        os.replace(tmp, self.config_path)
+                    finally:
+                        portalocker.unlock(f)
+                file_cache.invalidate(self.config_path)
                 return
             except Exception as e:
                 self.logger.error(f'Errore salvataggio connessioni: {e}')
-                time.sleep(0.5)
+                self.clock.sleep(0.5)
         raise RuntimeError('Impossibile salvare le connessioni dopo 5 tentativi.')
 
 
-    def add_connection(self, name, ip):
-        self.connections.append({'name': name, 'ip': ip, 'enabled': True})
-        self.save_connections()
-        self.last_status[ip] = 'UNKNOWN'
+    def add_connection(self, name, ip, probe=None, tier=None):
+        """Aggiunge una connessione. Solleva ValueError se non valida o se l'IP è già presente."""
+        conn = self.new_connection(name, ip, probe=probe, tier=tier)
+        if not self.add_connections([conn]):
+            raise ValueError(f"Connessione con IP {conn['ip']} già presente")
+
+
+    def new_connection(self, name, ip, probe=None, tier=None):
+        """Costruisce (validando) il dict di una nuova connessione. Solleva ValueError se non valida."""
+        ip = normalize_target(ip)   # IPv4, IPv6 o hostname (ValueError se non valido)
+        conn = {'name': name, 'ip': ip, 'enabled': True}
+        if probe:
+            parse_probe(probe)  # valida (ValueError se non supportato)
+            conn['probe'] = probe
+        if tier:
+            conn['tier'] = parse_tier(tier)
+        return conn
+
+
+    def add_connections(self, conns):
+        """Aggiunge più connessioni con un'unica scrittura (transazione o salvataggio del JSON),
+        saltando gli IP già presenti. Restituisce le connessioni effettivamente aggiunte."""
+        if self.store:
+            added = self.store.add_connections(conns)
+            self.connections = self.store.list_connections()
+        else:
+            known = {c['ip'] for c in self.connections}
+            added = []
+            for conn in conns:
+                if conn['ip'] not in known:
+                    known.add(conn['ip'])
+                    added.append(conn)
+            if added:
+                self.connections.extend(added)
+                self.save_connections()
+        for conn in added:
+            self.last_status[conn['ip']] = 'UNKNOWN'
+        self._sync_pacer_groups()
+        return added
 
 
     def remove_connection(self, name=None, ip=None):
-        before = len(self.connections)
-        self.connections = [c for c in self.connections if not ((name and c['name'] == name) or (ip and c['ip'] == ip))]
-        self.save_connections()
-        self.last_status = {c['ip']: self.last_status.get(c['ip'], 'UNKNOWN') for c in self.connections}
-        return before - len(self.connections)
+        if self.store:
+            removed = self.store.remove_connections(name, ip)
+            self.connections = self.store.list_connections()
+        else:
+            before = len(self.connections)
+            self.connections = [c for c in self.connections if not ((name and c['name'] == name) or (ip and c['ip'] == ip))]
+            self.save_connections()
+            removed = before - len(self.connections)
+        with self.lock:
+            self.hosts.sync([c['ip'] for c in self.connections])
+        self._sync_pacer_groups()
+        return removed
 
 
-    def pause_connection(self, ip):
+    def _update_connection(self, ip, **fields):
+        """Aggiorna i campi della connessione con l'IP indicato (riga singola se c'è il database)."""
         for c in self.connections:
             if c['ip'] == ip:
-                c['enabled'] = False
-        self.save_connections()
+                c.update(fields)
+        if self.store:
+            self.store.update_connection(ip, **fields)
+        else:
+            self.save_connections()
+
+
+    def pause_connection(self, ip):
+        self._update_connection(ip, enabled=False)
 
 
     def resume_connection(self, ip):
-        for c in self.connections:
-            if c['ip'] == ip:
-                c['enabled'] = True
-        self.save_connections()
+        self._update_connection(ip, enabled=True)
+
+
+    def set_probe(self, ip, probe):
+        """Imposta il backend di probe ('icmp', 'tcp:PORT') per la connessione con l'IP indicato."""
+        parse_probe(probe)
+        self._update_connection(ip, probe=probe)
+
+
+    def set_tier(self, ip, tier):
+        """Imposta il tier di priorità (critical, high, normal, low) della connessione con l'IP indicato."""
+        self._update_connection(ip, tier=parse_tier(tier))
 
 
     def list_connections_with_status(self, filter_keyword=None):
@@ -204,9 +533,14 @@ class Monitor:
         Il filtro (filter_keyword) cerca case-insensitive su name e substring su ip.
         """
         # leggi config e status usando i path corretti (self.config_path e self.status_path)
-        conns = self._read_json_with_lock(self.config_path) or []
-        status_snapshot = self._read_json_with_lock(self.status_path) or {}
-        last = status_snapshot.get('last_status', {}) if isinstance(status_snapshot, dict) else {}
+        if self.store:
+            conns = self.store.find_connections(keyword=filter_keyword)
+            last = {c['ip']: c.pop('status') for c in conns}
+            filter_keyword = None       # già applicato dalla query
+        else:
+            conns = self._read_json_with_lock(self.config_path) or []
+            status_snapshot = self._read_json_with_lock(self.status_path) or {}
+            last = status_snapshot.get('last_status', {}) if isinstance(status_snapshot, Mapping) else {}
 
         def matches(c):
             if not filter_keyword:
@@ -240,91 +574,542 @@ class Monitor:
         e lancia un worker che esegue self.retries tentativi distanziati di self.retry_interval secondi.
         Solo se tutti i tentativi falliscono viene inviata la mail di DOWN.
         """
-        results = []
-        for conn in self.connections:
+        return self._run_cycle(self.connections)
+
+
+    def ping_due(self, now=None):
+        """Esegue il probe delle sole connessioni il cui intervallo (dipendente dal tier) è scaduto."""
+        return self._run_cycle(self.due_connections(now))
+
+
+    def due_connections(self, now=None):
+        """Connessioni il cui prossimo probe è scaduto (o mai sondate)."""
+        now = now or self.clock.time()
+        with self.lock:
+            h = self.hosts
+            due = []
+            for conn in self.connections:
+                row = h.row(conn['ip'])
+                if row is None or h.next_check[row] <= now:
+                    due.append(conn)
+        return due
+
+
+    def _run_cycle(self, conns):
+        """Ciclo completo sulle connessioni indicate: lista dei risultati di iter_results()."""
+        return list(self.iter_results(conns))
+
+
+    def iter_results(self, conns=None, deadline=None, cancel=None):
+        """
+        Probe delle connessioni indicate (default tutte) in ordine weighted-fair per tier. Ogni risultato
+        è restituito appena terminano i probe del suo host, già applicato alla macchina a stati:
+        {'name', 'ip', 'status', 'metrics', 'prev'} con prev lo stato prima del probe (transizione se diverso).
+        deadline: secondi concessi ai probe del ciclo (default MP_CYCLE_DEADLINE, 0 = nessun limite).
+        cancel: Event che interrompe il ciclo; chiudere il generatore (break, close()) ha lo stesso effetto.
+        Gli host non sondati entro la scadenza o l'interruzione restano com'erano e sono di nuovo dovuti
+        al ciclo successivo; il ciclo viene comunque chiuso (analisi latenza, prossimo probe, evento 'cycle').
+        """
+        if conns is None:
+            conns = self.connections
+        start = self.clock.time()
+        self._refresh_maintenance(start)
+        deadline = self.cycle_deadline if deadline is None else deadline
+        # la scadenza è in tempo reale: i probe durano tempo reale anche con un orologio virtuale
+        limit = time.monotonic() + deadline if deadline else None
+
+        stop = None     # senza scadenza né cancel basta la chiusura del generatore
+        if cancel is not None or limit is not None:
+            def stop():
+                return (cancel is not None and cancel.is_set()) or (limit is not None and time.monotonic() >= limit)
+
+        closed = []
+        active = {}
+        for conn in conns:
             if not conn.get('enabled', True):
                 # connessioni in pausa non riportano stato
-                with self.lock:
-                    self.last_status[conn['ip']] = 'UNKNOWN'
+                self._set_status(conn['ip'], 'UNKNOWN', conn.get('name'))
+                closed.append(conn)
                 continue
+            active[conn['ip']] = conn
+
+        # probe di tutte le connessioni attive, raggruppate per backend e numero di echo
+        stream = self._iter_scheduled(wfq_order(list(active.values()), self.tiers), stop)
+        probed = 0
+        try:
+            for ip, samples in stream:
+                conn = active[ip]
+                with self.lock:
+                    prev = self.last_status.get(ip)
+                result = self._apply_observation(conn, samples)
+                result['prev'] = prev
+                closed.append(conn)
+                probed += 1
+                yield result
+        finally:
+            stream.close()
+            self._close_cycle(start, closed, probed, len(active) - probed)
 
-            ip = conn['ip']
-            name = conn['name']
 
+    def _close_cycle(self, start, conns, probed, skipped):
+        """Fine ciclo: analisi di latenza, prossimo probe delle connessioni sondate ed evento 'cycle'."""
+        self._analyze_latency(start)
+
+        # prossimo probe secondo l'intervallo del tier (misurato dall'inizio del ciclo); in
+        # manutenzione l'intervallo è più lungo, ma mai oltre la fine della finestra
+        with self.lock:
+            for conn in conns:
+                row = self.hosts.row(conn['ip'])
+                if row is not None:
+                    self.hosts.next_check[row] = to_epoch(self._next_check(conn, start))
+        if skipped:
+            self.logger.warning(f"Ciclo chiuso dopo {self.clock.time() - start:.1f}s con {skipped} host non "
+                                f"sondati (scadenza, interruzione o DNS in attesa), dovuti al prossimo ciclo")
+        if self.feed:
+            event = {'type': 'cycle', 'ts': round(self.clock.time(), 3), 'probed': probed,
+                     'duration': round(self.clock.time() - start, 3)}
+            if skipped:
+                event['skipped'] = skipped
+            self.feed.publish(event)
+
+
+    def _iter_scheduled(self, ordered, stop=None):
+        """Probe delle connessioni già ordinate, con i risultati man mano che arrivano: i tier con
+        concorrenza riservata sono sondati in un thread parallelo con la loro quota di worker, così
+        non attendono i timeout degli altri tier."""
+        reserved_tiers = {t for t, cfg in self.tiers.items() if cfg['reserved'] > 0}
+        reserved = [c for c in ordered if connection_tier(c) in reserved_tiers]
+        if not reserved or len(reserved) == len(ordered):
+            yield from self._iter_probe_targets(ordered, stop=stop)
+            return
+        others = [c for c in ordered if connection_tier(c) not in reserved_tiers]
+        share = min(sum(self.tiers[t]['reserved'] for t in {connection_tier(c) for c in reserved}), 0.9)
+        yield from self._merge_streams(
+            [lambda halt: self._iter_probe_targets(reserved, share=share, stop=halt),
+             lambda halt: self._iter_probe_targets(others, share=1 - share, stop=halt)], stop)
+
+
+    def _merge_streams(self, producers, stop=None):
+        """Esegue i produttori (callable(stop) -> iterabile di risultati) in thread paralleli e
+        restituisce i loro risultati man mano che arrivano. Chiudere il generatore li interrompe."""
+        if len(producers) == 1:
+            yield from producers[0](stop)
+            return
+        out = queue.Queue()
+        abandoned = Event()
+
+        def halt():
+            return abandoned.is_set() or (stop is not None and stop())
+
+        def produce(make):
             try:
-                response = ping(ip, timeout=2)
+                for item in make(halt):
+                    out.put(item)
             except Exception as e:
-                # in caso di eccezione ping3, trattiamo come failure
-                self.logger.debug(f'Errore ping {ip}: {e}')
-                response = None
+                self.logger.error(f"Errore probe: {e}")
+            finally:
+                out.put(None)
 
-            # stato rilevato in questo ciclo
-            observed = 'UP' if response else 'DOWN'
+        threads = [Thread(target=produce, args=(make,), daemon=True) for make in producers]
+        for thread in threads:
+            thread.start()
+        try:
+            running = len(threads)
+            while running:
+                item = out.get()
+                if item is None:
+                    running -= 1
+                else:
+                    yield item
+        finally:
+            abandoned.set()
 
+
+    def _analyze_latency(self, since):
+        """Aggiorna le baseline di latenza con le misure del ciclo e segnala gli spostamenti di gruppo."""
+        if not self.anomaly:
+            return
+        try:
             with self.lock:
-                prev_status = self.last_status.get(ip)
-
-            # Se osservato UP
-            if observed == 'UP':
-                # se prima era DOWN (o UNKNOWN), invia UP immediatamente (se è una transizione DOWN->UP)
-                # manteniamo comportamento precedente: invia notifica UP al passaggio da DOWN->UP
-                if prev_status == 'DOWN':
-                    # calcola durata DOWN se presente
-                    up_time = datetime.now(self.local_tz)
-                    extra = f"Connessione UP alle {up_time.strftime('%H:%M:%S')}"
-                    if ip in self.down_times:
-                        down_duration = datetime.now(self.local_tz) - self.down_times[ip]
-                        minutes = int(down_duration.total_seconds() / 60)
-                        seconds = int(down_duration.total_seconds() % 60)
-                        extra += f"\nTempo di DOWN: {minutes} minuti e {seconds} secondi"
-                        del self.down_times[ip]
-                    # setta stato
-                    with self.lock:
-                        self.last_status[ip] = 'UP'
-                    # invia notifica UP
+                h = self.hosts
+                # copie degli array: un buffer esportato impedirebbe di aggiungere host alla tabella
+                rtt = np.frombuffer(h.rtt, dtype=np.float32).copy() if len(h) else np.zeros(0, np.float32)
+                last_ok = np.frombuffer(h.last_ok, dtype=np.uint32).copy() if len(h) else np.zeros(0, np.uint32)
+                # last_ok è troncato al secondo: confronto con l'inizio del ciclo troncato
+                event = self.anomaly.update(
+                    h.ips, rtt, last_ok >= int(since), self.clock.time(),
+                    groups=lambda: {c['ip']: connection_group(c) for c in self.connections})
+        except Exception as e:
+            self.logger.error(f"Errore analisi anomalie di latenza: {e}")
+            return
+        if event:
+            self._emit_anomaly(event)
+
+
+    def _emit_anomaly(self, event):
+        """Un solo evento per ciclo: log, feed delle transizioni ed email con tutti i gruppi coinvolti."""
+        lines = [f"{g['group']}: {g['outliers']}/{g['hosts']} linee con latenza anomala, "
+                 f"RTT mediano {g['rtt_baseline_ms']} -> {g['rtt_now_ms']} ms (z {g['median_z']})"
+                 for g in event['groups']]
+        self.logger.warning('Anomalia di latenza: ' + '; '.join(lines))
+        if self.feed:
+            self.feed.publish(event)
+        text = '\n'.join(lines) + '\n\nLinee più anomale:\n'
+        text += '\n'.join(f"{h['ip']}: {h['rtt_ms']} ms (z {h['z']})" for h in event['top_hosts'])
+        try:
+            self.send_anomaly_alert(event, text)
+        except Exception as e:
+            self.logger.error(f"Errore invio email anomalia di latenza: {e}")
+
+
+    def _next_check(self, conn, start):
+        """Istante del prossimo probe della connessione sondata a `start`. Un host in manutenzione
+        (o la cui finestra inizia prima del prossimo probe) è sondato di nuovo alla fine della
+        finestra: gli host della stessa finestra vengono così verificati tutti insieme."""
+        ip = conn['ip']
+        step = self.interval * self.tiers[connection_tier(conn)]['interval']
+        until = self.maintenance.active_until(ip, start)
+        if until is not None:
+            return min(start + step * self.maintenance_factor, until)
+        due = start + step
+        begin = self.maintenance.next_start(ip, start)
+        if begin is not None and begin < due:
+            due = min(due, self.maintenance.active_until(ip, begin))
+        return due
+
+
+    def _refresh_maintenance(self, now=None):
+        try:
+            self.maintenance.refresh(self.connections, now or self.clock.time(), group=connection_group)
+        except Exception as e:
+            self.logger.error(f"Errore lettura finestre di manutenzione {self.maintenance.path}: {e}")
+
+
+    def _in_maintenance(self, ip, now=None, refresh=False):
+        """Fine della finestra di manutenzione in corso per l'IP (None se non è in manutenzione)."""
+        now = now or self.clock.time()
+        if refresh:
+            self._refresh_maintenance(now)
+        return self.maintenance.active_until(ip, now)
+
+
+    def _silence_down(self, name, ip):
+        """Host DOWN durante una manutenzione: stato DOWN senza conferma né email."""
+        prev = self._set_status(ip, 'DOWN', name)
+        if prev != 'DOWN' or ip not in self.down_times:
+            self.down_times[ip] = self.clock.now(self.local_tz)
+        self.silenced.add(ip)
+        self.logger.info(f"{name} ({ip}) DOWN durante la manutenzione: nessuna email, verifica a fine finestra")
+
+
+    def _apply_maintenance(self, conn, observed, prev_status):
+        """Osservazione di un host in manutenzione o appena uscito (verifica di fine finestra).
+        Restituisce True se gestita, False se va applicata la macchina a stati normale."""
+        ip, name = conn['ip'], conn['name']
+        in_window = self._in_maintenance(ip) is not None
+        if observed == 'DOWN':
+            if in_window:
+                if prev_status == 'DOWN' and ip not in self.silenced:
+                    return False        # già DOWN (e segnalato) prima della finestra
+                self._silence_down(name, ip)
+                return True
+            # finestra finita e host ancora giù: parte la conferma come per un DOWN nuovo
+            self.silenced.discard(ip)
+            self._set_status(ip, 'CHECKING', name)
+            self._record_detect(ip, 'detect')
+            self.logger.info(f"{name} ({ip}) ancora DOWN a fine manutenzione — avviata procedura di conferma")
+            self.schedule_confirm_down(name, ip)
+            return True
+        if ip in self.silenced:
+            # tornato su: il DOWN non era stato segnalato, quindi nemmeno il ripristino
+            self.silenced.discard(ip)
+            if ip in self.down_times:
+                del self.down_times[ip]
+            self._set_status(ip, observed, name)
+            self.logger.info(f"{name} ({ip}) {observed} dopo la manutenzione")
+            return True
+        if in_window:
+            if prev_status == 'DOWN':
+                return False    # DOWN segnalato prima della finestra: il ripristino va segnalato
+            self._set_status(ip, observed, name)
+            return True
+        return False
+
+
+    def _next_wakeup(self):
+        """Secondi fino al prossimo probe dovuto (tra 1 e self.interval)."""
+        with self.lock:
+            if not len(self.hosts):
+                return self.interval
+            first = min(self.hosts.next_check)
+        return min(max(first - self.clock.time(), 1), self.interval)
+
+
+    def _record_detect(self, ip, kind, now=None):
+        """Registra il tempo di rilevamento dall'ultimo probe riuscito, separato per tier."""
+        with self.lock:
+            row = self.hosts.row(ip)
+            last_ok = self.hosts.last_ok[row] if row is not None else 0.0
+        if last_ok:
+            tier = connection_tier(self._connection(ip))
+            self.detect_stats.record(tier, kind, (now or self.clock.time()) - last_ok)
+
+
+    def _degraded_thresholds(self, conn):
+        """Soglie DEGRADED della connessione: campo `degraded` della connessione o default da env."""
+        thresholds = dict(self.degraded_thresholds)
+        thresholds.update(conn.get('degraded') or {})
+        return thresholds
+
+
+    def _evaluate(self, conn, samples):
+        """Stato osservato (UP/DEGRADED/DOWN) e metriche della raffica di probe di una connessione."""
+        stats = summarize(samples)
+        if stats['received'] == 0:
+            return 'DOWN', stats
+        th = self._degraded_thresholds(conn)
+        if ((th.get('loss') and stats['loss'] >= th['loss'])
+                or (th.get('rtt_ms') and stats['rtt_avg'] >= th['rtt_ms'])
+                or (th.get('jitter_ms') and stats['jitter'] is not None and stats['jitter'] >= th['jitter_ms'])):
+            return 'DEGRADED', stats
+        return 'UP', stats
+
+
+    def _apply_observation(self, conn, samples):
+        """Applica alla macchina a stati l'esito dei probe di una connessione e restituisce il risultato.
+        samples None = hostname non risolto (stato UNRESOLVED, distinto da DOWN)."""
+        ip = conn['ip']
+        name = conn['name']
+        if samples is None:
+            return self._apply_unresolved(conn)
+
+        # stato rilevato in questo ciclo
+        observed, stats = self._evaluate(conn, samples)
+        with self.lock:
+            prev_status = self.last_status.get(ip)
+            self.hosts.set_metrics(ip, stats)
+            if observed != 'DOWN':
+                self.hosts.last_ok[self.hosts.row(ip)] = to_epoch(self.clock.time())
+
+        if (ip in self.silenced or self._in_maintenance(ip) is not None) and self._apply_maintenance(conn, observed, prev_status):
+            with self.lock:
+                current_status = self.last_status.get(ip, 'UNKNOWN')
+            self.logger.info(f'{name} ({ip}) {current_status} [manutenzione]')
+            return {'name': name, 'ip': ip, 'status': current_status, 'metrics': stats}
+
+        # Se osservato UP (anche se degradato)
+        if observed in ('UP', 'DEGRADED'):
+            # se prima era DOWN (o UNKNOWN), invia UP immediatamente (se è una transizione DOWN->UP)
+            # manteniamo comportamento precedente: invia notifica UP al passaggio da DOWN->UP
+            if prev_status == 'DOWN':
+                # calcola durata DOWN se presente
+                up_time = self.clock.now(self.local_tz)
+                extra = f"Connessione UP alle {up_time.strftime('%H:%M:%S')}"
+                if ip in self.down_times:
+                    down_duration = up_time - self.down_times[ip]
+                    minutes = int(down_duration.total_seconds() / 60)
+                    seconds = int(down_duration.total_seconds() % 60)
+                    extra += f"\nTempo di DOWN: {minutes} minuti e {seconds} secondi"
+                    del self.down_times[ip]
+                if observed == 'DEGRADED':
+                    extra += f"\nQualità degradata: {format_stats(stats)}"
+                # setta stato
+                self._set_status(ip, observed, name)
+                # invia notifica UP
+                try:
+                    self.send_email_alert(name, ip, 'UP', extra)
+                except Exception as e:
+                    self.logger.error(f"Errore invio email UP per {ip}: {e}")
+            else:
+                self._set_status(ip, observed, name)
+                # notifiche di ingresso/uscita dallo stato DEGRADED
+                alert = None
+                if observed == 'DEGRADED' and prev_status != 'DEGRADED':
+                    alert = ('DEGRADED', f"Qualità della linea degradata: {format_stats(stats)}")
+                elif observed == 'UP' and prev_status == 'DEGRADED':
+                    alert = ('UP', f"Qualità della linea ripristinata: {format_stats(stats)}")
+                elif prev_status == 'UNRESOLVED':
+                    alert = (observed, f"Hostname di nuovo risolto: {format_stats(stats)}")
+                if alert:
                     try:
-                        self.send_email_alert(name, ip, 'UP', extra)
+                        self.send_email_alert(name, ip, alert[0], alert[1])
                     except Exception as e:
-                        self.logger.error(f"Errore invio email UP per {ip}: {e}")
-                else:
-                    # semplicemente aggiorna a UP
-                    with self.lock:
-                        self.last_status[ip] = 'UP'
-                # se esiste un worker di conferma in corso, segnaliamo che è recuperato
-                with self.retry_lock:
-                    if ip in self.retry_threads:
-                        # lasciamo che il worker termini al prossimo controllo (worker verifica last_status)
-                        # oppure possiamo rimuovere subito la traccia così non verrà duplicato un nuovo worker
-                        # (ma lasciamo il worker leggere last_status e terminare)
-                        pass
-
-            # Se osservato DOWN
+                        self.logger.error(f"Errore invio email {alert[0]} per {ip}: {e}")
+            # se esiste un worker di conferma in corso, segnaliamo che è recuperato
+            with self.retry_lock:
+                if ip in self.retry_threads:
+                    # lasciamo che il worker termini al prossimo controllo (worker verifica last_status)
+                    # oppure possiamo rimuovere subito la traccia così non verrà duplicato un nuovo worker
+                    # (ma lasciamo il worker leggere last_status e terminare)
+                    pass
+
+        # Se osservato DOWN
+        else:
+            # se precedente stato era DOWN -> è già DOWN, mantieni stato e (se non è stata inviata mail, probabilmente l'abbiamo già inviata)
+            if prev_status == 'DOWN':
+                self._set_status(ip, 'DOWN', name)
+            # se precedente era CHECKING (già in conferma) -> mantieni CHECKING (o DOWN se già confermato)
+            elif prev_status == 'CHECKING':
+                # mantieni lo stato (il worker deciderà)
+                self._set_status(ip, 'CHECKING', name)
             else:
-                # se precedente stato era DOWN -> è già DOWN, mantieni stato e (se non è stata inviata mail, probabilmente l'abbiamo già inviata)
-                if prev_status == 'DOWN':
-                    with self.lock:
-                        self.last_status[ip] = 'DOWN'
-                # se precedente era CHECKING (già in conferma) -> mantieni CHECKING (o DOWN se già confermato)
-                elif prev_status == 'CHECKING':
-                    # mantieni lo stato (il worker deciderà)
-                    with self.lock:
-                        self.last_status[ip] = 'CHECKING'
-                else:
-                    # prima era UP o UNKNOWN: avvia la conferma DOWN
-                    with self.lock:
-                        self.last_status[ip] = 'CHECKING'
-                    self.logger.info(f"Prima rilevazione DOWN per {name} ({ip}) — avviata procedura di conferma ({self.retries} tentativi ogni {self.retry_interval}s)")
-                    self.schedule_confirm_down(name, ip)
+                # prima era UP, DEGRADED o UNKNOWN: avvia la conferma DOWN
+                self._set_status(ip, 'CHECKING', name)
+                self._record_detect(ip, 'detect')
+                self.logger.info(f"Prima rilevazione DOWN per {name} ({ip}) — avviata procedura di conferma ({self.retries} tentativi ogni {self.retry_interval}s)")
+                self.schedule_confirm_down(name, ip)
+
+        # log e raccolta risultati
+        with self.lock:
+            current_status = self.last_status.get(ip, 'UNKNOWN')
+        self.logger.info(f'{name} ({ip}) {current_status}' + (f' [{format_stats(stats)}]' if stats['sent'] > 1 else ''))
+        return {'name': name, 'ip': ip, 'status': current_status, 'metrics': stats}
 
-            # log e raccolta risultati
+
+    def _apply_unresolved(self, conn):
+        """Hostname che non si risolve: stato UNRESOLVED (nessuna conferma DOWN), email all'ingresso."""
+        ip, name = conn['ip'], conn['name']
+        error = self.resolver.last_error(ip) or 'risoluzione DNS non riuscita'
+        prev = self._set_status(ip, 'UNRESOLVED', name)
+        if prev != 'UNRESOLVED' and self._in_maintenance(ip) is None:
+            self.logger.warning(f"{name} ({ip}) UNRESOLVED: {error}")
+            try:
+                self.send_email_alert(name, ip, 'UNRESOLVED', f"Impossibile risolvere l'hostname {ip}: {error}")
+            except Exception as e:
+                self.logger.error(f"Errore invio email UNRESOLVED per {ip}: {e}")
+        else:
+            self.logger.info(f'{name} ({ip}) UNRESOLVED')
+        return {'name': name, 'ip': ip, 'status': 'UNRESOLVED', 'metrics': summarize([])}
+
+
+    def _probe_targets(self, conns, count=None, share=None, adaptive=True):
+        """{ip: campioni} di _iter_probe_targets() a probe terminati."""
+        return dict(self._iter_probe_targets(conns, count, share, adaptive))
+
+
+    def _iter_probe_targets(self, conns, count=None, share=None, adaptive=True, stop=None):
+        """Esegue il probe delle connessioni raggruppandole per backend (icmp, tcp) e numero di echo.
+        I gruppi sono sondati in parallelo, ciascuno nell'ordine di `conns` (wfq_order): un host
+        prioritario non attende che siano sondati tutti gli host di un altro backend. I gruppi dello
+        stesso backend si dividono la sua concorrenza in proporzione al numero di host.
+        `share` è la frazione della concorrenza dei prober da usare (tier con quota riservata).
+        Gli hostname sono risolti prima, in parallelo e dalla cache (al massimo probe_timeout di attesa).
+        Ogni host usa il proprio timeout adattivo (rto.py); se nessun echo risponde entro quel timeout
+        il probe è ripetuto una volta con il timeout raddoppiato. adaptive=False usa il timeout fisso.
+        Restituisce le coppie (ip, [rtt o None, ...]) man mano che i probe terminano, con None al posto
+        della lista per gli hostname non risolti; gli hostname la cui risoluzione è ancora in corso non
+        sono sondati (né restituiti) in questa chiamata. `stop` (callable) interrompe i probe (vedi probes.py).
+        """
+        groups = {}
+        names = {conn['ip'] for conn in conns if not is_ip(conn['ip'])}
+        resolved = self.resolver.resolve_many(names, timeout=self.probe_timeout) if names else {}
+        for conn in conns:
+            ip = conn['ip']
+            n = count or int(conn.get('burst') or self.burst)
+            try:
+                kind, port = parse_probe(conn.get('probe'))
+            except ValueError as e:
+                self.logger.error(f"{conn.get('name')} ({ip}): {e}")
+                yield ip, [None] * n
+                continue
+            host = ip
+            if ip in names:
+                if ip not in resolved:
+                    continue    # DNS lento: l'host resta dovuto e si riprova al prossimo ciclo
+                host = resolved[ip][0]
+                if host is None:
+                    yield ip, None
+                    continue
+            groups.setdefault((kind, n), []).append((ip, host, port))
+        timeouts = {}
+        if adaptive and self.timeouts.enabled:
             with self.lock:
-                current_status = self.last_status.get(ip, 'UNKNOWN')
-            results.append({'name': name, 'ip': ip, 'status': current_status})
-            self.logger.info(f'{name} ({ip}) {current_status}')
-        return results
+                for targets in groups.values():
+                    for ip, _, _ in targets:
+                        timeouts[ip] = self.timeouts.timeout(self.hosts, self.hosts.row(ip))
+        sizes = {}
+        for (kind, _), targets in groups.items():
+            sizes[kind] = sizes.get(kind, 0) + len(targets)
+        yield from self._merge_streams(
+            [partial(self._iter_group, kind, n, targets, timeouts,
+                     (share or 1.0) * len(targets) / sizes[kind] if len(targets) < sizes[kind] else share)
+             for (kind, n), targets in groups.items()], stop)
+
+
+    def _iter_group(self, kind, n, targets, timeouts, share, stop=None):
+        """Probe di un gruppo di _iter_probe_targets (stesso backend e numero di echo)."""
+        if stop and stop():
+            return
+        prober = self.probers[kind]
+        concurrency = max(1, int(prober.concurrency * share)) if share else None
+        # scadenza anticipata = perdita probabile: una ripetizione con timeout raddoppiato
+        retry = {}
+        for ip, samples in prober.iter_many(targets, timeout=self.probe_timeout, count=n,
+                                            concurrency=concurrency, timeouts=timeouts, stop=stop):
+            t = self.timeouts.retry(timeouts[ip]) if ip in timeouts and not any(samples) else None
+            if t is not None:
+                retry[ip] = (t, samples)
+                continue
+            self._observe_rtts({ip: samples})
+            yield ip, samples
+        if not retry or (stop and stop()):
+            return      # interrotto: le ripetizioni mancanti restano non sondate
+        with self.lock:
+            self.timeouts.retried += len(retry)
+        for ip, again in prober.iter_many([t for t in targets if t[0] in retry], timeout=self.probe_timeout,
+                                          count=1, concurrency=concurrency,
+                                          timeouts={ip: t for ip, (t, _) in retry.items()}, stop=stop):
+            samples = retry[ip][1]
+            if again[0]:
+                samples[-1] = again[0]
+                with self.lock:
+                    self.timeouts.recovered += 1
+            self._observe_rtts({ip: samples})
+            yield ip, samples
+
+
+    def _observe_rtts(self, results):
+        """Aggiorna le stime di RTT per i timeout adattivi con gli echo ricevuti."""
+        with self.lock:
+            for ip, samples in results.items():
+                if not samples:
+                    continue
+                row = self.hosts.row(ip)
+                if row is None:
+                    continue
+                for rtt in samples:
+                    if rtt:
+                        self.timeouts.observe(self.hosts, row, rtt)
+
+
+    def _sync_pacer_groups(self):
+        """Aggiorna la mappa ip -> gruppo usata dai sotto-limiti ICMP per gruppo (solo se attivi)."""
+        if self.pacer.group_pps > 0:
+            self.pacer.groups = {c['ip']: connection_group(c) for c in self.connections}
 
 
-    def schedule_confirm_down(self, name, ip):
+    def _connection(self, ip):
+        """Connessione configurata con l'IP indicato ({'ip': ip} se non presente)."""
+        index = self._conn_index
+        # indice ricostruito se l'elenco è stato sostituito o se sono state aggiunte connessioni
+        if index is None or index[0] is not self.connections or index[1] != len(self.connections):
+            index = self._conn_index = (self.connections, len(self.connections),
+                                        {c['ip']: c for c in reversed(self.connections)})
+        return index[2].get(ip, {'ip': ip})
+
+
+    def _probe_one(self, ip, adaptive=True):
+        """Probe singolo di un IP con il backend configurato per la sua connessione: RTT, None se non
+        risponde, _UNRESOLVED se l'hostname non si risolve, _RESOLVING se la risoluzione non è
+        terminata entro probe_timeout."""
+        results = self._probe_targets([self._connection(ip)], count=1, adaptive=adaptive)
+        if ip not in results:
+            return _RESOLVING
+        samples = results[ip]
+        return samples[0] if samples is not None else _UNRESOLVED
+
+
+    def schedule_confirm_down(self, name, ip, start=0, first_delay=None):
         """Avvia in background un worker che esegue i tentativi di conferma per l'IP.
         Evita di lanciare più worker contemporanei per lo stesso IP.
         """
@@ -333,12 +1118,26 @@ class Monitor:
                 # già in corso
                 self.logger.debug(f"Retry già in corso per {ip}, skip schedule.")
                 return
-            thread = Thread(target=self._confirm_down_worker, args=(name, ip), daemon=True)
-            self.retry_threads[ip] = thread
-            thread.start()
+            self.retry_threads[ip] = self.clock.spawn(self._confirm_down_worker(name, ip, start, first_delay),
+                                                      name='mp_ping-confirm')
 
 
     def send_email_alert(self, name, ip, status, text=""):
+        subject = f"Connessione {status}: {name} ({ip})"
+        body = f"L'indirizzo IP {ip} per la connessione {name} è ora {status}.\n\n{text}"
+        self._send_email(subject, body)
+
+
+    def send_anomaly_alert(self, event, text=""):
+        """Email di anomalia di latenza sull'intera flotta (un solo messaggio per tutti i gruppi)."""
+        groups = ', '.join(g['group'] for g in event['groups'])
+        subject = f"ANOMALIA LATENZA: {groups} ({event['outliers']} linee)"
+        body = (f"Latenza anomala su {event['outliers']} linee della flotta. Gruppi coinvolti "
+                f"(RTT mediano salito rispetto alla base): {groups}.\n\n{text}")
+        self._send_email(subject, body)
+
+
+    def _send_email(self, subject, body):
         sender_email = os.environ.get('MP_PING_EMAIL')
         sender_password = os.environ.get('MP_PING_EMAIL_PASSWORD')
         recipient_email = os.environ.get('MP_PING_EMAIL_TO')
@@ -348,8 +1147,6 @@ class Monitor:
         if not all([sender_email, sender_password, recipient_email, smtp_server]):
             self.logger.error('Variabili ambiente SMTP mancanti, impossibile inviare email')
             return
-        subject = f"Connessione {status}: {name} ({ip})"
-        body = f"L'indirizzo IP {ip} per la connessione {name} è ora {status}.\n\n{text}"
         msg = MIMEMultipart()
         msg['From'] = f"{sender_name} <{sender_email}>"
         msg['To'] = recipient_email
@@ -365,30 +1162,100 @@ class Monitor:
 
 
     def status(self):
-        return self.last_status.copy()
+        with self.lock:
+            return self.hosts.status_dict()
 
 
     def dump_status(self):
-        """Scrive lo stato corrente last_status su self.status_path (atomico)."""
+        """Scrive lo stato corrente last_status su self.status_path (atomico), insieme allo stato
+        di avanzamento per host usato per il riavvio a caldo."""
+        with self.dump_lock:
+            self._dump_status()
+
+
+    def _dump_status(self):
         try:
             # costruisci struttura exportabile
-            export = {
-                'timestamp': datetime.utcnow().isoformat() + 'Z',
-                'last_status': self.last_status,  # dizionario ip -> stato
-            }
+            with self.lock:
+                self._last_checkpoint = self.clock.time()
+                self._dirty = False
+                if self.shm:
+                    self.shm.publish(self.hosts)
+                export = {
+                    'timestamp': self.clock.now(timezone.utc).replace(tzinfo=None).isoformat() + 'Z',
+                    'last_status': self.hosts.status_dict(),  # dizionario ip -> stato
+                    'metrics': self.hosts.metrics_dict(),     # dizionario ip -> loss/rtt/jitter ultima raffica
+                    'runtime': self.hosts.runtime_dict(),     # dizionario ip -> inizio DOWN, tentativi, prossimo tentativo
+                    'detect': self.detect_stats.summary(),   # tempi di rilevamento per tier
+                    'pacer': self.pacer.stats(),             # contatori del limitatore ICMP
+                    'timeouts': self.timeouts.stats(),       # timeout adattivi e ripetizioni
+                    'maintenance': self._maintenance_status(),
+                }
             # usa locking per evitare race con altri processi che leggono
             # notare: portalocker su write non è strettamente necessario qui se usiamo replace atomico,
             # ma lo usiamo solo per coerenza se altri leggono con portalocker.
             self._atomic_write_json(self.status_path, export)
+            if self.store:
+                # rtt, inizio DOWN e avanzamento conferme aggiornati in blocco, una transazione per ciclo
+                h = self.hosts
+                with self.lock:
+                    rows = [(ip, None if rtt != rtt else rtt, ds or None, att or None, due or None)
+                            for ip, rtt, ds, att, due in zip(h.ips, h.rtt, h.down_since, h.attempts, h.next_due)]
+                self.store.save_states(rows)
         except Exception as e:
             # logga ma non fallire il ciclo
             self.logger.error(f"Errore dump_status: {e}")
 
 
+    def _maintenance_status(self):
+        """Host in manutenzione (ip -> fine finestra) e host DOWN non segnalati, per status.json."""
+        now = self.clock.time()
+        active = {}
+        for ip in self.hosts.ips:
+            until = self.maintenance.active_until(ip, now)
+            if until is not None:
+                active[ip] = until
+        return {'active': active, 'silenced': sorted(self.silenced)}
+
+
+    def reload_connections(self):
+        """Ricarica le connessioni (es. modificate dalla CLI) mantenendo lo stato degli host noti."""
+        try:
+            conns = self.load_connections()
+        except Exception as e:
+            self.logger.error(f"Errore ricaricamento connessioni: {e}")
+            return
+        with self.lock:
+            self.connections = conns
+            self.hosts.sync([c['ip'] for c in conns])
+        self._sync_pacer_groups()
+
+
+    def migrate_to_db(self):
+        """Importa connections.json, status.json e history.jsonl nel database SQLite configurato."""
+        if not self.store:
+            raise RuntimeError('Database non configurato (MP_PING_DB)')
+        conns = []
+        if os.path.exists(self.config_path):
+            with open(self.config_path, 'r') as f:
+                content = f.read()
+            conns = json.loads(content) if content.strip() else []
+        snapshot = self._read_json_with_lock(self.status_path) or {}
+        last = snapshot.get('last_status') if isinstance(snapshot, Mapping) else None
+        # lo storico viene importato solo se il database non ne ha già uno
+        records = []
+        if next(iter(self.store.history.iter_records()), None) is None:
+            records = list(TransitionLog(self.history_path).iter_records())
+        added, n_hist = self.store.migrate_from_json(conns, last, records)
+        self.connections = self.store.list_connections()
+        return added, n_hist
+
+
     def stop(self):
         """Ferma il loop del monitor in modo pulito."""
         try:
             self.running.clear()
+            self._wake.set()
             self.logger.info("Monitor stop requested.")
         except Exception:
             pass
@@ -396,12 +1263,36 @@ class Monitor:
 
     # chiamare dump_status dopo ogni ciclo di ping, es.: in run_monitor_loop():
     def run_monitor_loop(self):
+        self._open_shm()
+        self._open_feed()
+        # riavvio a caldo: conferme interrotte e host non UP vengono ripresi prima del ciclo completo
+        try:
+            self.resume_pending()
+        except Exception as e:
+            self.logger.exception(f"Errore ripresa stato dopo il riavvio: {e}")
         while self.running.is_set():
-            # ricarica conf se implementato...
+            # con il database la configurazione è sempre aggiornata: rileggiamo le connessioni
+            if self.store:
+                self.reload_connections()
             try:
-                self.ping_all()
+                self.ping_due()
             except Exception as e:
-                self.logger.exception(f"Errore in ping_all: {e}")
+                self.logger.exception(f"Errore in ping_due: {e}")
             # dopo il ciclo di ping scriviamo lo stato
             self.dump_status()
-            time.sleep(self.interval)
\ No newline at end of file
+            # attende il prossimo probe dovuto (i tier critici hanno intervalli più brevi), ma non oltre
+            # checkpoint_interval se le conferme hanno lasciato modifiche non scritte
+            delay = self._next_wakeup()
+            if self._dirty:
+                delay = min(delay, self.checkpoint_interval)
+            self.clock.sleep(delay, wake=self._wake)
+            self._wake.clear()
+        if self.feed:
+            self.feed.close()
+            self.feed = None
+        self.resolver.close()
+
+
+    def wake(self):
+        """Anticipa il prossimo ciclo del loop (es. dopo l'aggiunta di connessioni da sondare subito)."""
+        self._wake.set()
\ No newline at end of file
@@ -9,13 +9,27 @@ Config possibile via /etc/default/mp_status_backup env vars:
   MP_BACKUP_RETENTION_DAYS (default 30)
   MP_OWNER (default multipedia)
   MP_GROUP (default mp_users)
+  MP_BACKUP_COMPRESS (none | gzip | zstd, default gzip; zstd richiede il modulo zstandard)
+  MP_BACKUP_DEDUP (link | skip, default link): se lo stato non è cambiato crea un hard link
+      allo snapshot precedente oppure salta lo snapshot. Il confronto ignora i campi che il
+      monitor riscrive a ogni dump (VOLATILE_KEYS: timestamp, misure e contatori)
+  MP_BACKUP_DELTA (0 | 1, default 0): salva delta rispetto all'ultimo snapshot completo
+  MP_BACKUP_FULL_EVERY (default 7): numero massimo di delta tra due snapshot completi
+
+Nomi file:
+  status_YYYYmmdd_HHMMSS.json[.gz|.zst]        snapshot completo
+  status_YYYYmmdd_HHMMSS.delta-YYYYmmdd_HHMMSS.json[.gz|.zst]
+                                               delta rispetto allo snapshot completo con il
+                                               secondo timestamp (la base, anche nel campo "base")
+Il file .last_snapshot nella directory di backup tiene hash e nome dell'ultimo snapshot,
+così il run non deve rileggere né elencare i backup esistenti per decidere cosa scrivere.
 """
 import os
+import re
 import json
-import time
+import gzip
+import hashlib
 import tempfile
-import shutil
-import stat
 from datetime import datetime, timezone, timedelta
 
 # try to import portalocker; if not available, fall back to naive copy with warning
@@ -25,13 +39,30 @@ try:
 except Exception:
     HAVE_PORTALOCKER = False
 
+# zstandard è opzionale: se manca si usa gzip
+try:
+    import zstandard
+    HAVE_ZSTD = True
+except Exception:
+    HAVE_ZSTD = False
+
 MP_STATUS_FILE = os.environ.get("MP_STATUS_FILE", "/opt/mp_ping/status.json")
 MP_BACKUP_DIR = os.environ.get("MP_BACKUP_DIR", "/var/backups/mp_ping")
 MP_BACKUP_RETENTION_DAYS = int(os.environ.get("MP_BACKUP_RETENTION_DAYS", "30"))
 MP_OWNER = os.environ.get("MP_OWNER", "multipedia")
 MP_GROUP = os.environ.get("MP_GROUP", "mp_users")
+MP_BACKUP_COMPRESS = os.environ.get("MP_BACKUP_COMPRESS", "gzip")
+MP_BACKUP_DEDUP = os.environ.get("MP_BACKUP_DEDUP", "link")
+MP_BACKUP_DELTA = os.environ.get("MP_BACKUP_DELTA", "0") == "1"
+MP_BACKUP_FULL_EVERY = int(os.environ.get("MP_BACKUP_FULL_EVERY", "7"))
 MODE = 0o640
 
+STATE_FILE = ".last_snapshot"
+# campi di status.json che cambiano a ogni dump anche senza transizioni: esclusi dall'hash di dedup
+VOLATILE_KEYS = ("timestamp", "metrics", "detect", "pacer", "timeouts")
+TS_FORMAT = "%Y%m%d_%H%M%S"
+SNAPSHOT_RE = re.compile(r"^status_(\d{8}_\d{6})(\.delta(?:-(\d{8}_\d{6}))?)?\.json(\.gz|\.zst)?$")
+
 def uid_gid(owner, group):
     import pwd, grp
     try:
@@ -44,13 +75,12 @@ def uid_gid(owner, group):
         gid = None
     return uid, gid
 
-def atomic_write(path, data):
-    # data is a python object -> write JSON atomically
+def atomic_write_bytes(path, payload):
     dirn = os.path.dirname(path)
     fd, tmp = tempfile.mkstemp(prefix=".tmp_", dir=dirn)
     try:
-        with os.fdopen(fd, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
             f.flush()
             os.fsync(f.fileno())
         os.replace(tmp, path)
@@ -61,6 +91,169 @@ def atomic_write(path, data):
             except Exception:
                 pass
 
+def atomic_write(path, data):
+    # data is a python object -> write JSON atomically
+    atomic_write_bytes(path, json.dumps(data, indent=2, ensure_ascii=False).encode("utf-8"))
+
+def parse_snapshot_name(fname):
+    """Restituisce (datetime, is_delta) dal nome file, oppure None se non è uno snapshot."""
+    m = SNAPSHOT_RE.match(fname)
+    if not m:
+        return None
+    try:
+        ts = datetime.strptime(m.group(1), TS_FORMAT)
+    except ValueError:
+        return None
+    return ts, bool(m.group(2))
+
+def _compression():
+    if MP_BACKUP_COMPRESS == "zstd":
+        if HAVE_ZSTD:
+            return "zstd"
+        print("Warning: zstandard non disponibile, uso gzip.")
+        return "gzip"
+    if MP_BACKUP_COMPRESS in ("gzip", "none"):
+        return MP_BACKUP_COMPRESS
+    print(f"Warning: MP_BACKUP_COMPRESS={MP_BACKUP_COMPRESS} non valido, uso gzip.")
+    return "gzip"
+
+def compress(payload, method):
+    if method == "zstd":
+        return zstandard.ZstdCompressor(level=10).compress(payload), ".zst"
+    if method == "gzip":
+        return gzip.compress(payload, compresslevel=6, mtime=0), ".gz"
+    return payload, ""
+
+def decompress(payload, fname):
+    if fname.endswith(".zst"):
+        if not HAVE_ZSTD:
+            raise RuntimeError(f"zstandard non disponibile per leggere {fname}")
+        return zstandard.ZstdDecompressor().decompress(payload)
+    if fname.endswith(".gz"):
+        return gzip.decompress(payload)
+    return payload
+
+def read_snapshot_bytes(path):
+    """Bytes JSON (decompressi) di uno snapshot completo o delta."""
+    with open(path, "rb") as f:
+        return decompress(f.read(), path)
+
+def make_delta(base, current):
+    """Delta di primo livello tra due status: per i valori dict registra solo le chiavi cambiate."""
+    delta = {"set": {}, "unset": {}, "replace": {}}
+    for key, value in current.items():
+        old = base.get(key)
+        if isinstance(value, dict) and isinstance(old, dict):
+            changed = {k: v for k, v in value.items() if k not in old or old[k] != v}
+            removed = [k for k in old if k not in value]
+            if changed:
+                delta["set"][key] = changed
+            if removed:
+                delta["unset"][key] = removed
+        elif old != value or key not in base:
+            delta["replace"][key] = value
+    delta["drop"] = [k for k in base if k not in current]
+    return delta
+
+def apply_delta(base, delta):
+    out = {k: (dict(v) if isinstance(v, dict) else v) for k, v in base.items()}
+    for key in delta.get("drop", []):
+        out.pop(key, None)
+    for key, value in delta.get("replace", {}).items():
+        out[key] = value
+    for key, changed in delta.get("set", {}).items():
+        out.setdefault(key, {}).update(changed)
+    for key, removed in delta.get("unset", {}).items():
+        for k in removed:
+            out.get(key, {}).pop(k, None)
+    return out
+
+def load_snapshot(path):
+    """Carica uno snapshot risolvendo l'eventuale delta rispetto al suo snapshot completo di base."""
+    data = json.loads(read_snapshot_bytes(path))
+    parsed = parse_snapshot_name(os.path.basename(path))
+    if parsed and parsed[1]:
+        base = json.loads(read_snapshot_bytes(os.path.join(os.path.dirname(path), data["base"])))
+        return apply_delta(base, data["delta"])
+    return data
+
+def _read_state(backup_dir):
+    try:
+        with open(os.path.join(backup_dir, STATE_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+def status_digest(raw):
+    """Hash di dedup di status.json: JSON canonico senza i campi volatili (bytes grezzi se non è un oggetto JSON)."""
+    try:
+        data = json.loads(raw)
+    except Exception:
+        data = None
+    if not isinstance(data, dict):
+        return hashlib.sha256(raw).hexdigest()
+    stable = {k: v for k, v in data.items() if k not in VOLATILE_KEYS}
+    return hashlib.sha256(json.dumps(stable, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def _read_status_bytes():
+    """Legge il contenuto grezzo di status.json con lock condiviso (se disponibile)."""
+    with open(MP_STATUS_FILE, "rb") as f:
+        if HAVE_PORTALOCKER:
+            portalocker.lock(f, portalocker.LOCK_SH)
+            try:
+                return f.read()
+            finally:
+                try:
+                    portalocker.unlock(f)
+                except Exception:
+                    pass
+        return f.read()
+
+def prune(backup_dir, now=None):
+    """Rimuove gli snapshot più vecchi della retention usando il timestamp nel nome file
+    (nessuna stat né lettura dei file). Non vengono rimossi gli snapshot completi usati come base
+    da delta conservati (la base è nel nome del delta) né l'ultimo snapshot e la base registrati
+    in .last_snapshot, anche se fuori retention (es. con MP_BACKUP_DEDUP=skip e stato invariato)."""
+    now = now or datetime.now()
+    cutoff = now - timedelta(days=MP_BACKUP_RETENTION_DAYS)
+    snapshots = []
+    for fname in os.listdir(backup_dir):
+        m = SNAPSHOT_RE.match(fname)
+        parsed = parse_snapshot_name(fname)
+        if parsed:
+            snapshots.append((parsed[0], fname, parsed[1], m.group(1), m.group(3)))
+    snapshots.sort()
+
+    state = _read_state(backup_dir)
+    keep = {state.get("file"), state.get("base")}
+    needed = set()      # timestamp delle basi dei delta conservati
+    last_full = None
+    for ts, fname, is_delta, stamp, base_stamp in snapshots:
+        if not is_delta:
+            last_full = fname
+        elif ts >= cutoff:
+            if base_stamp:
+                needed.add(base_stamp)
+                continue
+            # delta scritto prima che la base fosse nel nome: la base è nel contenuto
+            # (se illeggibile, per prudenza l'ultimo completo che lo precede)
+            try:
+                keep.add(json.loads(read_snapshot_bytes(os.path.join(backup_dir, fname)))["base"])
+            except Exception:
+                if last_full:
+                    keep.add(last_full)
+
+    removed = 0
+    for ts, fname, is_delta, stamp, _ in snapshots:
+        if ts >= cutoff or fname in keep or (not is_delta and stamp in needed):
+            continue
+        try:
+            os.remove(os.path.join(backup_dir, fname))
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
 def backup_and_prune():
     if not os.path.exists(MP_STATUS_FILE):
         print(f"Status file not found: {MP_STATUS_FILE}")
@@ -69,67 +262,106 @@ def backup_and_prune():
     os.makedirs(MP_BACKUP_DIR, exist_ok=True)
 
     # read status with portalocker shared lock (if available)
-    data = None
-    if HAVE_PORTALOCKER:
-        try:
-            with open(MP_STATUS_FILE, "r", encoding="utf-8") as f:
-                portalocker.lock(f, portalocker.LOCK_SH)
-                try:
-                    data = json.load(f)
-                finally:
-                    try:
-                        portalocker.unlock(f)
-                    except Exception:
-                        pass
-        except Exception as e:
-            print(f"Errore leggendo {MP_STATUS_FILE} con portalocker: {e}")
-            return 2
+    try:
+        raw = _read_status_bytes()
+    except Exception as e:
+        print(f"Errore leggendo {MP_STATUS_FILE}: {e}")
+        return 2
+    if not HAVE_PORTALOCKER:
+        print("Warning: portalocker non disponibile, snapshot senza lock (potrebbe essere inconsistente).")
+
+    digest = status_digest(raw)
+    state = _read_state(MP_BACKUP_DIR)
+    prev_file = state.get("file")
+    prev_path = os.path.join(MP_BACKUP_DIR, prev_file) if prev_file else None
+
+    # filename con timestamp (UTC) -- evita ":" per compatibilità
+    ts = datetime.now(timezone.utc).astimezone().strftime(TS_FORMAT)
+
+    if state.get("hash") == digest and prev_path and os.path.exists(prev_path):
+        # contenuto invariato: nessuna nuova scrittura
+        if MP_BACKUP_DEDUP == "skip":
+            print(f"Status invariato rispetto a {prev_file}: snapshot saltato.")
+        else:
+            m = SNAPSHOT_RE.match(prev_file)
+            filename = f"status_{ts}{m.group(2) or ''}.json{m.group(4) or ''}"
+            dest = os.path.join(MP_BACKUP_DIR, filename)
+            try:
+                if not os.path.exists(dest):
+                    os.link(prev_path, dest)
+            except Exception as e:
+                print(f"Errore creando hard link {dest}: {e}")
+                return 4
+            state["file"] = filename
+            if not m.group(2):
+                # i prossimi delta puntano al collegamento più recente dello stesso snapshot completo
+                state["base"] = filename
+            try:
+                atomic_write(os.path.join(MP_BACKUP_DIR, STATE_FILE), state)
+            except Exception as e:
+                print(f"Warning: non ho potuto aggiornare {STATE_FILE}: {e}")
+            print(f"Status invariato: {dest} collegato a {prev_file}.")
     else:
-        # fallback senza lock: meno sicuro
+        method = _compression()
         try:
-            with open(MP_STATUS_FILE, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            print("Warning: portalocker non disponibile, snapshot senza lock (potrebbe essere inconsistente).")
+            data = json.loads(raw)
         except Exception as e:
             print(f"Errore leggendo {MP_STATUS_FILE}: {e}")
             return 3
 
-    # filename con timestamp (UTC) -- evita ":" per compatibilità
-    ts = datetime.now(timezone.utc).astimezone().strftime("%Y%m%d_%H%M%S")
-    filename = f"status_{ts}.json"
-    dest = os.path.join(MP_BACKUP_DIR, filename)
+        base_file = state.get("base")
+        use_delta = (MP_BACKUP_DELTA and base_file and isinstance(data, dict)
+                     and state.get("deltas_since_base", 0) < MP_BACKUP_FULL_EVERY
+                     and os.path.exists(os.path.join(MP_BACKUP_DIR, base_file)))
+        base = None
+        if use_delta:
+            try:
+                base = json.loads(read_snapshot_bytes(os.path.join(MP_BACKUP_DIR, base_file)))
+            except Exception as e:
+                print(f"Warning: base {base_file} illeggibile ({e}), scrivo snapshot completo.")
+                use_delta = False
 
-    try:
-        atomic_write(dest, data)
-    except Exception as e:
-        print(f"Errore scrivendo snapshot {dest}: {e}")
-        return 4
+        if use_delta:
+            payload = json.dumps({"base": base_file, "delta": make_delta(base, data)},
+                                 ensure_ascii=False).encode("utf-8")
+            kind = f".delta-{SNAPSHOT_RE.match(base_file).group(1)}.json"
+        else:
+            payload = raw
+            kind = ".json"
+        payload, ext = compress(payload, method)
+        filename = f"status_{ts}{kind}{ext}"
+        dest = os.path.join(MP_BACKUP_DIR, filename)
 
-    # set ownership and mode if possible
-    uid, gid = uid_gid(MP_OWNER, MP_GROUP)
-    try:
-        if uid is not None or gid is not None:
-            os.chown(dest, uid if uid is not None else -1, gid if gid is not None else -1)
-        os.chmod(dest, MODE)
-    except Exception as e:
-        print(f"Warning: non ho potuto impostare owner/perm per {dest}: {e}")
+        try:
+            atomic_write_bytes(dest, payload)
+        except Exception as e:
+            print(f"Errore scrivendo snapshot {dest}: {e}")
+            return 4
+
+        # set ownership and mode if possible
+        uid, gid = uid_gid(MP_OWNER, MP_GROUP)
+        try:
+            if uid is not None or gid is not None:
+                os.chown(dest, uid if uid is not None else -1, gid if gid is not None else -1)
+            os.chmod(dest, MODE)
+        except Exception as e:
+            print(f"Warning: non ho potuto impostare owner/perm per {dest}: {e}")
+
+        if use_delta:
+            state = {"base": base_file, "deltas_since_base": state.get("deltas_since_base", 0) + 1}
+        else:
+            state = {"base": filename, "deltas_since_base": 0}
+        state.update({"hash": digest, "file": filename})
+        try:
+            atomic_write(os.path.join(MP_BACKUP_DIR, STATE_FILE), state)
+        except Exception as e:
+            print(f"Warning: non ho potuto aggiornare {STATE_FILE}: {e}")
+        print(f"Snapshot scritto: {dest} ({len(payload)} bytes).")
 
     # prune old files
     try:
-        cutoff = time.time() - (MP_BACKUP_RETENTION_DAYS * 86400)
-        removed = 0
-        for fname in os.listdir(MP_BACKUP_DIR):
-            if not fname.startswith("status_") or not fname.endswith(".json"):
-                continue
-            path = os.path.join(MP_BACKUP_DIR, fname)
-            try:
-                st = os.stat(path)
-                if st.st_mtime < cutoff:
-                    os.remove(path)
-                    removed += 1
-            except FileNotFoundError:
-                pass
-        print(f"Snapshot scritto: {dest}. Rimosse {removed} vecchie snapshot.")
+        removed = prune(MP_BACKUP_DIR)
+        print(f"Rimosse {removed} vecchie snapshot.")
     except Exception as e:
         print(f"Warning: errore durante prune: {e}")
 
@@ -0,0 +1,138 @@
+"""
+Limitatore globale dei pacchetti ICMP in uscita (token bucket).
+
+Tutti gli echo del processo (ciclo principale, tentativi di conferma, raffiche per la perdita)
+passano dallo stesso Pacer, così i router dei carrier e il firewall non vedono picchi di
+migliaia di echo in pochi millisecondi (che farebbero scattare il loro rate limiting ICMP e
+quindi falsi DOWN). Configurazione:
+  MP_ICMP_PPS         budget globale in pacchetti/s (default 500, 0 = nessun limite)
+  MP_ICMP_BURST       dimensione del bucket globale (default 50)
+  MP_ICMP_SUBNET_PPS  limite per /24 (IPv4) o /64 (IPv6) di destinazione (default 0 = disattivato)
+  MP_ICMP_GROUP_PPS   limite per gruppo di connessioni, es. EOLO (default 0 = disattivato)
+
+Le attese sono prenotate: un pacchetto che trova il bucket vuoto prenota il suo token
+futuro e dorme fuori dal lock, quindi i thread del pool escono distanziati di 1/pps.
+"""
+import os
+import time
+import ipaddress
+from threading import Lock
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity, now):
+        self.rate = float(rate)
+        self.capacity = float(max(capacity, 1))
+        self.tokens = self.capacity
+        self.stamp = now
+
+    def reserve(self, now):
+        """Preleva un token (anche in anticipo) e restituisce i secondi da attendere."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        self.tokens -= 1
+        return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+    def idle(self, now):
+        return self.tokens + (now - self.stamp) * self.rate >= self.capacity
+
+
+def subnet_key(host):
+    """/24 per IPv4, /64 per IPv6; None se host non è un IP letterale."""
+    try:
+        addr = ipaddress.ip_address(host)
+    except ValueError:
+        return None
+    prefix = 24 if addr.version == 4 else 64
+    return str(ipaddress.ip_network(f'{addr}/{prefix}', strict=False))
+
+
+class Pacer:
+    def __init__(self, pps=None, burst=None, subnet_pps=None, group_pps=None,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.pps = float(os.environ.get('MP_ICMP_PPS', 500) if pps is None else pps)
+        self.burst = float(os.environ.get('MP_ICMP_BURST', 50) if burst is None else burst)
+        self.subnet_pps = float(os.environ.get('MP_ICMP_SUBNET_PPS', 0) if subnet_pps is None else subnet_pps)
+        self.group_pps = float(os.environ.get('MP_ICMP_GROUP_PPS', 0) if group_pps is None else group_pps)
+        self.clock = clock
+        self.sleep = sleep
+        self.groups = {}        # connessione (ip o hostname configurato) -> gruppo, aggiornato da Monitor solo se group_pps è attivo
+        self._lock = Lock()
+        now = clock()
+        self._global = TokenBucket(self.pps, self.burst, now) if self.pps > 0 else None
+        self._subnets = {}
+        self._groups = {}
+        self._ops = 0
+        # contatori per scegliere il rate più alto che non provoca throttling
+        self.sent = 0
+        self.throttled = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.limited_by = {'global': 0, 'subnet': 0, 'group': 0}
+
+    @property
+    def enabled(self):
+        return bool(self._global or self.subnet_pps > 0 or self.group_pps > 0)
+
+    def _sub_bucket(self, buckets, key, rate, now):
+        bucket = buckets.get(key)
+        if bucket is None:
+            # burst piccolo: un sotto-limite serve proprio a distanziare gli echo verso la stessa rete
+            bucket = buckets[key] = TokenBucket(rate, max(1.0, rate / 10), now)
+        return bucket
+
+    def _prune(self, now):
+        # i bucket pieni non servono più: li ricreiamo al prossimo pacchetto verso quella rete
+        for buckets in (self._subnets, self._groups):
+            for key in [k for k, b in buckets.items() if b.idle(now)]:
+                del buckets[key]
+
+    def acquire(self, host, key=None):
+        """Attende il permesso di inviare un echo verso host (indirizzo risolto) della connessione key
+        (default host), che ne determina il gruppo. Restituisce i secondi attesi."""
+        wait = self.reserve(host, key)
+        if wait > 0:
+            self.sleep(wait)
+        return wait
+
+    def reserve(self, host, key=None):
+        """Prenota il token per un echo verso host senza dormire: restituisce fra quanti secondi
+        il chiamante può inviarlo (per chi multiplexa invio e ricezione su un solo thread)."""
+        if not self.enabled:
+            return 0.0
+        with self._lock:
+            now = self.clock()
+            waits = []
+            if self._global:
+                waits.append((self._global.reserve(now), 'global'))
+            if self.subnet_pps > 0:
+                net = subnet_key(host)
+                if net:
+                    waits.append((self._sub_bucket(self._subnets, net, self.subnet_pps, now).reserve(now), 'subnet'))
+            if self.group_pps > 0:
+                group = self.groups.get(host if key is None else key)
+                if group:
+                    waits.append((self._sub_bucket(self._groups, group, self.group_pps, now).reserve(now), 'group'))
+            wait, limit = max(waits) if waits else (0.0, None)
+            self.sent += 1
+            if wait > 0:
+                self.throttled += 1
+                self.wait_total += wait
+                self.wait_max = max(self.wait_max, wait)
+                self.limited_by[limit] += 1
+            self._ops += 1
+            if self._ops % 1024 == 0:
+                self._prune(now)
+        return wait
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pps': self.pps,
+                'sent': self.sent,
+                'throttled': self.throttled,
+                'wait_total': round(self.wait_total, 3),
+                'wait_avg': round(self.wait_total / self.throttled, 4) if self.throttled else 0.0,
+                'wait_max': round(self.wait_max, 4),
+                'limited_by': dict(self.limited_by),
+            }
@@ -0,0 +1,413 @@
+"""
+Backend di probe intercambiabili.
+
+Ogni connessione può indicare il campo `probe`:
+  - "icmp" (default): echo ICMP tramite ping3
+  - "tcp:PORT": connect() TCP sulla porta indicata (es. "tcp:443")
+
+Tutti i prober espongono probe_many(targets, timeout, count, concurrency) dove targets è una lista di
+(key, host, port) e il risultato è {key: [rtt in secondi o None, ...]} con `count` campioni per target.
+`concurrency` limita i probe contemporanei della singola chiamata (default: `concurrency` del prober).
+`timeouts` ({key: secondi}) indica il timeout dei singoli target (timeout adattivi, vedi rto.py);
+i target non presenti usano `timeout`.
+
+iter_many(..., stop) restituisce invece le coppie (key, campioni) man mano che i probe di ciascun
+target terminano. `stop` (callable) viene consultato durante l'attesa: quando restituisce True il
+generatore termina senza attendere i probe in corso, e i target non ancora completati non vengono
+restituiti. Chiudere il generatore (close(), break) ha lo stesso effetto.
+"""
+import os
+import time
+import heapq
+import errno
+import socket
+import selectors
+import ipaddress
+from itertools import count as counter
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from sweep import open_icmp_socket, echo_packet, parse_reply, ECHO_REPLY
+
+DEFAULT_PROBE = 'icmp'
+STOP_POLL = 0.05    # secondi tra due controlli di `stop` mentre si attendono i probe
+BURST_PAYLOAD = b'mp_ping-burst'
+
+
+def parse_probe(spec):
+    """Converte la stringa `probe` di una connessione in (tipo, porta). Solleva ValueError se non valida."""
+    spec = (spec or DEFAULT_PROBE).strip().lower()
+    if spec == 'icmp':
+        return 'icmp', None
+    if spec.startswith('tcp:'):
+        try:
+            port = int(spec[4:])
+        except ValueError:
+            raise ValueError(f"Porta TCP non valida in probe '{spec}'")
+        if not 0 < port < 65536:
+            raise ValueError(f"Porta TCP fuori range in probe '{spec}'")
+        return 'tcp', port
+    raise ValueError(f"Probe non supportato: '{spec}' (usa 'icmp' o 'tcp:PORT')")
+
+
+def summarize(samples):
+    """Metriche di una raffica di probe: perdita %, RTT min/avg/max e jitter in millisecondi.
+    Il jitter è la media delle differenze assolute tra RTT consecutivi ricevuti (come in RFC 3550)."""
+    rtts = [s * 1000.0 for s in samples if s]
+    sent = len(samples)
+    stats = {
+        'sent': sent,
+        'received': len(rtts),
+        'loss': round(100.0 * (sent - len(rtts)) / sent, 1) if sent else 100.0,
+        'rtt_min': None, 'rtt_avg': None, 'rtt_max': None, 'jitter': None,
+    }
+    if rtts:
+        stats['rtt_min'] = round(min(rtts), 2)
+        stats['rtt_avg'] = round(sum(rtts) / len(rtts), 2)
+        stats['rtt_max'] = round(max(rtts), 2)
+    if len(rtts) > 1:
+        stats['jitter'] = round(sum(abs(b - a) for a, b in zip(rtts, rtts[1:])) / (len(rtts) - 1), 2)
+    return stats
+
+
+def format_stats(stats):
+    text = f"loss {stats['loss']}%"
+    if stats['rtt_avg'] is not None:
+        text += f", rtt min/avg/max {stats['rtt_min']}/{stats['rtt_avg']}/{stats['rtt_max']} ms"
+    if stats['jitter'] is not None:
+        text += f", jitter {stats['jitter']} ms"
+    return text
+
+
+class Prober:
+    """Interfaccia comune dei prober."""
+
+    concurrency = 1     # probe contemporanei di default
+
+    # le sottoclassi implementano almeno uno dei due metodi
+    def probe_many(self, targets, timeout=2, count=1, concurrency=None, timeouts=None):
+        return dict(self.iter_many(targets, timeout, count, concurrency, timeouts))
+
+    def iter_many(self, targets, timeout=2, count=1, concurrency=None, timeouts=None, stop=None):
+        if type(self).probe_many is Prober.probe_many:
+            raise NotImplementedError(f"{type(self).__name__} deve implementare probe_many o iter_many")
+        yield from self.probe_many(targets, timeout, count, concurrency, timeouts).items()
+
+    def probe_one(self, host, port=None, timeout=2):
+        return self.probe_many([(host, host, port)], timeout=timeout)[host][0]
+
+
+class IcmpProber(Prober):
+    """Echo ICMP tramite una funzione di ping (ping3) eseguita su un pool di thread limitato.
+    Se è indicato un pacer (pacer.Pacer) ogni echo attende il proprio token prima dell'invio.
+
+    Le raffiche (count > 1) verso host IPv4 sono inviate in pipeline da `pipeline` (EchoPipeline):
+    un solo socket e un solo thread per tutta la chiamata, gli echo di ogni host distanziati di
+    `interval` secondi. Senza pipeline (o se il socket ICMP non si può aprire) ogni echo è un job
+    sul pool."""
+
+    def __init__(self, ping_func, workers=None, pacer=None, pipeline=None):
+        self.ping_func = ping_func
+        self.workers = workers or int(os.environ.get('MP_PING_WORKERS', 16))
+        self.pacer = pacer
+        self.pipeline = pipeline
+
+    @property
+    def concurrency(self):
+        return self.workers
+
+    def _one(self, key, host, timeout):
+        try:
+            if self.pacer:
+                self.pacer.acquire(host, key)
+            return self.ping_func(host, timeout) or None
+        except Exception:
+            return None
+
+    def iter_many(self, targets, timeout=2, count=1, concurrency=None, timeouts=None, stop=None):
+        if count > 1 and self.pipeline is not None:
+            piped = [t for t in targets if _is_ipv4(t[1])]
+            if piped:
+                try:
+                    sock = self.pipeline.open()
+                except OSError:
+                    piped = []      # socket ICMP non disponibile: un job per echo
+                else:
+                    # stesso numero di echo in volo del pool, senza un thread per echo
+                    inflight = (concurrency or self.workers) * count
+                    yield from self.pipeline.iter_bursts(sock, piped, timeout, count, inflight,
+                                                         timeouts, stop)
+                    if stop and stop():
+                        return
+                    piped = {t[0] for t in piped}
+                    targets = [t for t in targets if t[0] not in piped]
+        yield from self._iter_jobs(targets, timeout, count, concurrency, timeouts, stop)
+
+    def _iter_jobs(self, targets, timeout=2, count=1, concurrency=None, timeouts=None, stop=None):
+        results = {key: [None] * count for key, _, _ in targets}
+        remaining = {key: count for key in results}
+        timeouts = timeouts or {}
+        jobs = [(key, host, i, timeouts.get(key, timeout)) for key, host, _ in targets for i in range(count)]
+        workers = concurrency or self.workers
+        if not jobs or count < 1:
+            return
+        if (len(jobs) == 1 or workers <= 1) and not stop:
+            for key, host, i, t in jobs:
+                results[key][i] = self._one(key, host, t)
+                remaining[key] -= 1
+                if not remaining[key]:
+                    yield key, results[key]
+            return
+        pool = ThreadPoolExecutor(max_workers=min(workers, len(jobs)))
+        try:
+            pending = {pool.submit(self._one, key, host, t): (key, i) for key, host, i, t in jobs}
+            while pending:
+                done, _ = wait(pending, timeout=STOP_POLL if stop else None, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    key, i = pending.pop(fut)
+                    results[key][i] = fut.result()
+                    remaining[key] -= 1
+                    if not remaining[key]:
+                        yield key, results[key]
+                if stop and stop():
+                    return
+        finally:
+            # i ping già partiti finiscono da soli entro il loro timeout; quelli in coda sono annullati
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _is_ipv4(host):
+    try:
+        return ipaddress.ip_address(host).version == 4
+    except ValueError:
+        return False
+
+
+class EchoPipeline:
+    """Raffiche di echo ICMP in pipeline su un solo socket (come sweep.IcmpSweeper).
+
+    Gli echo di ogni host partono distanziati di `interval` secondi (così il jitter misura la
+    variazione tra pacchetti distinti) senza attendere le risposte precedenti; le risposte sono
+    lette sullo stesso thread tramite un selector e associate per (indirizzo, seq). Gli invii
+    sono distanziati dal pacer (pacer.Pacer.reserve). Configurazione: MP_PING_BURST_INTERVAL
+    (secondi tra due echo dello stesso host, default 0.1). Solo IPv4.
+    """
+
+    _idents = counter(os.getpid())
+
+    def __init__(self, pacer=None, interval=None, clock=time.monotonic):
+        self.pacer = pacer
+        self.interval = float(os.environ.get('MP_PING_BURST_INTERVAL', 0.1) if interval is None else interval)
+        self.clock = clock
+
+    def open(self):
+        """Socket ICMP per iter_bursts (OSError se il processo non può aprirne uno)."""
+        return open_icmp_socket()
+
+    def iter_bursts(self, opened, targets, timeout, count, inflight, timeouts=None, stop=None):
+        """Come Prober.iter_many per gli host IPv4 di targets; al massimo `inflight` host in volo.
+        Chiude il socket `opened` (da open()) al termine."""
+        sock, raw = opened
+        sock.setblocking(False)
+        sel = selectors.DefaultSelector()
+        sel.register(sock, selectors.EVENT_READ)
+        ident = next(self._idents) & 0xffff
+        timeouts = timeouts or {}
+        pending = iter(targets)
+        active = {}             # key -> [host, timeout, campioni, echo conclusi]
+        sends = []              # heap (istante, n, key, indice echo, token prenotato)
+        outstanding = {}        # (host, seq) -> (key, indice echo, invio)
+        deadlines = []          # heap (scadenza, host, seq)
+        order = counter()
+        seq = 0
+        exhausted = False
+        try:
+            while True:
+                now = self.clock()
+                while not exhausted and len(active) < inflight:
+                    target = next(pending, None)
+                    if target is None:
+                        exhausted = True
+                        break
+                    key, host, _ = target
+                    active[key] = [host, timeouts.get(key, timeout), [None] * count, 0]
+                    heapq.heappush(sends, (now, next(order), key, 0, False))
+
+                finished = []
+                while sends and sends[0][0] <= now:
+                    _, _, key, i, reserved = heapq.heappop(sends)
+                    host, t, samples, _ = entry = active[key]
+                    if self.pacer and not reserved:
+                        wait_for = self.pacer.reserve(host, key)
+                        if wait_for > 0:
+                            heapq.heappush(sends, (now + wait_for, next(order), key, i, True))
+                            continue
+                    seq = (seq + 1) & 0xffff
+                    try:
+                        sock.sendto(echo_packet(ident, seq, BURST_PAYLOAD), (host, 0))
+                    except OSError as e:
+                        if isinstance(e, BlockingIOError) or e.errno == errno.ENOBUFS:
+                            # buffer di invio pieno: riproviamo fra 1 ms, intanto leggiamo le risposte
+                            heapq.heappush(sends, (now + 0.001, next(order), key, i, True))
+                            break
+                        entry[3] += 1       # es. ENETUNREACH: echo perso
+                    else:
+                        sent = self.clock()
+                        outstanding[(host, seq)] = (key, i, sent)
+                        heapq.heappush(deadlines, (sent + t, host, seq))
+                    if i + 1 < count:
+                        heapq.heappush(sends, (now + self.interval, next(order), key, i + 1, False))
+                    if entry[3] == count:
+                        finished.append(key)
+
+                while deadlines and deadlines[0][0] <= now:
+                    _, host, s = heapq.heappop(deadlines)
+                    found = outstanding.pop((host, s), None)
+                    if found:
+                        entry = active[found[0]]
+                        entry[3] += 1
+                        if entry[3] == count:
+                            finished.append(found[0])
+
+                wait_for = STOP_POLL if stop else timeout
+                if sends:
+                    wait_for = min(wait_for, sends[0][0] - now)
+                if deadlines:
+                    wait_for = min(wait_for, deadlines[0][0] - now)
+                if not finished and sel.select(max(wait_for, 0.0)):
+                    while True:
+                        try:
+                            data, addr = sock.recvfrom(1024)
+                        except (BlockingIOError, InterruptedError):
+                            break
+                        received = self.clock()
+                        parsed = parse_reply(data, raw)
+                        if parsed is None:
+                            continue
+                        icmp_type, reply_ident, reply_seq = parsed
+                        # col socket raw arrivano anche le risposte ai ping di altri processi
+                        if icmp_type != ECHO_REPLY or (raw and reply_ident != ident):
+                            continue
+                        found = outstanding.pop((addr[0], reply_seq), None)
+                        if found is None:
+                            continue
+                        key, i, sent = found
+                        entry = active[key]
+                        entry[2][i] = received - sent
+                        entry[3] += 1
+                        if entry[3] == count:
+                            finished.append(key)
+
+                for key in finished:
+                    yield key, active.pop(key)[2]
+                if exhausted and not active:
+                    return
+                if stop and stop():
+                    return
+        finally:
+            sel.close()
+            sock.close()
+
+
+class TcpProber(Prober):
+    """connect() TCP non bloccanti multiplexati su un unico selector (epoll su Linux).
+
+    Al massimo max_inflight connessioni sono aperte contemporaneamente; ogni tentativo
+    ha una propria deadline. Una connessione completata entro la deadline è un successo (rtt),
+    errori (es. connection refused) e timeout valgono None.
+    """
+
+    def __init__(self, max_inflight=None):
+        self.max_inflight = max_inflight or int(os.environ.get('MP_TCP_MAX_INFLIGHT', 1000))
+
+    @property
+    def concurrency(self):
+        return self.max_inflight
+
+    @staticmethod
+    def _open(host, port):
+        info = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM, flags=socket.AI_NUMERICHOST)
+        family, socktype, proto, _, addr = info[0]
+        sock = socket.socket(family, socktype, proto)
+        sock.setblocking(False)
+        return sock, sock.connect_ex(addr)
+
+    def iter_many(self, targets, timeout=2, count=1, concurrency=None, timeouts=None, stop=None):
+        max_inflight = concurrency or self.max_inflight
+        timeouts = timeouts or {}
+        results = {key: [None] * count for key, _, _ in targets}
+        remaining = {key: count for key in results}
+        ready = []
+
+        def done(key, slot, rtt):
+            results[key][slot] = rtt
+            remaining[key] -= 1
+            if not remaining[key]:
+                ready.append(key)
+
+        pending = [(key, host, port, i) for key, host, port in targets for i in range(count)]
+        pending.reverse()   # pop() dalla coda preservando l'ordine
+        sel = selectors.DefaultSelector()
+        deadlines = []      # heap (deadline, seq, sock)
+        inflight = {}       # sock -> (key, slot, start)
+        seq = 0
+        try:
+            while pending or inflight:
+                while pending and len(inflight) < max_inflight:
+                    key, host, port, slot = pending.pop()
+                    start = time.monotonic()
+                    try:
+                        sock, rc = self._open(host, port)
+                    except (OSError, ValueError):
+                        done(key, slot, None)
+                        continue
+                    if rc == 0:
+                        done(key, slot, time.monotonic() - start)
+                        sock.close()
+                    elif rc in (errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY):
+                        sel.register(sock, selectors.EVENT_WRITE)
+                        inflight[sock] = (key, slot, start)
+                        heapq.heappush(deadlines, (start + timeouts.get(key, timeout), seq, sock))
+                        seq += 1
+                    else:
+                        done(key, slot, None)
+                        sock.close()
+                while ready:
+                    key = ready.pop()
+                    yield key, results[key]
+                if stop and stop():
+                    return
+                if not inflight:
+                    continue
+
+                # scarta deadline di socket già completati
+                while deadlines and deadlines[0][2] not in inflight:
+                    heapq.heappop(deadlines)
+                delay = max(0.0, deadlines[0][0] - time.monotonic()) if deadlines else timeout
+                if stop:
+                    delay = min(delay, STOP_POLL)
+                for skey, _ in sel.select(delay):
+                    sock = skey.fileobj
+                    key, slot, start = inflight.pop(sock)
+                    sel.unregister(sock)
+                    ok = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0
+                    done(key, slot, time.monotonic() - start if ok else None)
+                    sock.close()
+
+                now = time.monotonic()
+                while deadlines and deadlines[0][0] <= now:
+                    _, _, sock = heapq.heappop(deadlines)
+                    if sock in inflight:
+                        key, slot, _ = inflight.pop(sock)
+                        sel.unregister(sock)
+                        sock.close()
+                        done(key, slot, None)
+            while ready:
+                key = ready.pop()
+                yield key, results[key]
+        finally:
+            for sock in inflight:
+                try:
+                    sel.unregister(sock)
+                except Exception:
+                    pass
+                sock.close()
+            sel.close()
@@ -0,0 +1,179 @@
+"""
+Profilazione su richiesta del daemon in esecuzione (CPU e memoria), senza riavviarlo.
+
+Si attiva con `monitor start --profile` oppure a caldo inviando SIGUSR2 al processo (un
+secondo SIGUSR2 la ferma e scrive i report). Mentre è attiva:
+  - cProfile sul thread del ciclo principale (ping_due/ping_all, dump_status)
+  - un campionatore che ogni MP_PROFILE_INTERVAL_MS millisecondi (default 10) legge lo stack
+    di tutti i thread, compresi i worker di conferma DOWN e il pool di probe
+  - tracemalloc (MP_PROFILE_FRAMES frame per allocazione, default 10)
+Alla fermata scrive in MP_PROFILE_DIR (default /var/log/mp_ping/profile), con prefisso
+profile-AAAAMMGG-HHMMSS:
+  .pstats       statistiche cProfile (python -m pstats FILE)
+  .collapsed    stack campionati nel formato collapsed di flamegraph.pl / speedscope
+  -alloc.txt    allocazioni principali e crescita rispetto all'avvio della profilazione
+  -summary.txt  tempo e quota di campioni delle funzioni del ciclo di monitoraggio
+Da disattivata non resta installato nulla: nessun hook di profilazione, nessun thread.
+"""
+import os
+import re
+import sys
+import time
+import pstats
+import cProfile
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+from threading import Event, Lock, Thread, get_ident, enumerate as thread_list
+
+DEFAULT_DIR = '/var/log/mp_ping/profile'
+# funzioni del monitor messe in evidenza nel riepilogo
+FOCUS = ('ping_all', 'ping_due', '_run_cycle', '_confirm_down_worker', 'dump_status')
+
+
+def _thread_label(name):
+    # 'mp_ping-dns_3' e 'Thread-12 (...)' si aggregano per tipo di thread
+    return re.sub(r'[_-]?\d+$', '', re.sub(r' \(.*\)$', '', name)) or name
+
+
+class StackSampler:
+    """Campiona periodicamente lo stack di tutti i thread (escluso il proprio) in formato collapsed."""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.counts = Counter()
+        self.samples = 0
+        self._stop = Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = Thread(target=self._run, name='mp_ping-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(5)
+            self._thread = None
+
+    def _run(self):
+        me = get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in thread_list()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                    frame = frame.f_back
+                stack.append(_thread_label(names.get(ident, str(ident))))
+                self.counts[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self):
+        return '\n'.join(f'{stack} {n}' for stack, n in self.counts.most_common()) + '\n'
+
+
+class Profiler:
+    def __init__(self, directory=None, interval=None, frames=None):
+        self.directory = directory or os.environ.get('MP_PROFILE_DIR', DEFAULT_DIR)
+        self.interval = float(interval or os.environ.get('MP_PROFILE_INTERVAL_MS', 10)) / 1000.0
+        self.frames = int(frames or os.environ.get('MP_PROFILE_FRAMES', 10))
+        self.lock = Lock()
+        self.active = False
+        self._cprofile = None
+        self._sampler = None
+        self._baseline = None
+        self._started = None
+        self._own_tracing = False
+
+    def start(self):
+        """Avvia la profilazione. cProfile segue il thread chiamante (il ciclo principale)."""
+        with self.lock:
+            if self.active:
+                return False
+            self._started = time.time()
+            self._own_tracing = not tracemalloc.is_tracing()
+            if self._own_tracing:
+                tracemalloc.start(self.frames)
+            self._baseline = tracemalloc.take_snapshot()
+            self._sampler = StackSampler(self.interval)
+            self._sampler.start()
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+            self.active = True
+            return True
+
+    def stop(self):
+        """Ferma la profilazione e scrive i report. Restituisce i percorsi dei file scritti."""
+        with self.lock:
+            if not self.active:
+                return []
+            self._cprofile.disable()
+            self._sampler.stop()
+            snapshot = tracemalloc.take_snapshot()
+            if self._own_tracing:
+                tracemalloc.stop()
+            self.active = False
+            try:
+                return self._write_reports(snapshot)
+            finally:
+                self._cprofile = self._sampler = self._baseline = None
+
+    def toggle(self):
+        """Avvia o ferma la profilazione; restituisce i report scritti (vuoto all'avvio)."""
+        if self.active:
+            return self.stop()
+        self.start()
+        return []
+
+    def _write_reports(self, snapshot):
+        os.makedirs(self.directory, exist_ok=True)
+        prefix = os.path.join(self.directory, 'profile-' + datetime.now().strftime('%Y%m%d-%H%M%S'))
+        paths = [f'{prefix}.pstats', f'{prefix}.collapsed', f'{prefix}-alloc.txt', f'{prefix}-summary.txt']
+        self._cprofile.dump_stats(paths[0])
+        with open(paths[1], 'w') as f:
+            f.write(self._sampler.collapsed())
+        with open(paths[2], 'w') as f:
+            f.write(self._alloc_report(snapshot))
+        with open(paths[3], 'w') as f:
+            f.write(self._summary(paths[0]))
+        return paths
+
+    def _alloc_report(self, snapshot, limit=25):
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        snapshot = snapshot.filter_traces(filters)
+        current = sum(s.size for s in snapshot.statistics('filename'))
+        lines = [f'Memoria tracciata: {current / 1024 / 1024:.1f} MiB', '', f'Prime {limit} allocazioni per riga:']
+        for stat in snapshot.statistics('lineno')[:limit]:
+            lines.append(f'  {stat.size / 1024:10.1f} KiB  {stat.count:8d} blocchi  {stat.traceback[0]}')
+        lines += ['', f'Crescita rispetto all\'avvio della profilazione (prime {limit}):']
+        for stat in snapshot.compare_to(self._baseline.filter_traces(filters), 'traceback')[:limit]:
+            if stat.size_diff <= 0:
+                break
+            lines.append(f'  +{stat.size_diff / 1024:.1f} KiB ({stat.count_diff:+d} blocchi)')
+            lines += [f'      {frame}' for frame in stat.traceback.format()[-6:]]
+        return '\n'.join(lines) + '\n'
+
+    def _summary(self, pstats_path):
+        elapsed = time.time() - self._started
+        lines = [f'Durata profilazione: {elapsed:.1f}s, campioni: {self._sampler.samples}', '',
+                 'Ciclo principale (cProfile): chiamate, tempo cumulativo, tempo proprio']
+        stats = pstats.Stats(pstats_path).stats
+        for name in FOCUS:
+            rows = [v for (filename, _, func), v in stats.items()
+                    if func == name and os.path.basename(filename) == 'monitor.py']
+            if rows:
+                calls = sum(r[1] for r in rows)
+                lines.append(f'  {name:<22} {calls:8d}  {sum(r[3] for r in rows):9.3f}s  {sum(r[2] for r in rows):9.3f}s')
+        # un campione per thread a ogni passata: con più worker di conferma la quota supera il 100%
+        lines += ['', 'Tutti i thread (campionatore): campioni con la funzione nello stack, in % delle passate']
+        passes = self._sampler.samples or 1
+        for name in FOCUS:
+            hits = sum(n for stack, n in self._sampler.counts.items() if f';{name} (monitor.py:' in stack)
+            if hits:
+                lines.append(f'  {name:<22} {hits:8d} campioni  {100.0 * hits / passes:6.1f}%')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,174 @@
+"""
+Report di disponibilità/SLA calcolati dallo storico delle transizioni (history.jsonl).
+
+Il calcolo è vettoriale (NumPy) su tutta la flotta: ogni transizione apre un segmento
+che dura fino alla transizione successiva dello stesso host (o fino alla fine della finestra);
+i segmenti vengono ritagliati sulla finestra [start, end] e aggregati per host/gruppo con bincount.
+
+Classificazione degli stati:
+  - DOWN                   -> tempo di disservizio
+  - UP, DEGRADED, CHECKING -> tempo di servizio (CHECKING non è ancora un DOWN confermato)
+  - UNKNOWN/None (pausa)   -> tempo non monitorato, escluso dal calcolo
+"""
+import csv
+import io
+import json
+import numpy as np
+
+UP_STATES = ('UP', 'DEGRADED', 'CHECKING')
+DOWN_STATES = ('DOWN',)
+
+# codici numerici degli stati usati negli array
+STATE_OTHER = 0
+STATE_UP = 1
+STATE_DOWN = 2
+
+FIELDS = ['key', 'availability', 'uptime_s', 'downtime_s', 'outages', 'mttr_s', 'mtbf_s', 'longest_outage_s']
+
+
+def _state_code(state):
+    if state in UP_STATES:
+        return STATE_UP
+    if state in DOWN_STATES:
+        return STATE_DOWN
+    return STATE_OTHER
+
+
+def load_transitions(records, until=None):
+    """Converte i record dello storico in array (hosts, host_idx, ts, state).
+    I record successivi a `until` vengono ignorati."""
+    host_index = {}
+    idx, ts, st = [], [], []
+    for rec in records:
+        t = rec.get('ts')
+        if t is None:
+            continue
+        if until is not None and t > until:
+            break
+        ip = rec.get('ip')
+        i = host_index.get(ip)
+        if i is None:
+            i = host_index[ip] = len(host_index)
+        idx.append(i)
+        ts.append(t)
+        st.append(_state_code(rec.get('to')))
+    hosts = list(host_index)
+    return (hosts,
+            np.asarray(idx, dtype=np.int64),
+            np.asarray(ts, dtype=np.float64),
+            np.asarray(st, dtype=np.int8))
+
+
+def host_metrics(host_idx, ts, state, n_hosts, start, end):
+    """Calcola le metriche per host nella finestra [start, end].
+    Restituisce un dict di array di lunghezza n_hosts (uptime, downtime, outages, longest)."""
+    uptime = np.zeros(n_hosts)
+    downtime = np.zeros(n_hosts)
+    outages = np.zeros(n_hosts, dtype=np.int64)
+    longest = np.zeros(n_hosts)
+    if len(ts) == 0:
+        return {'uptime': uptime, 'downtime': downtime, 'outages': outages, 'longest': longest}
+
+    # ordina per (host, ts) mantenendo l'ordine di scrittura a parità di timestamp
+    order = np.lexsort((np.arange(len(ts)), ts, host_idx))
+    h, t, s = host_idx[order], ts[order], state[order]
+
+    # scarta le transizioni che non cambiano classe (es. UP -> CHECKING -> UP)
+    first = np.ones(len(h), dtype=bool)
+    first[1:] = h[1:] != h[:-1]
+    keep = first.copy()
+    keep[1:] |= s[1:] != s[:-1]
+    h, t, s, first = h[keep], t[keep], s[keep], first[keep]
+
+    # ogni segmento termina alla transizione successiva dello stesso host, l'ultimo a `end`
+    nxt = np.empty_like(t)
+    nxt[:-1] = t[1:]
+    nxt[-1] = end
+    last = np.ones(len(h), dtype=bool)
+    last[:-1] = h[:-1] != h[1:]
+    nxt[last] = end
+
+    seg = np.clip(nxt, start, end) - np.clip(t, start, end)
+    seg = np.maximum(seg, 0.0)
+
+    is_up = s == STATE_UP
+    is_down = (s == STATE_DOWN) & (seg > 0)
+    uptime = np.bincount(h, weights=np.where(is_up, seg, 0.0), minlength=n_hosts)
+    downtime = np.bincount(h, weights=np.where(is_down, seg, 0.0), minlength=n_hosts)
+    outages = np.bincount(h[is_down], minlength=n_hosts)
+    np.maximum.at(longest, h[is_down], seg[is_down])
+    return {'uptime': uptime, 'downtime': downtime, 'outages': outages, 'longest': longest}
+
+
+def _finalize(uptime, downtime, outages, longest):
+    """Deriva availability/MTTR/MTBF dagli aggregati (NaN dove non definiti)."""
+    monitored = uptime + downtime
+    with np.errstate(divide='ignore', invalid='ignore'):
+        availability = np.where(monitored > 0, uptime / monitored * 100.0, np.nan)
+        mttr = np.where(outages > 0, downtime / np.maximum(outages, 1), np.nan)
+        mtbf = np.where(outages > 0, uptime / np.maximum(outages, 1), np.nan)
+    return {
+        'availability': availability,
+        'uptime_s': uptime,
+        'downtime_s': downtime,
+        'outages': outages,
+        'mttr_s': mttr,
+        'mtbf_s': mtbf,
+        'longest_outage_s': longest,
+    }
+
+
+def group_metrics(metrics, host_groups):
+    """Aggrega le metriche per gruppo. host_groups: lista (parallela agli host) di nomi gruppo."""
+    groups, gidx = np.unique(np.asarray(host_groups, dtype=object).astype(str), return_inverse=True)
+    n = len(groups)
+    longest = np.zeros(n)
+    np.maximum.at(longest, gidx, metrics['longest'])
+    agg = _finalize(
+        np.bincount(gidx, weights=metrics['uptime'], minlength=n),
+        np.bincount(gidx, weights=metrics['downtime'], minlength=n),
+        np.bincount(gidx, weights=metrics['outages'], minlength=n).astype(np.int64),
+        longest,
+    )
+    return list(groups), agg
+
+
+def build_report(records, start, end, host_groups=None, by='host'):
+    """Costruisce il report come lista di dict (una riga per host o per gruppo).
+
+    records: iterabile di record dello storico (ordine cronologico)
+    host_groups: dict ip -> gruppo (necessario per by='group')
+    """
+    hosts, idx, ts, st = load_transitions(records, until=end)
+    metrics = host_metrics(idx, ts, st, len(hosts), start, end)
+    if by == 'group':
+        host_groups = host_groups or {}
+        keys, agg = group_metrics(metrics, [host_groups.get(ip) or '(nessun gruppo)' for ip in hosts])
+    else:
+        keys = hosts
+        agg = _finalize(metrics['uptime'], metrics['downtime'], metrics['outages'], metrics['longest'])
+
+    rows = []
+    for i, key in enumerate(keys):
+        row = {'key': key}
+        for field in FIELDS[1:]:
+            v = agg[field][i]
+            if field == 'outages':
+                row[field] = int(v)
+            elif np.isnan(v):
+                row[field] = None
+            else:
+                row[field] = round(float(v), 4 if field == 'availability' else 1)
+        rows.append(row)
+    return rows
+
+
+def format_rows(rows, fmt='csv'):
+    if fmt == 'json':
+        return json.dumps(rows, indent=2, ensure_ascii=False)
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=FIELDS)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow({k: ('' if v is None else v) for k, v in row.items()})
+    return buf.getvalue()
@@ -0,0 +1,214 @@
+"""
+Target hostname/IPv6 e cache di risoluzione DNS asincrona.
+
+Il campo `ip` di una connessione può contenere un IPv4, un IPv6 o un hostname. Gli hostname
+sono risolti da un pool di thread separato dal ciclo di probe (ResolverCache), con:
+  - TTL del record rispettato se è disponibile dnspython (modulo `dns`, opzionale), altrimenti
+    MP_DNS_TTL secondi (default 300); limiti MP_DNS_MIN_TTL / MP_DNS_MAX_TTL
+  - rinnovo in background prima della scadenza (all'80% del TTL)
+  - cache delle risposte negative per MP_DNS_NEGATIVE_TTL secondi (default 60)
+  - una sola richiesta in corso per nome: le richieste concorrenti condividono il risultato
+  - se un rinnovo fallisce si continua a usare l'ultimo indirizzo noto per MP_DNS_STALE
+    secondi (default 300) oltre la scadenza
+Un nome che non si risolve porta la connessione nello stato UNRESOLVED, distinto da DOWN.
+"""
+import os
+import re
+import time
+import socket
+import ipaddress
+from threading import Lock
+from concurrent.futures import ThreadPoolExecutor, wait
+
+# dnspython è opzionale: serve per conoscere il TTL dei record
+try:
+    import dns.resolver
+    HAVE_DNSPYTHON = True
+except Exception:
+    HAVE_DNSPYTHON = False
+
+HOSTNAME_RE = re.compile(r'^(?!-)[a-z0-9-]{1,63}(?<!-)(\.(?!-)[a-z0-9-]{1,63}(?<!-))*$')
+
+
+def is_ip(value):
+    try:
+        ipaddress.ip_address(value)
+        return True
+    except ValueError:
+        return False
+
+
+def normalize_target(value):
+    """Normalizza il target di una connessione (IP in forma canonica, hostname minuscolo).
+    Solleva ValueError se non è né un IP né un hostname valido."""
+    value = (value or '').strip()
+    try:
+        return str(ipaddress.ip_address(value))
+    except ValueError:
+        pass
+    name = value.lower().rstrip('.')
+    # un nome fatto solo di cifre e punti è un IPv4 scritto male, non un hostname
+    if len(name) <= 253 and HOSTNAME_RE.match(name) and not re.fullmatch(r'[0-9.]+', name):
+        return name
+    raise ValueError(f"Indirizzo IP o hostname non valido: '{value}'")
+
+
+def is_valid_target(value):
+    try:
+        normalize_target(value)
+        return True
+    except ValueError:
+        return False
+
+
+def system_resolve(name):
+    """Risoluzione con il resolver di sistema (getaddrinfo): nessun TTL disponibile.
+    Con MP_DNS_FAMILY=4 o 6 si limita la famiglia di indirizzi."""
+    family = {'4': socket.AF_INET, '6': socket.AF_INET6}.get(os.environ.get('MP_DNS_FAMILY', ''), socket.AF_UNSPEC)
+    info = socket.getaddrinfo(name, None, family, socket.SOCK_STREAM)
+    return info[0][4][0], None
+
+
+def dnspython_resolve(name):
+    """Risoluzione con dnspython (record A, poi AAAA) restituendo anche il TTL."""
+    last = None
+    for rdtype in ('A', 'AAAA'):
+        try:
+            answer = dns.resolver.resolve(name, rdtype)
+            return answer[0].to_text(), answer.rrset.ttl
+        except (dns.resolver.NoAnswer, dns.resolver.NXDOMAIN) as e:
+            last = e
+            if isinstance(e, dns.resolver.NXDOMAIN):
+                break
+    raise socket.gaierror(f'{name}: {last}')
+
+
+class _Entry:
+    __slots__ = ('address', 'error', 'expires', 'refresh_at')
+
+    def __init__(self, address, error, expires, refresh_at):
+        self.address = address
+        self.error = error
+        self.expires = expires
+        self.refresh_at = refresh_at
+
+
+class ResolverCache:
+    def __init__(self, resolve=None, workers=None, clock=time.monotonic):
+        self.resolve = resolve or (dnspython_resolve if HAVE_DNSPYTHON else system_resolve)
+        self.default_ttl = float(os.environ.get('MP_DNS_TTL', 300))
+        self.min_ttl = float(os.environ.get('MP_DNS_MIN_TTL', 30))
+        self.max_ttl = float(os.environ.get('MP_DNS_MAX_TTL', 3600))
+        self.negative_ttl = float(os.environ.get('MP_DNS_NEGATIVE_TTL', 60))
+        self.stale = float(os.environ.get('MP_DNS_STALE', 300))
+        self.refresh_ahead = 0.8
+        self.clock = clock
+        self.workers = workers or int(os.environ.get('MP_DNS_WORKERS', 8))
+        self._pool = None       # creato alla prima risoluzione (e di nuovo dopo close)
+        self._lock = Lock()
+        self._entries = {}      # nome -> _Entry
+        self._inflight = {}     # nome -> Future (coalescenza)
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.failures = 0
+
+    def _submit(self, name):
+        with self._lock:
+            fut = self._inflight.get(name)
+            if fut is not None:
+                self.coalesced += 1
+                return fut
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='mp_ping-dns')
+            fut = self._pool.submit(self._resolve_and_store, name)
+            self._inflight[name] = fut
+            return fut
+
+    def _resolve_and_store(self, name):
+        try:
+            try:
+                address, ttl = self.resolve(name)
+                ttl = min(max(ttl if ttl is not None else self.default_ttl, self.min_ttl), self.max_ttl)
+                now = self.clock()
+                entry = _Entry(address, None, now + ttl, now + ttl * self.refresh_ahead)
+            except Exception as e:
+                now = self.clock()
+                with self._lock:
+                    self.failures += 1
+                    old = self._entries.get(name)
+                if old is not None and old.address and now < old.expires + self.stale:
+                    # serve-stale: resta valido l'ultimo indirizzo, si riprova dopo negative_ttl
+                    entry = _Entry(old.address, str(e), old.expires, now + self.negative_ttl)
+                else:
+                    expires = now + self.negative_ttl
+                    entry = _Entry(None, str(e) or e.__class__.__name__, expires, expires)
+            with self._lock:
+                self._entries[name] = entry
+            return entry
+        finally:
+            with self._lock:
+                self._inflight.pop(name, None)
+
+    def _usable(self, entry, now):
+        """Voce utilizzabile senza attendere: positiva non scaduta (o nel periodo stale) oppure negativa valida."""
+        if entry is None:
+            return False
+        if entry.address:
+            return now < entry.expires + (self.stale if entry.error else 0)
+        return now < entry.expires
+
+    def lookup(self, name):
+        """Non bloccante: (indirizzo o None, errore o None) se il nome è in cache, altrimenti None.
+        Avvia in background la risoluzione dei nomi mancanti o scaduti e il rinnovo anticipato."""
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(name)
+        if not self._usable(entry, now):
+            self.misses += 1
+            self._submit(name)
+            return None
+        self.hits += 1
+        if now >= entry.refresh_at:
+            self._submit(name)
+        return entry.address, entry.error
+
+    def resolve_many(self, names, timeout=2):
+        """Risolve i nomi in parallelo attendendo al massimo `timeout` secondi in totale per quelli
+        non in cache. Restituisce {nome: (indirizzo o None, errore o None)}; indirizzo None solo per un
+        errore del resolver o una risposta negativa. I nomi ancora in risoluzione allo scadere del
+        timeout non compaiono nel risultato (DNS lento, non un nome inesistente)."""
+        out = {}
+        pending = {}
+        for name in names:
+            cached = self.lookup(name)
+            if cached is not None:
+                out[name] = cached
+            else:
+                # lookup ha già avviato la risoluzione (None se è già terminata)
+                with self._lock:
+                    pending[name] = self._inflight.get(name)
+        if pending:
+            wait([f for f in pending.values() if f is not None], timeout=timeout)
+            now = self.clock()
+            for name in pending:
+                with self._lock:
+                    entry = self._entries.get(name)
+                if self._usable(entry, now):
+                    out[name] = (entry.address, entry.error)
+        return out
+
+    def last_error(self, name):
+        with self._lock:
+            entry = self._entries.get(name)
+        return entry.error if entry else None
+
+    def stats(self):
+        return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses,
+                'coalesced': self.coalesced, 'failures': self.failures}
+
+    def close(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool:
+            pool.shutdown(wait=False)
@@ -0,0 +1,84 @@
+"""
+Timeout di probe adattivi per host, ricavati dalla distribuzione recente degli RTT.
+
+Come il calcolo dell'RTO di TCP (RFC 6298) ogni host ha una media mobile dell'RTT (SRTT,
+peso 1/8) e della sua variabilità (RTTVAR, peso 1/4); SRTT + 4 * RTTVAR stima un percentile
+alto (circa il p99) dell'RTT e il timeout è quel valore moltiplicato per MP_TIMEOUT_FACTOR
+(default 3), limitato tra MP_TIMEOUT_MIN (default 0.2 s) e il timeout fisso del monitor
+(probe_timeout, 2 s). Gli host senza misure usano il timeout fisso.
+
+Un probe scaduto con il timeout adattivo è una perdita probabile, non ancora un DOWN: viene
+ripetuto una volta con il timeout raddoppiato (retry()), come il backoff di TCP. Così un host
+irraggiungibile su LAN costa ~0.6 s invece di 2 s, un link satellitare a 600 ms non va in
+timeout e una risposta appena oltre la stima non diventa un falso DOWN.
+
+Le stime stanno in HostTable (colonne srtt e rttvar, in ms) e si aggiornano anche in blocco
+(observe_many, NumPy) per la simulazione.
+"""
+import os
+import math
+import numpy as np
+
+ALPHA = 1 / 8
+BETA = 1 / 4
+
+
+class AdaptiveTimeout:
+    def __init__(self, maximum, minimum=None, factor=None, enabled=None):
+        self.maximum = float(maximum)
+        self.minimum = min(float(minimum or os.environ.get('MP_TIMEOUT_MIN', 0.2)), self.maximum)
+        self.factor = float(factor or os.environ.get('MP_TIMEOUT_FACTOR', 3))
+        if enabled is None:
+            enabled = os.environ.get('MP_ADAPTIVE_TIMEOUT', '1') != '0'
+        self.enabled = enabled
+        self.retried = 0        # probe scaduti con timeout adattivo e ripetuti
+        self.recovered = 0      # ... che alla ripetizione hanno risposto
+
+    def observe(self, table, row, rtt):
+        """Aggiorna SRTT/RTTVAR della riga con un RTT misurato (secondi)."""
+        r = rtt * 1000.0
+        srtt = table.srtt[row]
+        if math.isnan(srtt):
+            table.srtt[row] = r
+            table.rttvar[row] = r / 2
+        else:
+            table.rttvar[row] = (1 - BETA) * table.rttvar[row] + BETA * abs(srtt - r)
+            table.srtt[row] = (1 - ALPHA) * srtt + ALPHA * r
+
+    def observe_many(self, table, rows, rtts):
+        """observe() vettoriale: rows indici di riga (senza ripetizioni), rtts in secondi."""
+        if not len(rows):
+            return
+        r = np.asarray(rtts, dtype=np.float32) * 1000.0
+        srtt = np.frombuffer(table.srtt, dtype=np.float32)
+        rttvar = np.frombuffer(table.rttvar, dtype=np.float32)
+        s = srtt[rows]
+        new = np.isnan(s)
+        rttvar[rows] = np.where(new, r / 2, (1 - BETA) * rttvar[rows] + BETA * np.abs(s - r))
+        srtt[rows] = np.where(new, r, (1 - ALPHA) * s + ALPHA * r)
+
+    def timeout(self, table, row):
+        """Timeout (secondi) del prossimo probe della riga (None = host sconosciuto: timeout fisso)."""
+        if not self.enabled or row is None or math.isnan(table.srtt[row]):
+            return self.maximum
+        estimate = (table.srtt[row] + 4 * table.rttvar[row]) / 1000.0
+        return min(max(self.factor * estimate, self.minimum), self.maximum)
+
+    def timeouts(self, table, rows):
+        """timeout() vettoriale per gli indici di riga indicati (array NumPy di secondi)."""
+        if not self.enabled:
+            return np.full(len(rows), self.maximum)
+        srtt = np.frombuffer(table.srtt, dtype=np.float32)[rows].astype(np.float64)
+        rttvar = np.frombuffer(table.rttvar, dtype=np.float32)[rows].astype(np.float64)
+        out = np.clip(self.factor * (srtt + 4 * rttvar) / 1000.0, self.minimum, self.maximum)
+        return np.where(np.isnan(srtt), self.maximum, out)
+
+    def retry(self, timeout):
+        """Timeout della ripetizione dopo una scadenza anticipata (None se non c'è ripetizione)."""
+        if timeout >= self.maximum:
+            return None
+        return min(2 * timeout, self.maximum)
+
+    def stats(self):
+        return {'adaptive': self.enabled, 'min': self.minimum, 'max': self.maximum, 'factor': self.factor,
+                'retried': self.retried, 'recovered': self.recovered}
@@ -0,0 +1,118 @@
+"""
+Livelli di priorità (tier) delle connessioni e ordinamento weighted-fair dei probe.
+
+Ogni connessione può indicare il campo `tier` (alias `priority`): critical, high, normal
+(default) o low. Per ogni tier si configurano:
+  - peso WFQ (MP_TIER_WEIGHTS, default critical=8,high=4,normal=2,low=1): quota di posti
+    in testa al ciclo; ogni tier con peso > 0 riceve comunque la sua quota, quindi i tier
+    bassi non restano mai indietro indefinitamente
+  - intervallo come frazione di MP_PING_INTERVAL (MP_TIER_INTERVALS, default
+    critical=0.25,high=0.5,normal=1,low=1)
+  - quota di concorrenza riservata (MP_TIER_RESERVED, default critical=0.25): frazione dei
+    worker del prober dedicata al tier, sondato in parallelo al resto del ciclo
+"""
+import os
+import heapq
+from collections import deque
+
+TIERS = ('critical', 'high', 'normal', 'low')
+DEFAULT_TIER = 'normal'
+
+DEFAULT_WEIGHTS = {'critical': 8, 'high': 4, 'normal': 2, 'low': 1}
+DEFAULT_INTERVALS = {'critical': 0.25, 'high': 0.5, 'normal': 1.0, 'low': 1.0}
+DEFAULT_RESERVED = {'critical': 0.25}
+
+
+def parse_tier(value):
+    """Normalizza il tier di una connessione (nome o indice 0-3). Solleva ValueError se non valido."""
+    if value is None or value == '':
+        return DEFAULT_TIER
+    if isinstance(value, int) and not isinstance(value, bool):
+        if 0 <= value < len(TIERS):
+            return TIERS[value]
+    elif isinstance(value, str):
+        tier = value.strip().lower()
+        if tier in TIERS:
+            return tier
+        if tier.isdigit() and int(tier) < len(TIERS):
+            return TIERS[int(tier)]
+    raise ValueError(f"Tier non supportato: '{value}' (usa {', '.join(TIERS)})")
+
+
+def connection_tier(conn):
+    """Tier della connessione; valori non validi valgono il tier di default."""
+    try:
+        return parse_tier(conn.get('tier', conn.get('priority')))
+    except ValueError:
+        return DEFAULT_TIER
+
+
+def _parse_map(spec, defaults, cast=float):
+    """'critical=8,low=1' -> dict completo per tutti i tier (i mancanti prendono il default)."""
+    out = {tier: defaults.get(tier, 0) for tier in TIERS}
+    for item in (spec or '').split(','):
+        if not item.strip():
+            continue
+        key, _, value = item.partition('=')
+        out[parse_tier(key)] = cast(value)
+    return out
+
+
+def load_tier_config():
+    """Configurazione dei tier da variabili d'ambiente: {tier: {'weight', 'interval', 'reserved'}}."""
+    weights = _parse_map(os.environ.get('MP_TIER_WEIGHTS'), DEFAULT_WEIGHTS)
+    intervals = _parse_map(os.environ.get('MP_TIER_INTERVALS'), DEFAULT_INTERVALS)
+    reserved = _parse_map(os.environ.get('MP_TIER_RESERVED'), DEFAULT_RESERVED)
+    return {tier: {'weight': max(weights[tier], 0.0),
+                   'interval': intervals[tier] if intervals[tier] > 0 else 1.0,
+                   'reserved': min(max(reserved[tier], 0.0), 0.9)}
+            for tier in TIERS}
+
+
+def wfq_order(conns, config):
+    """Ordina le connessioni con weighted fair queuing tra i tier.
+
+    Ogni tier è una coda FIFO (ordine del file); a ogni passo si serve la coda con il tempo
+    virtuale di fine più basso, che avanza di 1/peso per ogni connessione servita. Con pesi
+    8:4:2:1 in testa al ciclo ci sono 8 critical ogni 4 high, 2 normal e 1 low. Un tier con
+    peso 0 viene servito dopo tutti gli altri.
+    """
+    queues = {}
+    for conn in conns:
+        queues.setdefault(connection_tier(conn), deque()).append(conn)
+    heap = []
+    for tier, queue in queues.items():
+        weight = config[tier]['weight']
+        step = 1.0 / weight if weight > 0 else float('inf')
+        heapq.heappush(heap, (step, TIERS.index(tier), step, queue))
+    out = []
+    while heap:
+        finish, rank, step, queue = heapq.heappop(heap)
+        out.append(queue.popleft())
+        if queue:
+            heapq.heappush(heap, (finish + step if step != float('inf') else finish, rank, step, queue))
+    return out
+
+
+class DetectStats:
+    """Tempi di rilevamento per tier: 'detect' = dall'ultimo probe riuscito al primo fallito,
+    'confirm' = dall'ultimo probe riuscito al DOWN confermato. Conserva gli ultimi campioni."""
+
+    def __init__(self, maxlen=1000):
+        self.maxlen = maxlen
+        self.samples = {}
+
+    def record(self, tier, kind, seconds):
+        self.samples.setdefault((tier, kind), deque(maxlen=self.maxlen)).append(seconds)
+
+    def summary(self):
+        out = {}
+        for (tier, kind), values in self.samples.items():
+            ordered = sorted(values)
+            out.setdefault(tier, {})[kind] = {
+                'count': len(ordered),
+                'avg': round(sum(ordered) / len(ordered), 1),
+                'p95': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 1),
+                'max': round(ordered[-1], 1),
+            }
+        return out
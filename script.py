@@ -1,265 +1,269 @@
-import json
 import os
-import threading
+import sys
 import time
-import smtplib
-import portalocker
-import ipaddress
-import public_ip
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from ping3 import ping
-import tkinter as tk
-from tkinter import messagebox
+import queue
+from concurrent.futures import ThreadPoolExecutor
 from threading import Thread
 from datetime import datetime
+from monitor import Monitor
+from guimodel import ConnectionRows
+from resolver import is_valid_target
+from shmstatus import read_live_status
+import tkinter as tk
+from tkinter import messagebox, ttk
 
-# Configurazione
+# Configurazione: senza variabili MP_* la GUI usa i file nella directory corrente
 CONNECTIONS_FILE = "connections.json"
-monitoring = False
-update_interval = 15 * 60  # 15 minuti in secondi
-completed_pings = 0  # Contatore globale per tenere traccia dei ping completati
-lock = threading.Lock()  # Blocco per evitare condizioni di race quando si modifica il contatore
-down_times = {}
+STATUS_FILE = "status.json"
+HISTORY_FILE = "history.jsonl"
+# "engine": la GUI esegue il Monitor nel proprio processo; "live": legge lo stato del daemon
+# dalla memoria condivisa (MP_SHM_PATH) in sola lettura
+SOURCE = "live" if "--live" in sys.argv[1:] else os.environ.get("MP_GUI_SOURCE", "engine")
+LIVE_POLL = float(os.environ.get("MP_GUI_POLL", 2))
+VISIBLE_ROWS = 25               # righe (slot) della Treeview: solo queste vengono disegnate
+UPDATE_MS = 100                 # ogni quanto il main loop Tk svuota la coda degli aggiornamenti
+UPDATE_BUDGET = 0.05            # secondi massimi spesi a ogni svuotamento (la GUI resta reattiva)
 
-def get_public_ip():
-    try:
-        return public_ip.get()
-    except Exception as e:
-        messagebox.showerror(f"Errore durante il recupero dell'IP pubblico: {e}")
-        return None
+# Gli aggiornamenti arrivano al main loop Tk solo attraverso questa coda: il Monitor (feed),
+# il lettore live e i comandi in background non toccano mai i widget
+updates = queue.Queue()
+# modifiche alle connessioni eseguite in ordine, fuori dal main loop (salvataggio, database)
+commands = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mp_ping-gui")
+rows = ConnectionRows(VISIBLE_ROWS)
+engine = None
 
-def load_connections():
-    try:
-        if os.path.exists(CONNECTIONS_FILE):
-            with open(CONNECTIONS_FILE, "r") as file:
-                return json.load(file)
-    except Exception as e:
-        messagebox.showerror(f"Errore durante il caricamento delle connessioni: {e}")
-        exit
-    return []
 
-def save_connections(connections):
-    for attempt in range(5):  # Prova 5 volte
+class QueueFeed:
+    """Feed del Monitor che consegna transizioni ed eventi di fine ciclo alla coda della GUI."""
+
+    def publish(self, event):
+        updates.put(event)
+
+    def close(self):
+        pass
+
+
+def create_monitor():
+    if SOURCE == "live":
+        # configurazione e segmento condiviso del daemon (MP_PING_CONFIG, MP_SHM_PATH)
+        return Monitor()
+    monitor = Monitor(config_path=os.environ.get("MP_PING_CONFIG", CONNECTIONS_FILE),
+                      status_path=os.environ.get("MP_STATUS_FILE", STATUS_FILE),
+                      history_path=os.environ.get("MP_HISTORY_FILE", HISTORY_FILE))
+    monitor.shm_path = ""       # la GUI non pubblica il segmento del daemon
+    return monitor
+
+
+monitor = create_monitor()
+
+
+def snapshot_event():
+    """Elenco connessioni e stato correnti del Monitor, per ricaricare la lista."""
+    with monitor.lock:
+        status = monitor.hosts.status_dict()
+        rtt = {ip: st['rtt_avg'] for ip, st in monitor.hosts.metrics_dict().items()}
+    return {"type": "reload", "connections": list(monitor.connections), "status": status, "rtt": rtt}
+
+
+def engine_rtt(ip):
+    with monitor.lock:
+        row = monitor.hosts.row(ip)
+        return None if row is None else monitor.hosts.rtt[row]
+
+
+def run_command(func, *args):
+    """Esegue una modifica alle connessioni sull'executor e ricarica la lista a operazione conclusa."""
+    def task():
         try:
-            with open(CONNECTIONS_FILE, "w") as file:
-                # Blocca il file per impedirne l'accesso simultaneo
-                portalocker.lock(file, portalocker.LOCK_EX)
-                json.dump(connections, file, indent=4)
-                # Rilascia il blocco
-                portalocker.unlock(file)
-            return
+            func(*args)
         except Exception as e:
-            print(f"Errore al tentativo {attempt + 1}: {e}")
-            time.sleep(0.5)  # Aspetta mezzo secondo prima di riprovare
-    messagebox.showerror("Impossibile salvare le connessioni dopo 5 tentativi.")
-    exit
-
-connections = load_connections()
-last_status = {conn["ip"]: None for conn in connections}
-
-def add_connection(name, ip):
-    connections.append({"name": name, "ip": ip, "enabled": True})
-    connections.sort(key=sort_key)  # Ordina dopo l'aggiunta
-    save_connections(connections)
-    last_status[ip] = "UNKNOWN"
-    update_listbox_with_status(last_status)
-
-def remove_connection(index):
-    selected_ip = connections[index]["ip"]
-    del last_status[selected_ip]
-    del connections[index]
-    save_connections(connections)
-    update_listbox_with_status(last_status)
-
-def sort_key(connection):
-    # Rimuove la parte fino al primo trattino incluso per determinare la chiave di ordinamento
-    name = connection["name"]
-    return name.split("-", 1)[-1].strip().lower()  # Prende tutto dopo il primo trattino
-
-def send_email_alert(name, ip, status, text=""):
-    # Configura l'invio di email qui
-    print(f"ALERT: {name} ({ip}) è ora {status}")
-
-    sender_email = "postmaster@multipedia.it"  # Inserisci la tua email
-    sender_password = "pm-MP@22"  # Inserisci la tua password (assicurati di tenerla al sicuro)
-    recipient_email = "ticket@multipedia.it"  # Inserisci l'email del destinatario
-    smtp_server = "out.postassl.it"  # Server SMTP del tuo provider (es. smtp.gmail.com per Gmail)
-    sender_name = "Multipedia Ping"  # Nome che desideri mostrare come mittente
-
-    # Creazione del messaggio
-    subject = f"Connessione {status}: {name} ({ip})"
-    body = f"L'indirizzo IP {ip} per la connessione {name} è ora {status}.\n\n{text}"
-    msg = MIMEMultipart()
-    msg["From"] = f"{sender_name} <{sender_email}>"
-    msg["To"] = recipient_email
-    msg["Subject"] = subject
-    msg.attach(MIMEText(body, "plain"))
+            updates.put({"type": "error", "message": str(e)})
+        updates.put(snapshot_event())
+        # le connessioni nuove o riprese vengono sondate subito, senza attendere l'intervallo
+        monitor.wake()
+    commands.submit(task)
 
-    try:
-        # Creazione della connessione SMTP utilizzando SSL
-        with smtplib.SMTP_SSL(smtp_server, 465) as server:
-            server.login(sender_email, sender_password)
-            server.sendmail(sender_email, recipient_email, msg.as_string())
-        print(f"Email inviata con successo a {recipient_email}.")
-    except Exception as e:
-        print(f"Errore nell'invio dell'email: {e}")
 
-def monitor_ips(status_label, update_label):
-    global monitoring, completed_pings
-    while monitoring:
-        completed_pings = 0  # Resetta il contatore all'inizio di ogni ciclo di monitoraggio
-        total_connections = len(connections)  # Numero totale di connessioni
-        public_ip = get_public_ip()
-        print(f"IP pubblico: {public_ip}")
+def edit_connection(old, name, ip):
+    conn = monitor.new_connection(name, ip, probe=old.get("probe"), tier=old.get("tier"))
+    monitor.remove_connection(ip=old["ip"])
+    monitor.add_connections([conn])
 
-        for conn in connections:
-            Thread(target=ping_connection, args=(conn, last_status, total_connections, update_label, public_ip)).start()
 
-        for i in range(update_interval, 0, -1):
-            if not monitoring:
-                status_label.config(text="Monitoraggio non attivo")
-                break
-            status_label.config(text=f"Prossimo ping in {i} secondi")
-            status_label.update()
-            time.sleep(1)
-
-def ping_connection(conn, last_status, total_connections, update_label, public_ip, retries=10):
-    global completed_pings
-    ip = conn["ip"]
-    name = conn["name"]
-
-    # Salta il ping se la connessione è disabilitata
-    if not conn.get("enabled", True) or ip == public_ip:
-        last_status[conn["ip"]] = "UNKNOWN"
-        with lock:
-            completed_pings += 1
-            if completed_pings == total_connections:
-                update_label.config(text=f"Ultimo aggiornamento: {datetime.now().strftime('%H:%M:%S')}")
-                update_label.update()
-                update_listbox_with_status(last_status)  # Aggiorna la GUI
-        return
-
-    for _ in range(retries):
-        response = ping(ip)
-        if response:
-            # print(f"{ip} OK")
-            break
-        print(f"{ip} nuovo tentativo a breve...")
-        time.sleep(0.5)  # Pausa tra i tentativi per evitare sovraccarico
-
-    # print(f"{ip} Ping response: {response}")
-    current_status = "UP" if response else "DOWN"
-
-    if last_status[ip] is not None and last_status[ip] != current_status:
-        if current_status == "DOWN":
-            # Memorizza l'orario di inizio del "DOWN"
-            down_times[ip] = datetime.now()
-            print(f"{down_times[ip].strftime("%H:%M:%S")} \tIP: {ip} | Last: {last_status[ip]} | Current: {current_status}")
-            send_email_alert(name, ip, current_status, f"Connessione DOWN alle {down_times[ip].strftime("%H:%M:%S")}")
-        elif current_status == "UP":
-            down_minutes = "?"
-            down_seconds = "?"
-            if ip in down_times:
-                # Calcola il tempo di "DOWN" e invia l'email con la durata
-                down_duration = datetime.now() - down_times[ip]
-                down_minutes = int(down_duration.total_seconds() / 60)
-                down_seconds = int(down_duration.total_seconds() % 60)
-                del down_times[ip]  # Rimuovi il record di "DOWN" dopo aver notificato
-            send_email_alert(name, ip, current_status, f"Tempo di DOWN: {down_minutes} minuti e {down_seconds} secondi")
-
-    with lock:
-        last_status[ip] = current_status
-        completed_pings += 1
-        if completed_pings == total_connections:
-            update_label.config(text=f"Ultimo aggiornamento: {datetime.now().strftime("%H:%M:%S")}")
-            update_label.update()
-            update_listbox_with_status(last_status)  # Aggiorna la GUI solo quando tutti i ping sono completati
-
-def start_monitoring(status_label, update_label, start_button, stop_button):
-    global monitoring
-    if not monitoring:
-        monitoring = True
-        start_button.grid_remove()  # Nascondi il pulsante "Inizia"
-        stop_button.grid()  # Mostra il pulsante "Ferma"
-        Thread(target=monitor_ips, args=(status_label, update_label), daemon=True).start()
+def run_engine():
+    try:
+        monitor.run_monitor_loop()
+    except Exception as e:
+        monitor.logger.exception(f"Errore nel ciclo di monitoraggio: {e}")
+    updates.put({"type": "stopped"})
 
-def stop_monitoring(start_button, stop_button):
-    global monitoring
-    monitoring = False
-    stop_button.grid_remove()  # Nascondi il pulsante "Ferma"
-    start_button.grid()  # Mostra il pulsante "Inizia"
-
-def update_status_totals(last_status):
-    total_connections = len(connections)
-    paused_count = sum(1 for conn in connections if not conn.get("enabled", True))
-    unknown_count = sum(1 for status in last_status.values() if status == "UNKNOWN")
-    up_count = sum(1 for status in last_status.values() if status == "UP")
-    down_count = sum(1 for status in last_status.values() if status == "DOWN")
-
-    global total_label, paused_label, up_label, down_label
-    total_label.config(text=f"Connessioni totali: {total_connections} di cui {unknown_count} ancora da verificare")
-    paused_label.config(text=f"Connessioni in pausa: {paused_count}")
-    up_label.config(text=f"Connessioni UP: {up_count}")
-    down_label.config(text=f"Connessioni DOWN: {down_count}")
-
-def update_listbox_with_status(last_status):
-    # Rimuovi tutti i dati esistenti e aggiorna con gli stati correnti
-    global listbox
-    listbox.delete(0, tk.END)
-    for conn in connections:
-        ip = conn["ip"]
-        name = conn["name"]
-        enabled = conn["enabled"]
-        current_status = last_status.get(ip, "UNKNOWN")
-        if current_status == "UP":
-            status_text = "✅"
-        elif current_status == "DOWN":
-            status_text = "❌"
-        else:
-            status_text = "❓"
-        status_indicator = "🔝" if enabled else "🟢"
-        listbox.insert(tk.END, f"{status_indicator} {status_text} {name} | {ip}")
-
-    update_status_totals(last_status)
-
-def highlight_search_results(name_query, ip_query):
-    listbox.selection_clear(0, tk.END)  # Rimuovi qualsiasi selezione precedente
-    found_indices = []
-
-    # Cerca e registra gli indici corrispondenti
-    for index, conn in enumerate(connections):
-        if (name_query and name_query.lower() in conn["name"].lower()) or (ip_query and conn["ip"] == ip_query):
-            found_indices.append(index)
-    
-    # Evidenzia i risultati trovati
-    for idx in found_indices:
-        listbox.selection_set(idx)
-
-    # Scorri automaticamente al primo risultato
-    if found_indices:
-        listbox.see(found_indices[0])
-    else:
-        messagebox.showinfo("Ricerca", "Nessuna connessione trovata")
 
-    return found_indices
+def poll_live(path):
+    """Legge periodicamente il segmento del daemon e inoltra alla coda solo le righe cambiate."""
+    seen = {}
+    known = None
+    updated = None
+    while True:
+        try:
+            ts, records = read_live_status(path)
+        except (OSError, RuntimeError) as e:
+            updates.put({"type": "live", "error": str(e)})
+            time.sleep(LIVE_POLL)
+            continue
+        ips = {r["ip"] for r in records}
+        if ips != known:
+            known = ips
+            seen = {}
+            updates.put({"type": "reload", "connections": monitor.load_connections()})
+        changed = []
+        for r in records:
+            key = (r["status"], r["rtt"])
+            if seen.get(r["ip"]) != key:
+                seen[r["ip"]] = key
+                changed.append((r["ip"], r["status"], r["rtt"]))
+        if changed:
+            updates.put({"type": "rows", "rows": changed})
+        if ts != updated:
+            updated = ts
+            updates.put({"type": "cycle", "ts": ts})
+        time.sleep(LIVE_POLL)
+
 
 def is_valid_ip(ip):
-    try:
-        ipaddress.ip_address(ip)
-        return True
-    except ValueError:
-        return False
-    
-def is_ip_duplicate(ip, index_to_ignore=None):
-    # index_to_ignore: L'indice da ignorare (utile per le modifiche).
-    for index, conn in enumerate(connections):
-        if conn["ip"] == ip and index != index_to_ignore:
-            return True
-    return False
+    # accetta IPv4, IPv6 e hostname (risolti dal monitor)
+    return is_valid_target(ip)
+
+def is_ip_duplicate(ip, ip_to_ignore=None):
+    # ip_to_ignore: l'IP della connessione in modifica
+    return ip != ip_to_ignore and ip in rows.index
 
 # Creazione dell'interfaccia GUI
 def create_gui():
+    read_only = SOURCE == "live"
+    shown = [None] * VISIBLE_ROWS       # valori disegnati in ogni slot (None = slot nascosto)
+
+    def render_slot(slot, ip):
+        iid = f"slot{slot}"
+        values = rows.values(ip) if ip else None
+        if values == shown[slot]:
+            return
+        if values is None:
+            tree.detach(iid)
+        else:
+            if shown[slot] is None:
+                tree.move(iid, "", slot)
+            tree.item(iid, values=values)
+        shown[slot] = values
+
+    def render():
+        """Ridisegna la finestra visibile: solo gli slot con valori cambiati vengono toccati."""
+        visible = rows.visible()
+        for slot in range(VISIBLE_ROWS):
+            ip = visible[slot] if slot < len(visible) else None
+            if ip and not read_only:
+                rows.update(ip, rtt=engine_rtt(ip))
+            render_slot(slot, ip)
+        wanted = [f"slot{slot}" for slot, ip in enumerate(visible) if ip in rows.selected]
+        if set(tree.selection()) != set(wanted):
+            tree.selection_set(wanted)
+        scrollbar.set(*rows.fraction())
+
+    def update_status_totals():
+        t = rows.totals()
+        total_label.config(text=f"Connessioni totali: {t['total']} di cui {t['unknown']} ancora da verificare")
+        paused_label.config(text=f"Connessioni in pausa: {t['paused']}")
+        up_label.config(text=f"Connessioni UP: {t['up']} (degradate: {t['degraded']})")
+        down_label.config(text=f"Connessioni DOWN: {t['down']} (in verifica: {t['checking']})")
+
+    def process_updates():
+        deadline = time.monotonic() + UPDATE_BUDGET
+        dirty = set()
+        reload = totals = False
+        while time.monotonic() < deadline:
+            try:
+                event = updates.get_nowait()
+            except queue.Empty:
+                break
+            kind = event.get("type")
+            if kind == "transition":
+                if rows.update(event["ip"], status=event["to"]):
+                    dirty.add(event["ip"])
+                    totals = True
+            elif kind == "rows":
+                for ip, status, rtt in event["rows"]:
+                    if rows.update(ip, status=status or "UNKNOWN", rtt=rtt):
+                        dirty.add(ip)
+                totals = True
+            elif kind == "reload":
+                rows.load(event["connections"], event.get("status"), event.get("rtt"))
+                reload = totals = True
+            elif kind == "cycle":
+                when = datetime.fromtimestamp(event["ts"]).strftime("%H:%M:%S")
+                update_label.config(text=f"Ultimo aggiornamento: {when}")
+                reload = True       # gli RTT visibili sono cambiati
+            elif kind == "stopped":
+                start_button.config(state=tk.NORMAL)
+                status_label.config(text="Monitoraggio non attivo")
+            elif kind == "live":
+                status_label.config(text=f"Daemon non raggiungibile: {event['error']}")
+            elif kind == "error":
+                messagebox.showerror("Errore", event["message"])
+        if reload:
+            render()
+        else:
+            visible = rows.visible()
+            for ip in dirty:
+                slot = rows.slot_of(ip)
+                if slot is not None:
+                    render_slot(slot, visible[slot])
+        if totals:
+            update_status_totals()
+        root.after(UPDATE_MS, process_updates)
+
+    def scroll(delta):
+        if rows.scroll(delta):
+            render()
+        return "break"
+
+    def on_scrollbar(action, value, unit=None):
+        if action == "moveto":
+            changed = rows.scroll_to(float(value) * len(rows))
+        else:
+            step = rows.height if unit == "pages" else 1
+            changed = rows.scroll(int(value) * step)
+        if changed:
+            render()
+
+    def on_wheel(event):
+        # Windows/macOS: event.delta (multipli di 120 su Windows); X11: Button-4/Button-5
+        if event.num == 4 or event.delta > 0:
+            return scroll(-3)
+        return scroll(3)
+
+    def on_click(event):
+        visible = rows.visible()
+        rows.selected = {visible[int(iid[4:])] for iid in tree.selection() if int(iid[4:]) < len(visible)}
+
+    def start_monitoring():
+        global engine
+        if engine is not None and engine.is_alive():
+            return
+        monitor.running.set()
+        monitor.feed = QueueFeed()
+        engine = Thread(target=run_engine, name="mp_ping-gui-engine", daemon=True)
+        engine.start()
+        start_button.grid_remove()  # Nascondi il pulsante "Inizia"
+        stop_button.grid()  # Mostra il pulsante "Ferma"
+        status_label.config(text=f"Monitoraggio attivo (intervallo {monitor.interval} secondi)")
+
+    def stop_monitoring():
+        monitor.stop()
+        stop_button.grid_remove()  # Nascondi il pulsante "Ferma"
+        start_button.grid()  # Mostra il pulsante "Inizia"
+        # il ciclo in corso termina prima dell'arresto: "Inizia" torna attivo all'evento "stopped"
+        start_button.config(state=tk.DISABLED)
+        status_label.config(text="Arresto in corso...")
+
     def add_connection_gui():
         name = name_entry.get()
         ip = ip_entry.get()
@@ -267,41 +271,35 @@ def create_gui():
             messagebox.showwarning("Attenzione", "Inserisci un nome e un indirizzo IP!")
             return
         if not is_valid_ip(ip):
-            messagebox.showwarning("Attenzione", "Inserisci un indirizzo IP valido!")
+            messagebox.showwarning("Attenzione", "Inserisci un indirizzo IP o un hostname valido!")
             return
         if is_ip_duplicate(ip):
             messagebox.showwarning("Attenzione", "L'indirizzo IP è già presente!")
             return
-        add_connection(name, ip)
+        run_command(monitor.add_connection, name, ip)
         name_entry.delete(0, tk.END)
         ip_entry.delete(0, tk.END)
 
     def remove_selected_connection():
-        selected = listbox.curselection()
-        if selected:
-            index = selected[0]
-            remove_connection(index)
+        conn = rows.first_selected()
+        if conn:
+            run_command(monitor.remove_connection, None, conn["ip"])
         else:
             messagebox.showwarning("Attenzione", "Nessuna connessione selezionata!")
 
     def toggle_connection_status():
-        selected = listbox.curselection()
-        if selected:
-            index = selected[0]
-            connections[index]["enabled"] = not connections[index]["enabled"]
-            selected_ip = connections[index]["ip"]
-            last_status[selected_ip] = "UNKNOWN"
-            update_listbox_with_status(last_status)
-            save_connections(connections)
+        conn = rows.first_selected()
+        if conn:
+            if conn.get("enabled", True):
+                run_command(monitor.pause_connection, conn["ip"])
+            else:
+                run_command(monitor.resume_connection, conn["ip"])
         else:
             messagebox.showwarning("Attenzione", "Nessuna connessione selezionata!")
 
     def change_selected_connection():
-        selected = listbox.curselection()
-        if selected:
-            index = selected[0]
-            conn = connections[index]
-
+        conn = rows.first_selected()
+        if conn:
             # Crea una finestra modale per modificare i dati
             edit_window = tk.Toplevel(root)
             edit_window.title("Modifica Connessione")
@@ -311,30 +309,29 @@ def create_gui():
 
             # Campi di input
             tk.Label(edit_window, text="Nome").grid(row=0, column=0, padx=10, pady=(20,10))
-            name_entry = tk.Entry(edit_window, width=50)
-            name_entry.insert(0, conn["name"])  # Prepopola con il valore corrente
-            name_entry.grid(row=0, column=1, padx=10, pady=(20,10))
+            edit_name = tk.Entry(edit_window, width=50)
+            edit_name.insert(0, conn["name"])  # Prepopola con il valore corrente
+            edit_name.grid(row=0, column=1, padx=10, pady=(20,10))
 
             tk.Label(edit_window, text="Indirizzo IP").grid(row=1, column=0, padx=10, pady=10)
-            ip_entry = tk.Entry(edit_window, width=50)
-            ip_entry.insert(0, conn["ip"])  # Prepopola con il valore corrente
-            ip_entry.grid(row=1, column=1, padx=10, pady=10)
+            edit_ip = tk.Entry(edit_window, width=50)
+            edit_ip.insert(0, conn["ip"])  # Prepopola con il valore corrente
+            edit_ip.grid(row=1, column=1, padx=10, pady=10)
 
             # Funzione per salvare i cambiamenti
             def confirm_edit():
-                new_name = name_entry.get()
-                new_ip = ip_entry.get()
+                new_name = edit_name.get()
+                new_ip = edit_ip.get()
                 if not new_name or not new_ip:
                     messagebox.showwarning("Attenzione", "Inserisci un nome e un indirizzo IP!")
                     return
                 if not is_valid_ip(new_ip):
-                    messagebox.showwarning("Attenzione", "Inserisci un indirizzo IP valido!")
+                    messagebox.showwarning("Attenzione", "Inserisci un indirizzo IP o un hostname valido!")
                     return
-                if is_ip_duplicate(new_ip, index):
+                if is_ip_duplicate(new_ip, conn["ip"]):
                     messagebox.showwarning("Attenzione", "L'indirizzo IP è già presente!")
                     return
-                remove_connection(index)
-                add_connection(new_name, new_ip)
+                run_command(edit_connection, conn, new_name, new_ip)
                 edit_window.destroy()  # Chiudi la finestra
 
             # Bottoni
@@ -350,13 +347,26 @@ def create_gui():
             messagebox.showwarning("Attenzione", "Inserisci un nome o un indirizzo IP!")
             return
         if ip_query and not is_valid_ip(ip_query):
-            messagebox.showwarning("Attenzione", "Inserisci un indirizzo IP valido!")
+            messagebox.showwarning("Attenzione", "Inserisci un indirizzo IP o un hostname valido!")
             return
-        highlight_search_results(name_query, ip_query)
+        found = rows.search(name_query, ip_query)
+        # Evidenzia i risultati trovati e scorri automaticamente al primo
+        rows.selected = {rows.rows[i]["ip"] for i in found}
+        if found:
+            rows.see(found[0])
+        render()
+        if not found:
+            messagebox.showinfo("Ricerca", "Nessuna connessione trovata")
+
+    def on_close():
+        monitor.stop()
+        commands.shutdown(wait=False)
+        root.destroy()
 
     root = tk.Tk()
-    root.title("Gestore Connessioni")
-    root.geometry("790x600")  # Imposta dimensioni della finestra
+    root.title("Gestore Connessioni" + (" (daemon, sola lettura)" if read_only else ""))
+    root.geometry("790x720")  # Imposta dimensioni della finestra
+    root.protocol("WM_DELETE_WINDOW", on_close)
 
     # Elementi grafici
     tk.Label(root, text="Nome").grid(row=0, column=0, padx=15, pady=(10, 0), sticky="w")
@@ -367,40 +377,51 @@ def create_gui():
     ip_entry = tk.Entry(root, width=50)
     ip_entry.grid(row=1, column=1, padx=15, pady=5)
 
-    add_button = tk.Button(root, text="Aggiungi ➕", command=add_connection_gui)
+    edit_state = tk.DISABLED if read_only else tk.NORMAL
+    add_button = tk.Button(root, text="Aggiungi ➕", command=add_connection_gui, state=edit_state)
     add_button.grid(row=1, column=2, padx=10, pady=5, sticky="e")
 
-    remove_button = tk.Button(root, text="Rimuovi Connessione selezionata 🗑️", command=remove_selected_connection)
+    remove_button = tk.Button(root, text="Rimuovi Connessione selezionata 🗑️", command=remove_selected_connection,
+                              state=edit_state)
     remove_button.grid(row=2, column=0, padx=25, pady=10, sticky="w")
 
-    toggle_button = tk.Button(root, text="Pausa/Riprendi ⏯️", command=toggle_connection_status)
+    toggle_button = tk.Button(root, text="Pausa/Riprendi ⏯️", command=toggle_connection_status, state=edit_state)
     toggle_button.grid(row=2, column=1, padx=10, pady=10, sticky="w")
 
-    toggle_button = tk.Button(root, text="Modifica ✏️", command=change_selected_connection)
-    toggle_button.grid(row=2, column=2, padx=10, pady=10)
+    edit_button = tk.Button(root, text="Modifica ✏️", command=change_selected_connection, state=edit_state)
+    edit_button.grid(row=2, column=2, padx=10, pady=10)
 
     search_button = tk.Button(root, text="Cerca 🔍", command=search_gui)
     search_button.grid(row=2, column=1, padx=10, pady=5, sticky="e")
 
-    # Creazione di un frame per contenere la Listbox e la Scrollbar
+    # Frame con la Treeview virtualizzata: VISIBLE_ROWS slot fissi, riempiti con la finestra
+    # visibile dell'elenco; la Scrollbar sposta la finestra invece di scorrere gli item
     frame = tk.Frame(root)
     frame.grid(row=3, column=0, columnspan=3, padx=10, pady=10)
 
-    # Scrollbar verticale
-    scrollbar = tk.Scrollbar(frame, orient=tk.VERTICAL)
+    scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=on_scrollbar)
     scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
 
-    global listbox
-    listbox = tk.Listbox(frame, height=20, width=120, yscrollcommand=scrollbar.set)
-    listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-    # listbox.grid(row=3, column=0, columnspan=3, padx=10, pady=10)
-    for conn in connections:
-        listbox.insert(tk.END, f"❓ {conn['name']} | {conn['ip']}")
-
-    # Associa la scrollbar alla Listbox
-    scrollbar.config(command=listbox.yview)
+    tree = ttk.Treeview(frame, columns=("stato", "nome", "ip", "rtt"), show="headings",
+                        height=VISIBLE_ROWS, selectmode="extended")
+    for column, heading, width in (("stato", "Stato", 60), ("nome", "Nome", 420),
+                                   ("ip", "Indirizzo IP", 180), ("rtt", "RTT", 90)):
+        tree.heading(column, text=heading)
+        tree.column(column, width=width, anchor="center" if column in ("stato", "rtt") else "w")
+    tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+    for slot in range(VISIBLE_ROWS):
+        tree.insert("", "end", iid=f"slot{slot}")
+        tree.detach(f"slot{slot}")
+
+    tree.bind("<ButtonRelease-1>", on_click)
+    tree.bind("<MouseWheel>", on_wheel)
+    tree.bind("<Button-4>", on_wheel)
+    tree.bind("<Button-5>", on_wheel)
+    tree.bind("<Up>", lambda e: scroll(-1))
+    tree.bind("<Down>", lambda e: scroll(1))
+    tree.bind("<Prior>", lambda e: scroll(-VISIBLE_ROWS))
+    tree.bind("<Next>", lambda e: scroll(VISIBLE_ROWS))
 
-    global total_label, paused_label, up_label, down_label
     total_label = tk.Label(root, text="Connessioni totali: 0")
     total_label.grid(row=4, column=0, padx=25, pady=(0, 5), sticky="w")
 
@@ -412,25 +433,30 @@ def create_gui():
 
     down_label = tk.Label(root, text="Connessioni DOWN: 0", fg="red")
     down_label.grid(row=5, column=1, pady=(0, 5), sticky="e")
-    
+
     status_label = tk.Label(root, text="Monitoraggio non attivo")
     status_label.grid(row=6, column=0, pady=5)
-    
+
     update_label = tk.Label(root, text="Ultimo aggiornamento: MAI")
     update_label.grid(row=6, column=1, pady=5)
 
-    start_button = tk.Button(root, text="Inizia Monitoraggio ▶️", command=lambda: start_monitoring(status_label, update_label, start_button, stop_button))
+    start_button = tk.Button(root, text="Inizia Monitoraggio ▶️", command=start_monitoring)
     start_button.grid(row=7, column=0, columnspan=3, pady=10)
 
-    stop_button = tk.Button(root, text="Ferma Monitoraggio ⏸️", command=lambda: stop_monitoring(start_button, stop_button))
+    stop_button = tk.Button(root, text="Ferma Monitoraggio ⏸️", command=stop_monitoring)
     stop_button.grid(row=7, column=0, columnspan=3, pady=10)
-
-    start_button.grid()  # Inizialmente, il pulsante "Inizia" è visibile
     stop_button.grid_remove()  # Nascondi il pulsante "Ferma"
 
-    # Avvia automaticamente il monitoraggio all'avvio del programma
-    start_monitoring(status_label, update_label, start_button, stop_button)
+    if read_only:
+        start_button.grid_remove()
+        status_label.config(text=f"Stato live del daemon ({monitor.shm_path})")
+        Thread(target=poll_live, args=(monitor.shm_path,), name="mp_ping-gui-live", daemon=True).start()
+    else:
+        updates.put(snapshot_event())
+        # Avvia automaticamente il monitoraggio all'avvio del programma
+        start_monitoring()
 
+    root.after(UPDATE_MS, process_updates)
     root.mainloop()
 
 if __name__ == "__main__":
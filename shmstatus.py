@@ -0,0 +1,141 @@
+"""
+Segmento di memoria condivisa con lo stato live degli host (default /dev/shm/mp_ping).
+
+Il daemon pubblica la HostTable in un file mappato in memoria con layout fisso; i lettori
+(CLI, script di monitoraggio) lo mappano in sola lettura e ottengono una vista coerente
+senza lock e senza parsing JSON, grazie a un seqlock: lo scrittore porta il contatore
+di generazione a dispari prima di scrivere e a pari dopo; il lettore copia il segmento
+e riprova se il contatore era dispari o è cambiato durante la copia.
+
+Layout (little endian):
+  header (64 byte): magic '4s', version H, record_size H, capacity I, count I, seq Q, updated d
+  record (96 byte): host '64s', state B, pad x, attempts H, rtt f, loss f, jitter f, changed d, down_since d
+"""
+import os
+import math
+import mmap
+import time
+import struct
+from hosttable import STATES
+
+MAGIC = b'MPPS'
+VERSION = 1
+HEADER = struct.Struct('<4sHHIIQd')
+HEADER_SIZE = 64
+SEQ_OFFSET = 16     # offset del campo seq nell'header
+RECORD = struct.Struct('<64sBxHfffdd')
+DEFAULT_PATH = '/dev/shm/mp_ping'
+
+
+class ShmStatusWriter:
+    """Lato daemon: unico scrittore del segmento."""
+
+    def __init__(self, path=DEFAULT_PATH, capacity=1024):
+        self.path = path
+        self.mm = None
+        self.capacity = 0
+        self.count = 0
+        self.seq = 0
+        self._create(capacity)
+
+    def _create(self, capacity):
+        """Crea un nuovo segmento e lo sostituisce atomicamente al precedente (i lettori rimappano)."""
+        size = HEADER_SIZE + capacity * RECORD.size
+        tmp = self.path + '.tmp'
+        fd = os.open(tmp, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.ftruncate(fd, size)
+            mm = mmap.mmap(fd, size, access=mmap.ACCESS_WRITE)
+        finally:
+            os.close(fd)
+        HEADER.pack_into(mm, 0, MAGIC, VERSION, RECORD.size, capacity, 0, self.seq, time.time())
+        os.replace(tmp, self.path)
+        if self.mm is not None:
+            self.mm.close()
+        self.mm = mm
+        self.capacity = capacity
+
+    def _begin(self):
+        self.seq += 1   # dispari: scrittura in corso
+        struct.pack_into('<Q', self.mm, SEQ_OFFSET, self.seq)
+
+    def _end(self):
+        HEADER.pack_into(self.mm, 0, MAGIC, VERSION, RECORD.size, self.capacity, self.count,
+                         self.seq + 1, time.time())
+        self.seq += 1   # pari: segmento coerente
+
+    def _pack_row(self, table, row):
+        RECORD.pack_into(
+            self.mm, HEADER_SIZE + row * RECORD.size,
+            table.ips[row].encode('utf-8')[:64], table.state[row], min(table.attempts[row], 65535),
+            table.rtt[row], table.loss[row], table.jitter[row], table.changed[row], table.down_since[row])
+
+    def publish(self, table):
+        """Pubblica l'intera tabella (fine ciclo o dopo modifiche all'elenco host)."""
+        n = len(table)
+        if n > self.capacity:
+            capacity = self.capacity
+            while capacity < n:
+                capacity *= 2
+            self._create(capacity)
+        self._begin()
+        for row in range(n):
+            self._pack_row(table, row)
+        self.count = n
+        self._end()
+
+    def update_row(self, table, row):
+        """Aggiorna una singola riga (es. a ogni transizione) senza riscrivere il segmento."""
+        if row >= self.count:
+            self.publish(table)
+            return
+        self._begin()
+        self._pack_row(table, row)
+        self._end()
+
+    def close(self):
+        if self.mm is not None:
+            self.mm.close()
+            self.mm = None
+
+
+def _nan_to_none(v):
+    return None if math.isnan(v) else round(v, 2)
+
+
+def read_live_status(path=DEFAULT_PATH, retries=1000):
+    """Legge il segmento: restituisce (updated_epoch, [record dict]).
+    Solleva FileNotFoundError se il daemon non pubblica, RuntimeError se non ottiene una vista coerente."""
+    with open(path, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        for _ in range(retries):
+            seq1 = struct.unpack_from('<Q', mm, SEQ_OFFSET)[0]
+            if seq1 & 1:
+                time.sleep(0)
+                continue
+            magic, version, rec_size, capacity, count, _, updated = HEADER.unpack_from(mm, 0)
+            buf = mm[:HEADER_SIZE + count * rec_size]
+            seq2 = struct.unpack_from('<Q', mm, SEQ_OFFSET)[0]
+            if seq1 == seq2:
+                break
+        else:
+            raise RuntimeError('Segmento in scrittura continua: vista coerente non disponibile')
+    finally:
+        mm.close()
+    if magic != MAGIC or version != VERSION or rec_size != RECORD.size:
+        raise RuntimeError(f'Formato segmento non supportato in {path}')
+
+    out = []
+    for host, state, attempts, rtt, loss, jitter, changed, down_since in RECORD.iter_unpack(buf[HEADER_SIZE:]):
+        out.append({
+            'ip': host.rstrip(b'\0').decode('utf-8'),
+            'status': STATES[state] if state < len(STATES) else None,
+            'attempts': attempts,
+            'rtt': _nan_to_none(rtt),
+            'loss': _nan_to_none(loss),
+            'jitter': _nan_to_none(jitter),
+            'changed': changed or None,
+            'down_since': down_since or None,
+        })
+    return updated, out
@@ -0,0 +1,412 @@
+"""
+Simulazione a tempo virtuale della macchina a stati del monitor.
+
+Gli esiti dei probe vengono da uno scenario: disservizi generati (flapping casuale con
+numero medio di interruzioni per host al giorno e durata media esponenziale) oppure
+ricostruiti dallo storico delle transizioni registrato dal daemon (un disservizio va dalla
+prima rilevazione CHECKING/DOWN al ritorno UP/DEGRADED). Il Monitor gira con un VirtualClock:
+cicli, tentativi di conferma e timeout avanzano in tempo simulato, quindi una settimana con
+10 tentativi ogni 30 secondi richiede secondi invece di giorni.
+
+Per velocità, negli intervalli in cui un host è UP e lo scenario lo dà raggiungibile la
+simulazione aggiorna in blocco (NumPy) il prossimo probe e l'ultimo probe riuscito invece di
+passare dalla macchina a stati: per questi host il risultato sarebbe comunque UP -> UP senza
+transizioni né email. Con exact=True ogni probe passa da Monitor.ping_due.
+
+Lo scenario può indicare anche la latenza degli host (RTT base per host, con un mix di
+profili, e dispersione lognormale) e una perdita casuale degli echo: un probe costa l'RTT se
+la risposta arriva entro il timeout dell'host, altrimenti l'intero timeout. Così si misurano
+i timeout adattivi (rto.py) contro il timeout fisso: durata stimata dei cicli, tempo di
+rilevamento comprensivo dell'attesa del timeout e DOWN senza disservizio dovuti alle perdite.
+
+Il report elenca le email che il daemon avrebbe inviato, i tempi di rilevamento (dall'inizio
+del disservizio al CHECKING, più l'attesa dei timeout del probe fallito), di conferma (al DOWN)
+e di rientro (dalla fine del disservizio all'email UP) per tier, i disservizi lunghi non
+segnalati, i DOWN senza disservizio, l'attesa dei probe e le risorse usate dalla simulazione.
+"""
+import os
+import time
+import logging
+import tempfile
+from bisect import bisect_right
+import numpy as np
+from clock import VirtualClock
+from monitor import Monitor
+from probes import Prober
+from hosttable import STATE_CODES, to_epoch
+from scheduler import connection_tier, DetectStats
+
+DAY = 86400.0
+
+
+class Scenario:
+    """Connessioni simulate e intervalli di disservizio per host (epoch di inizio e fine)."""
+
+    def __init__(self, connections, outages, start, duration, rtt=0.02, loss=0.0, jitter=0.0):
+        self.connections = connections
+        self.ips = [c['ip'] for c in connections]
+        self.outages = {ip: sorted(spans) for ip, spans in outages.items() if spans}
+        self.start = float(start)
+        self.duration = float(duration)
+        # RTT base per host (secondi), probabilità di perdita di un echo, sigma della dispersione lognormale
+        self.rtt = np.broadcast_to(np.asarray(rtt, dtype=np.float64), (len(self.ips),)).copy()
+        self.loss = float(loss)
+        self.jitter = float(jitter)
+
+    @classmethod
+    def generate(cls, hosts, days=7.0, outages_per_day=0.05, mean_outage=1800.0, seed=None, start=None,
+                 rtt_mix=None, loss=0.0, jitter=0.0):
+        """Flapping casuale: interruzioni per host di Poisson, inizio uniforme, durata esponenziale.
+        rtt_mix: [(quota, rtt in secondi), ...] per assegnare a caso l'RTT base degli host."""
+        rng = np.random.default_rng(seed)
+        start = float(start if start is not None else 1_700_000_000.0)
+        duration = days * DAY
+        connections = [{'name': f'SIM - {i}', 'ip': f'10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}',
+                        'enabled': True} for i in range(hosts)]
+        counts = rng.poisson(outages_per_day * days, hosts)
+        owner = np.repeat(np.arange(hosts), counts)
+        begin = start + rng.uniform(0, duration, owner.size)
+        end = begin + np.maximum(rng.exponential(mean_outage, owner.size), 1.0)
+        outages = {}
+        for row, b, e in zip(owner.tolist(), begin.tolist(), end.tolist()):
+            outages.setdefault(connections[row]['ip'], []).append((b, e))
+        rtt = 0.02
+        if rtt_mix:
+            shares = np.array([share for share, _ in rtt_mix], dtype=np.float64)
+            rtt = np.array([value for _, value in rtt_mix])[rng.choice(len(rtt_mix), hosts, p=shares / shares.sum())]
+        return cls(connections, {ip: _merge(spans) for ip, spans in outages.items()}, start, duration,
+                   rtt=rtt, loss=loss, jitter=jitter)
+
+    @classmethod
+    def from_history(cls, connections, records, since=None, until=None):
+        """Disservizi ricostruiti dalle transizioni registrate (storico JSONL o database)."""
+        outages = {}
+        opened = {}
+        first = last = None
+        for rec in records:
+            ts, ip, to = rec['ts'], rec['ip'], rec.get('to')
+            first = ts if first is None else first
+            last = ts
+            if to in ('CHECKING', 'DOWN'):
+                opened.setdefault(ip, ts)
+            elif ip in opened:
+                outages.setdefault(ip, []).append((opened.pop(ip), ts))
+        start = since if since is not None else (first or time.time())
+        end = until if until is not None else (last or start)
+        for ip, ts in opened.items():
+            outages.setdefault(ip, []).append((ts, end))
+        known = {c['ip'] for c in connections}
+        connections = list(connections) + [{'name': ip, 'ip': ip, 'enabled': True}
+                                           for ip in outages if ip not in known]
+        return cls(connections, outages, start, max(end - start, 0.0))
+
+    def events(self):
+        """Cambi di raggiungibilità in ordine di tempo: (istante, riga host, irraggiungibile)."""
+        rows = {ip: i for i, ip in enumerate(self.ips)}
+        out = []
+        for ip, spans in self.outages.items():
+            for b, e in spans:
+                out.append((b, rows[ip], True))
+                out.append((e, rows[ip], False))
+        out.sort()
+        return out
+
+
+def parse_rtt_mix(spec):
+    """'0.6:2,0.3:40,0.1:600' (quota:RTT in ms) -> [(0.6, 0.002), ...]. Solleva ValueError se non valido."""
+    mix = []
+    for item in (spec or '').split(','):
+        if not item.strip():
+            continue
+        share, _, ms = item.partition(':')
+        try:
+            mix.append((float(share), float(ms) / 1000.0))
+        except ValueError:
+            raise ValueError(f"Mix di RTT non valido: '{spec}' (formato quota:ms, es. 0.6:2,0.4:40)")
+        if mix[-1][0] <= 0 or mix[-1][1] <= 0:
+            raise ValueError(f"Mix di RTT non valido: '{spec}' (quote e RTT devono essere positivi)")
+    return mix
+
+
+def _merge(spans):
+    spans.sort()
+    merged = [list(spans[0])]
+    for b, e in spans[1:]:
+        if b <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], e)
+        else:
+            merged.append([b, e])
+    return [tuple(s) for s in merged]
+
+
+class ScenarioProber(Prober):
+    """Prober che risponde secondo lo scenario all'istante del clock virtuale.
+    Ogni echo costa l'RTT estratto se arriva entro il timeout dell'host, altrimenti il timeout."""
+
+    concurrency = 1
+
+    def __init__(self, scenario, clock, seed=None):
+        self.clock = clock
+        self.base = scenario.rtt
+        self.loss = scenario.loss
+        self.jitter = scenario.jitter
+        self.rng = np.random.default_rng(seed)
+        self.rows = {ip: i for i, ip in enumerate(scenario.ips)}
+        self.down = np.zeros(len(scenario.ips), dtype=bool)
+        self._events = scenario.events()
+        self._next = 0
+        self.probes = 0
+        self.wait = 0.0         # attesa complessiva dei probe (secondi)
+        self.cycle_wait = 0.0   # attesa dei probe dall'inizio del ciclo corrente
+        self.fail_wait = {}     # ip -> {istante: attesa dei probe senza risposta}
+        self.preset = {}        # ip -> (esito, attesa) del primo echo già estratto dal percorso veloce
+
+    def sample(self, rows, timeouts):
+        """Estrae un echo per le righe indicate: (rtt, attesa, risposto) come array NumPy."""
+        rtt = self.base[rows]
+        if self.jitter:
+            rtt = rtt * self.rng.lognormal(0.0, self.jitter, len(rows))
+        ok = ~self.down[rows] & (rtt <= timeouts)
+        if self.loss:
+            ok &= self.rng.random(len(rows)) >= self.loss
+        return rtt, np.where(ok, rtt, timeouts), ok
+
+    def spend(self, seconds):
+        self.wait += seconds
+        self.cycle_wait += seconds
+
+    def advance(self, now):
+        events = self._events
+        i = self._next
+        while i < len(events) and events[i][0] <= now:
+            self.down[events[i][1]] = events[i][2]
+            i += 1
+        self._next = i
+
+    def probe_many(self, targets, timeout=2, count=1, concurrency=None, timeouts=None):
+        now = self.clock.time()
+        self.advance(now)
+        self.probes += len(targets) * count
+        timeouts = timeouts or {}
+        out = {}
+        for key, host, _ in targets:
+            t = timeouts.get(key, timeout)
+            row = self.rows[host]
+            preset = self.preset.pop(host, None)
+            rtt, wait, ok = self.sample(np.full(count, row), np.full(count, t))
+            samples = [float(r) if k else None for r, k in zip(rtt, ok)]
+            wait = float(wait.sum())
+            if preset is not None:
+                samples[0] = preset[0]
+                wait += preset[1] - (float(rtt[0]) if ok[0] else t)
+            self.spend(wait)
+            if not any(samples):
+                waits = self.fail_wait.setdefault(host, {})
+                waits[now] = waits.get(now, 0.0) + wait
+            out[key] = samples
+        return out
+
+
+class RecordingLog:
+    """Storico in memoria al posto di history.jsonl durante la simulazione."""
+
+    def __init__(self):
+        self.records = []
+
+    def append(self, ip, name, prev, new, ts=None):
+        self.records.append({'ts': ts, 'ip': ip, 'name': name, 'from': prev, 'to': new})
+
+
+class Simulation:
+    def __init__(self, scenario, interval=None, retries=None, retry_interval=None, exact=False,
+                 adaptive=True, seed=None):
+        self.scenario = scenario
+        self.exact = exact
+        self.clock = VirtualClock(scenario.start)
+        self._tmp = tempfile.TemporaryDirectory(prefix='mp_ping-sim-')
+        d = self._tmp.name
+        self.monitor = Monitor(config_path=os.path.join(d, 'connections.json'),
+                               status_path=os.path.join(d, 'status.json'),
+                               history_path=os.path.join(d, 'history.jsonl'),
+                               interval=interval, db_path='', clock=self.clock)
+        m = self.monitor
+        if retries is not None:
+            m.retries = retries
+        if retry_interval is not None:
+            m.retry_interval = retry_interval
+        m.add_connections(scenario.connections)
+        if m.hosts.ips != scenario.ips:
+            raise ValueError('Connessioni duplicate nello scenario')
+        self.prober = ScenarioProber(scenario, self.clock, seed=seed)
+        m.probers = {'icmp': self.prober, 'tcp': self.prober}
+        m.anomaly = None        # lo scenario simula solo la raggiungibilità, non la latenza
+        m.timeouts.enabled = adaptive
+        # durata stimata di un ciclo: attesa dei probe divisa per i worker del prober ICMP del daemon
+        self.workers = int(os.environ.get('MP_PING_WORKERS', 16))
+        self.cycle_durations = []
+        m.history = RecordingLog()
+        self.alerts = []
+        self.dumps = 0
+        self.cycles = 0
+        m.send_email_alert = self._record_alert
+        # lo stato su disco non serve alla simulazione: contiamo solo le scritture
+        m.dump_status = self._count_dump
+        self.tier_factor = np.array([m.tiers[connection_tier(c)]['interval'] for c in scenario.connections])
+
+    def _record_alert(self, name, ip, status, text=''):
+        self.alerts.append({'ts': self.clock.time(), 'ip': ip, 'name': name, 'status': status})
+
+    def _count_dump(self):
+        self.dumps += 1
+
+    def _cycle(self, now):
+        m = self.monitor
+        self.cycles += 1
+        self.prober.cycle_wait = 0.0
+        if self.exact:
+            m.ping_due(now)
+            self._end_cycle()
+            return
+        self.prober.advance(now)
+        h = m.hosts
+        due = np.nonzero(np.frombuffer(h.next_check, dtype=np.uint32) <= now)[0]
+        state = np.frombuffer(h.state, dtype=np.uint8)[due]
+        quiet_mask = (state == STATE_CODES['UP']) & ~self.prober.down[due]
+        quiet = due[quiet_mask]
+        # gli host UP raggiungibili rispondono senza passare dalla macchina a stati, tranne quando
+        # l'echo va perso o arriva oltre il timeout: allora l'esito estratto passa al ciclo normale
+        rtt, wait, ok = self.prober.sample(quiet, m.timeouts.timeouts(h, quiet))
+        for row, w in zip(quiet[~ok].tolist(), wait[~ok].tolist()):
+            self.prober.preset[self.scenario.ips[row]] = (None, w)
+        self.prober.spend(float(wait[ok].sum()))
+        busy = np.concatenate([due[~quiet_mask], quiet[~ok]])
+        if busy.size:
+            m._run_cycle([self.scenario.connections[i] for i in busy.tolist()])
+        quiet, rtt = quiet[ok], rtt[ok]
+        if quiet.size:
+            np.frombuffer(h.next_check, dtype=np.uint32)[quiet] = (now + m.interval * self.tier_factor[quiet]).astype(np.uint32)
+            np.frombuffer(h.last_ok, dtype=np.uint32)[quiet] = to_epoch(now)
+            m.timeouts.observe_many(h, quiet, rtt)
+            self.prober.probes += int(quiet.size)
+        self._end_cycle()
+
+    def _end_cycle(self):
+        if self.prober.cycle_wait:
+            self.cycle_durations.append(self.prober.cycle_wait / self.workers)
+
+    def run(self):
+        m = self.monitor
+        end = self.scenario.start + self.scenario.duration
+        level = m.logger.level
+        m.logger.setLevel(logging.WARNING)
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            while self.clock.time() < end:
+                now = self.clock.time()
+                self._cycle(now)
+                first = float(np.frombuffer(m.hosts.next_check, dtype=np.uint32).min()) if len(m.hosts) else end
+                # come il daemon: almeno 1 s tra due risvegli, al massimo un intervallo
+                self.clock.run_until(min(max(first, now + 1), now + m.interval, end))
+        finally:
+            m.logger.setLevel(level)
+        return self.report(time.perf_counter() - wall, time.process_time() - cpu)
+
+    def report(self, wall, cpu):
+        m = self.monitor
+        end = self.scenario.start + self.scenario.duration
+        tiers = {c['ip']: connection_tier(c) for c in self.scenario.connections}
+        checking = {}
+        for rec in m.history.records:
+            if rec['to'] == 'CHECKING':
+                checking.setdefault(rec['ip'], []).append(rec['ts'])
+        alerts = {}
+        for a in self.alerts:
+            alerts.setdefault((a['ip'], a['status']), []).append(a['ts'])
+
+        def last_before(times, ts):
+            i = bisect_right(times or [], ts)
+            return times[i - 1] if i else None
+
+        def first_in(times, lo, hi):
+            i = bisect_right(times or [], lo - 1e-9)
+            return times[i] if times and i < len(times) and times[i] <= hi else None
+
+        latency = DetectStats(maxlen=None)
+        missed = []
+        short = 0
+        # disservizio più breve che il daemon deve sempre confermare: attesa del ciclo + tentativi
+        confirm_window = m.retries * m.retry_interval
+        for ip, spans in self.scenario.outages.items():
+            window = m.interval * m.tiers[tiers[ip]]['interval'] + confirm_window
+            for b, e in spans:
+                if b >= end:
+                    continue
+                detected = first_in(checking.get(ip), b, e)
+                if detected is not None:
+                    # il probe fallito ha atteso i suoi timeout prima del CHECKING
+                    waited = self.prober.fail_wait.get(ip, {}).get(detected, 0.0)
+                    latency.record(tiers[ip], 'detect', detected - b + waited)
+                down = first_in(alerts.get((ip, 'DOWN')), b, e)
+                if down is not None:
+                    latency.record(tiers[ip], 'confirm', down - b)
+                    up = first_in(alerts.get((ip, 'UP')), e, end)
+                    if up is not None:
+                        latency.record(tiers[ip], 'recover', up - e)
+                elif self._still_down(last_before(alerts.get((ip, 'DOWN')), b), last_before(alerts.get((ip, 'UP')), b)):
+                    continue    # iniziato prima che il daemon vedesse la fine del disservizio precedente
+                elif e - b >= window and e < end:
+                    missed.append({'ip': ip, 'start': b, 'end': e})
+                elif e - b < confirm_window:
+                    short += 1
+
+        def in_outage(ip, ts):
+            spans = self.scenario.outages.get(ip, [])
+            i = bisect_right(spans, (ts, float('inf'))) - 1
+            return i >= 0 and spans[i][0] <= ts <= spans[i][1]
+
+        false_down = [a for a in self.alerts if a['status'] == 'DOWN' and not in_outage(a['ip'], a['ts'])]
+        by_status = {}
+        for a in self.alerts:
+            by_status[a['status']] = by_status.get(a['status'], 0) + 1
+        cycles = np.array(self.cycle_durations) if self.cycle_durations else np.zeros(1)
+        probing = {
+            'workers': self.workers,
+            'wait_s': round(self.prober.wait, 1),
+            'cycle_s': {'avg': round(float(cycles.mean()), 2), 'p95': round(float(np.percentile(cycles, 95)), 2),
+                        'max': round(float(cycles.max()), 2)},
+            'timeouts': m.timeouts.stats(),
+        }
+        try:
+            import resource
+            peak_rss = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+        except ImportError:
+            peak_rss = None
+        return {
+            'hosts': len(self.scenario.ips),
+            'simulated_s': self.scenario.duration,
+            'outages': sum(len(s) for s in self.scenario.outages.values()),
+            'short_outages': short,
+            'alerts': by_status,
+            'latency': latency.summary(),
+            'missed': missed,
+            'false_down': false_down,
+            'probing': probing,
+            'resources': {
+                'wall_s': round(wall, 2),
+                'cpu_s': round(cpu, 2),
+                'peak_rss_mb': peak_rss,
+                'speedup': round(self.scenario.duration / wall) if wall > 0 else None,
+                'cycles': self.cycles,
+                'probes': self.prober.probes,
+                'transitions': len(m.history.records),
+                'task_steps': self.clock.steps,
+                'status_dumps': self.dumps,
+            },
+        }
+
+    @staticmethod
+    def _still_down(last_down, last_up):
+        return last_down is not None and (last_up is None or last_up < last_down)
+
+    def close(self):
+        self._tmp.cleanup()
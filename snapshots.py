@@ -0,0 +1,193 @@
+"""
+Ricostruzione dello stato in un istante passato (point-in-time) a partire dai backup
+di mp_status_backup.py e dallo storico delle transizioni.
+
+- SnapshotIndex indicizza la directory dei backup usando solo i nomi file (timestamp nel nome)
+  e trova lo snapshot giusto con ricerca binaria.
+- Gli snapshot vengono letti in modo "lazy": si scorre l'oggetto last_status chiave per chiave
+  senza costruire l'intero documento, e ci si ferma appena trovati gli IP richiesti.
+- Le transizioni successive allo snapshot vengono applicate leggendo lo storico da una
+  posizione trovata anch'essa con ricerca binaria.
+"""
+import os
+import re
+import json
+import time
+import bisect
+from datetime import datetime, timezone
+from json.decoder import scanstring
+import mp_status_backup as backup
+
+_WS = re.compile(r'[ \t\n\r]*')
+# token rilevanti per saltare un valore annidato senza decodificarlo
+_TOKEN = re.compile(r'"(?:[^"\\]|\\.)*"|[{}\[\]]')
+_decoder = json.JSONDecoder()
+
+
+def _skip_ws(text, pos):
+    return _WS.match(text, pos).end()
+
+
+def _skip_value(text, pos):
+    """Restituisce la posizione subito dopo il valore JSON che inizia in pos, senza decodificarlo."""
+    if text[pos] not in '{[':
+        return _decoder.raw_decode(text, pos)[1]
+    depth = 0
+    for m in _TOKEN.finditer(text, pos):
+        tok = m.group()
+        if tok in '{[':
+            depth += 1
+        elif tok in '}]':
+            depth -= 1
+            if depth == 0:
+                return m.end()
+    raise ValueError('JSON troncato')
+
+
+def iter_object(text, pos=0, decode=None):
+    """Itera le coppie (chiave, valore) dell'oggetto JSON che inizia in pos.
+
+    decode(key) decide se decodificare il valore: se restituisce False il valore viene saltato
+    e al suo posto si restituisce la posizione (int) in cui inizia nel testo.
+    """
+    pos = _skip_ws(text, pos)
+    if text[pos] != '{':
+        raise ValueError('Oggetto JSON atteso')
+    pos = _skip_ws(text, pos + 1)
+    if text[pos] == '}':
+        return
+    while True:
+        if text[pos] != '"':
+            raise ValueError('Chiave JSON attesa')
+        key, pos = scanstring(text, pos + 1)
+        pos = _skip_ws(text, pos)
+        pos = _skip_ws(text, pos + 1)   # ':'
+        if decode is None or decode(key):
+            value, pos = _decoder.raw_decode(text, pos)
+        else:
+            value = pos
+            pos = _skip_value(text, pos)
+        yield key, value
+        pos = _skip_ws(text, pos)
+        if text[pos] == '}':
+            return
+        pos = _skip_ws(text, pos + 1)   # ','
+
+
+def _lookup(text, key, ips=None):
+    """Estrae dal documento le voci di text[key] (tutte, o solo quelle in ips) senza parsing completo."""
+    for top, start in iter_object(text, decode=lambda k: False):
+        if top != key:
+            continue
+        if text[start] != '{':
+            return {}
+        found = {}
+        wanted = set(ips) if ips else None
+        for ip, value in iter_object(text, start, decode=lambda k: wanted is None or k in wanted):
+            if wanted is None or ip in wanted:
+                found[ip] = value
+                if wanted is not None and len(found) == len(wanted):
+                    break
+        return found
+    return {}
+
+
+class SnapshotIndex:
+    """Indice degli snapshot di una directory di backup, ordinato per timestamp (dal nome file)."""
+
+    def __init__(self, backup_dir):
+        self.backup_dir = backup_dir
+        entries = []
+        if os.path.isdir(backup_dir):
+            for fname in os.listdir(backup_dir):
+                parsed = backup.parse_snapshot_name(fname)
+                if parsed:
+                    # il timestamp nel nome è in ora locale
+                    entries.append((time.mktime(parsed[0].timetuple()), fname))
+        entries.sort()
+        self.times = [e[0] for e in entries]
+        self.files = [e[1] for e in entries]
+
+    def __len__(self):
+        return len(self.files)
+
+    def find(self, ts):
+        """Ultimo snapshot con timestamp <= ts: (epoch, nome file) oppure None."""
+        i = bisect.bisect_right(self.times, ts) - 1
+        if i < 0:
+            return None
+        return self.times[i], self.files[i]
+
+    def between(self, start, end):
+        lo = bisect.bisect_left(self.times, start)
+        hi = bisect.bisect_right(self.times, end)
+        return list(zip(self.times[lo:hi], self.files[lo:hi]))
+
+    def read_status(self, fname, ips=None):
+        """Stato (ip -> stato) registrato nello snapshot, limitato a ips se indicati."""
+        path = os.path.join(self.backup_dir, fname)
+        text = backup.read_snapshot_bytes(path).decode('utf-8')
+        if not backup.parse_snapshot_name(fname)[1]:
+            return _lookup(text, 'last_status', ips)
+        # delta: stato della base aggiornato con le sole voci cambiate
+        doc = json.loads(text)
+        out = self.read_status(doc['base'], ips)
+        delta = doc['delta']
+        if 'last_status' in delta.get('replace', {}):
+            out = dict(delta['replace']['last_status'])
+            if ips:
+                out = {ip: out[ip] for ip in ips if ip in out}
+        for ip, st in delta.get('set', {}).get('last_status', {}).items():
+            if not ips or ip in ips:
+                out[ip] = st
+        for ip in delta.get('unset', {}).get('last_status', []):
+            out.pop(ip, None)
+        return out
+
+    def read_timestamp(self, fname):
+        """Epoch del campo `timestamp` dello snapshot (istante in cui il monitor ha scritto lo stato),
+        None se assente o non valido."""
+        path = os.path.join(self.backup_dir, fname)
+        text = backup.read_snapshot_bytes(path).decode('utf-8')
+        if backup.parse_snapshot_name(fname)[1]:
+            doc = json.loads(text)
+            value = doc['delta'].get('replace', {}).get('timestamp')
+            if value is None:
+                return self.read_timestamp(doc['base'])
+        else:
+            value = next((v for k, v in iter_object(text, decode=lambda k: k == 'timestamp')
+                          if k == 'timestamp'), None)
+        try:
+            return datetime.fromisoformat(value.rstrip('Z')).replace(tzinfo=timezone.utc).timestamp()
+        except (AttributeError, ValueError):
+            return None
+
+
+def status_at(ts, index, history=None, ips=None):
+    """Ricostruisce lo stato all'istante ts.
+
+    Restituisce (snapshot, stati) dove snapshot è (epoch, nome file) o None e stati è ip -> stato.
+    """
+    snap = index.find(ts)
+    states = index.read_status(snap[1], ips) if snap else {}
+    if history is not None:
+        # le transizioni vanno applicate dall'istante in cui lo stato è stato scritto, che precede
+        # quello del backup (nome file); senza `timestamp` si usa quest'ultimo
+        since = None
+        if snap:
+            written = index.read_timestamp(snap[1])
+            since = written if written is not None and written <= snap[0] else snap[0]
+        for rec in history.iter_records(since=since, until=ts):
+            ip = rec.get('ip')
+            if ips and ip not in ips:
+                continue
+            if since is not None and rec['ts'] <= since:
+                continue
+            states[ip] = rec.get('to')
+    return snap, states
+
+
+def transitions_between(history, start, end, ips=None):
+    """Transizioni nello storico nell'intervallo [start, end], filtrate per ips."""
+    return [rec for rec in history.iter_records(since=start, until=end)
+            if not ips or rec.get('ip') in ips]
@@ -0,0 +1,250 @@
+"""
+Backend SQLite (WAL) opzionale per connessioni, stato corrente e storico transizioni.
+
+Attivato con MP_PING_DB=/opt/mp_ping/mp_ping.db: le modifiche alle connessioni diventano
+aggiornamenti di singole righe in transazione (niente riscrittura completa del file),
+i lettori non bloccano lo scrittore (journal_mode=WAL) e le query per IP e stato
+usano indici (la ricerca per sottostringa nel nome è filtrata in SQL ma scansiona la tabella). status.json continua a essere scritto dal daemon per mp_status_backup.py.
+"""
+import json
+import time
+import sqlite3
+import threading
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS connections (
+    ip       TEXT PRIMARY KEY,
+    name     TEXT NOT NULL,
+    enabled  INTEGER NOT NULL DEFAULT 1,
+    position INTEGER NOT NULL,
+    extra    TEXT NOT NULL DEFAULT '{}'
+);
+-- una ricerca per sottostringa (LIKE '%x%') non può usare un indice sul nome
+DROP INDEX IF EXISTS idx_connections_name;
+CREATE INDEX IF NOT EXISTS idx_connections_position ON connections(position);
+
+CREATE TABLE IF NOT EXISTS state (
+    ip         TEXT PRIMARY KEY,
+    status     TEXT,
+    since      REAL,
+    down_since REAL,
+    rtt        REAL,
+    attempts   INTEGER,
+    next_due   REAL,
+    updated    REAL
+);
+CREATE INDEX IF NOT EXISTS idx_state_status ON state(status);
+
+CREATE TABLE IF NOT EXISTS transitions (
+    id     INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts     REAL NOT NULL,
+    ip     TEXT NOT NULL,
+    name   TEXT,
+    prev   TEXT,
+    status TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_transitions_ts ON transitions(ts);
+CREATE INDEX IF NOT EXISTS idx_transitions_ip_ts ON transitions(ip, ts);
+"""
+
+# colonne aggiunte dopo la prima versione dello schema (database già esistenti)
+_STATE_MIGRATIONS = (('attempts', 'INTEGER'), ('next_due', 'REAL'))
+
+# campi della connessione con colonna dedicata; gli altri (probe, burst, group, ...) vanno in `extra`
+_COLUMNS = ('name', 'ip', 'enabled')
+
+
+def _like_pattern(text):
+    """Pattern LIKE che cerca text come sottostringa letterale (% e _ non fanno da jolly)."""
+    return '%' + text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+def _row_to_connection(row):
+    conn = {'name': row['name'], 'ip': row['ip'], 'enabled': bool(row['enabled'])}
+    conn.update(json.loads(row['extra'] or '{}'))
+    return conn
+
+
+class SqliteStore:
+    """Accesso al database; una connessione SQLite per thread (i worker di conferma scrivono lo stato)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        db = self._db()
+        db.executescript(SCHEMA)
+        existing = {r['name'] for r in db.execute('PRAGMA table_info(state)')}
+        for column, kind in _STATE_MIGRATIONS:
+            if column not in existing:
+                db.execute(f'ALTER TABLE state ADD COLUMN {column} {kind}')
+        self.history = SqliteTransitionLog(self)
+
+    def _db(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            db.row_factory = sqlite3.Row
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            db.execute('PRAGMA busy_timeout=10000')
+            self._local.db = db
+        return db
+
+    class _Transaction:
+        def __init__(self, db):
+            self.db = db
+
+        def __enter__(self):
+            # IMMEDIATE: prende subito il lock di scrittura, evitando lost update tra CLI concorrenti
+            self.db.execute('BEGIN IMMEDIATE')
+            return self.db
+
+        def __exit__(self, exc_type, exc, tb):
+            self.db.execute('ROLLBACK' if exc_type else 'COMMIT')
+            return False
+
+    def _tx(self):
+        return self._Transaction(self._db())
+
+    # --- connessioni -------------------------------------------------------
+
+    def list_connections(self):
+        rows = self._db().execute('SELECT * FROM connections ORDER BY position').fetchall()
+        return [_row_to_connection(r) for r in rows]
+
+    def add_connections(self, conns):
+        """Inserisce le connessioni in un'unica transazione saltando gli IP già presenti.
+        Restituisce la lista delle connessioni effettivamente aggiunte."""
+        added = []
+        with self._tx() as db:
+            pos = db.execute('SELECT COALESCE(MAX(position), -1) FROM connections').fetchone()[0]
+            for conn in conns:
+                extra = {k: v for k, v in conn.items() if k not in _COLUMNS}
+                pos += 1
+                cur = db.execute(
+                    'INSERT OR IGNORE INTO connections (ip, name, enabled, position, extra) VALUES (?, ?, ?, ?, ?)',
+                    (conn['ip'], conn['name'], int(conn.get('enabled', True)), pos, json.dumps(extra, ensure_ascii=False)))
+                if cur.rowcount:
+                    added.append(conn)
+        return added
+
+    def add_connection(self, conn):
+        return bool(self.add_connections([conn]))
+
+    def remove_connections(self, name=None, ip=None):
+        with self._tx() as db:
+            cur = db.execute('DELETE FROM connections WHERE name = ? OR ip = ?', (name, ip))
+            db.execute('DELETE FROM state WHERE ip NOT IN (SELECT ip FROM connections)')
+            return cur.rowcount
+
+    def update_connection(self, ip, **fields):
+        """Aggiorna i campi di una singola connessione (riga) senza toccare le altre."""
+        with self._tx() as db:
+            row = db.execute('SELECT * FROM connections WHERE ip = ?', (ip,)).fetchone()
+            if row is None:
+                return False
+            conn = _row_to_connection(row)
+            conn.update(fields)
+            extra = {k: v for k, v in conn.items() if k not in _COLUMNS}
+            db.execute('UPDATE connections SET name = ?, enabled = ?, extra = ? WHERE ip = ?',
+                       (conn['name'], int(conn.get('enabled', True)), json.dumps(extra, ensure_ascii=False), ip))
+            return True
+
+    def find_connections(self, ip=None, name=None, status=None, keyword=None):
+        """ip esatto e status esatto (indicizzati), name per sottostringa (case-insensitive),
+        keyword per sottostringa nel nome (case-insensitive) o nell'IP."""
+        sql = ('SELECT c.*, s.status AS status FROM connections c LEFT JOIN state s ON s.ip = c.ip WHERE 1=1')
+        args = []
+        if ip:
+            sql += ' AND c.ip = ?'
+            args.append(ip)
+        if name:
+            sql += " AND c.name LIKE ? ESCAPE '\\'"
+            args.append(_like_pattern(name))
+        if keyword:
+            sql += " AND (c.name LIKE ? ESCAPE '\\' OR instr(c.ip, ?) > 0)"
+            args.extend([_like_pattern(keyword), keyword])
+        if status:
+            sql += ' AND s.status = ?'
+            args.append(status)
+        sql += ' ORDER BY c.position'
+        out = []
+        for row in self._db().execute(sql, args):
+            conn = _row_to_connection(row)
+            conn['status'] = row['status']
+            out.append(conn)
+        return out
+
+    # --- stato corrente ----------------------------------------------------
+
+    def set_state(self, ip, status, ts=None):
+        """Aggiorna lo stato di un singolo host (riga) registrando l'istante del cambio."""
+        ts = ts or time.time()
+        with self._tx() as db:
+            db.execute(
+                'INSERT INTO state (ip, status, since, updated) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT(ip) DO UPDATE SET status = excluded.status, since = excluded.since, '
+                'updated = excluded.updated',
+                (ip, status, ts, ts))
+
+    def save_states(self, rows):
+        """Aggiorna in blocco (una transazione) lo stato di avanzamento degli host:
+        rows = [(ip, rtt, down_since, attempts, next_due), ...]."""
+        now = time.time()
+        with self._tx() as db:
+            db.executemany(
+                'INSERT INTO state (ip, rtt, down_since, attempts, next_due, updated) VALUES (?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT(ip) DO UPDATE SET rtt = excluded.rtt, down_since = excluded.down_since, '
+                'attempts = excluded.attempts, next_due = excluded.next_due, updated = excluded.updated',
+                [(ip, rtt, down_since, attempts, next_due, now) for ip, rtt, down_since, attempts, next_due in rows])
+
+    def get_states(self):
+        """Restituisce {ip: {'status', 'since', 'down_since', 'rtt', 'attempts', 'next_due'}}."""
+        return {r['ip']: {'status': r['status'], 'since': r['since'], 'down_since': r['down_since'], 'rtt': r['rtt'],
+                          'attempts': r['attempts'], 'next_due': r['next_due']}
+                for r in self._db().execute('SELECT * FROM state')}
+
+    # --- migrazione / export -----------------------------------------------
+
+    def migrate_from_json(self, connections, last_status=None, history_records=()):
+        """Importa connessioni, stato e storico dai file JSON esistenti (una sola transazione per tabella)."""
+        added = self.add_connections(connections)
+        now = time.time()
+        with self._tx() as db:
+            db.executemany(
+                'INSERT OR IGNORE INTO state (ip, status, since, updated) VALUES (?, ?, ?, ?)',
+                [(ip, st, now, now) for ip, st in (last_status or {}).items()])
+        n_hist = self.history.extend(history_records)
+        return len(added), n_hist
+
+    def export_status(self):
+        """Struttura compatibile con status.json (per mp_status_backup.py)."""
+        states = self.get_states()
+        return {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime()) + 'Z',
+            'last_status': {c['ip']: states.get(c['ip'], {}).get('status') for c in self.list_connections()},
+        }
+
+
+class SqliteTransitionLog:
+    """Storico transizioni su SQLite con la stessa interfaccia di history.TransitionLog."""
+
+    def __init__(self, store):
+        self.store = store
+
+    def append(self, ip, name, prev, new, ts=None):
+        with self.store._tx() as db:
+            db.execute('INSERT INTO transitions (ts, ip, name, prev, status) VALUES (?, ?, ?, ?, ?)',
+                       (round(ts if ts is not None else time.time(), 3), ip, name, prev, new))
+
+    def extend(self, records):
+        rows = [(r['ts'], r['ip'], r.get('name'), r.get('from'), r.get('to')) for r in records]
+        with self.store._tx() as db:
+            db.executemany('INSERT INTO transitions (ts, ip, name, prev, status) VALUES (?, ?, ?, ?, ?)', rows)
+        return len(rows)
+
+    def iter_records(self, since=None, until=None):
+        sql = 'SELECT ts, ip, name, prev, status FROM transitions WHERE ts >= ? AND ts <= ? ORDER BY ts, id'
+        args = (since if since is not None else float('-inf'), until if until is not None else float('inf'))
+        for row in self.store._db().execute(sql, args):
+            yield {'ts': row['ts'], 'ip': row['ip'], 'name': row['name'], 'from': row['prev'], 'to': row['status']}
@@ -0,0 +1,169 @@
+"""
+Scansione parallela di una rete (CIDR) con echo ICMP, per l'onboarding di nuovi host.
+
+Un solo socket ICMP (raw se il processo ne ha i permessi, altrimenti il socket "ping" non
+privilegiato SOCK_DGRAM) invia gli echo a tutta la rete e riceve le risposte sullo stesso
+thread tramite un selector: gli invii sono distanziati dal Pacer (pacer.Pacer.reserve) e
+mentre si attende il token successivo si leggono le risposte già arrivate. Gli host che
+rispondono vengono restituiti man mano (generatore), senza aspettare la fine della scansione.
+
+Gli indirizzi sono inviati alternando le /24 (x.y.0.1, x.y.1.1, ... x.y.0.2, ...), così i
+router di destinazione non ricevono raffiche verso la stessa sottorete. Solo IPv4.
+"""
+import os
+import time
+import errno
+import struct
+import socket
+import ipaddress
+import selectors
+from collections import deque
+
+ECHO_REQUEST = 8
+ECHO_REPLY = 0
+PAYLOAD = b'mp_ping-sweep'
+MAX_HOSTS = 65536       # una /16
+
+
+def checksum(data):
+    if len(data) % 2:
+        data += b'\0'
+    total = sum(struct.unpack(f'!{len(data) // 2}H', data))
+    total = (total >> 16) + (total & 0xffff)
+    total += total >> 16
+    return ~total & 0xffff
+
+
+def echo_packet(ident, seq, payload=PAYLOAD):
+    header = struct.pack('!BBHHH', ECHO_REQUEST, 0, 0, ident, seq)
+    return struct.pack('!BBHHH', ECHO_REQUEST, 0, checksum(header + payload), ident, seq) + payload
+
+
+def parse_network(cidr, max_hosts=MAX_HOSTS):
+    """Valida il CIDR da scansionare. Solleva ValueError se non valido, IPv6 o troppo grande."""
+    try:
+        network = ipaddress.ip_network(cidr.strip(), strict=False)
+    except ValueError:
+        raise ValueError(f"Rete non valida: '{cidr}' (usa formato CIDR, es. 10.20.0.0/22)")
+    if network.version != 4:
+        raise ValueError('La scansione è supportata solo per reti IPv4')
+    if network.num_addresses > max_hosts:
+        raise ValueError(f'Rete troppo grande: {network.num_addresses} indirizzi (massimo {max_hosts})')
+    return network
+
+
+def sweep_order(network):
+    """Host della rete ordinati alternando le /24: prima il .1 di ogni /24, poi il .2, ..."""
+    return sorted((str(a) for a in network.hosts()),
+                  key=lambda a: (int(a.rsplit('.', 1)[1]), ipaddress.IPv4Address(a)))
+
+
+def open_icmp_socket():
+    """Socket ICMP raw, oppure SOCK_DGRAM (net.ipv4.ping_group_range) se il raw non è permesso.
+    Restituisce (socket, raw)."""
+    try:
+        return socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP), True
+    except PermissionError:
+        return socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP), False
+
+
+def parse_reply(data, raw):
+    """(tipo, id, seq) del pacchetto ICMP ricevuto; con il socket raw c'è davanti l'header IP."""
+    if raw:
+        data = data[(data[0] & 0x0f) * 4:]
+    if len(data) < 8:
+        return None
+    icmp_type, _, _, ident, seq = struct.unpack('!BBHHH', data[:8])
+    return icmp_type, ident, seq
+
+
+class IcmpSweeper:
+    """Invia un echo a ogni indirizzo e restituisce (ip, rtt in secondi) per chi risponde entro timeout."""
+
+    def __init__(self, pacer=None, timeout=1.0, clock=time.monotonic):
+        self.pacer = pacer
+        self.timeout = timeout
+        self.clock = clock
+        self.ident = os.getpid() & 0xffff
+        self.sent = 0
+        self.received = 0
+        self.errors = 0
+
+    def stream(self, addresses):
+        sock, raw = open_icmp_socket()
+        sock.setblocking(False)
+        sel = selectors.DefaultSelector()
+        sel.register(sock, selectors.EVENT_READ)
+        pending = iter(addresses)
+        outstanding = {}        # ip -> (seq, invio)
+        deadlines = deque()     # (scadenza, ip) in ordine di invio: il timeout è uguale per tutti
+        current = None          # (ip, istante di invio prenotato)
+        seq = 0
+        exhausted = False
+        try:
+            while True:
+                now = self.clock()
+                while not exhausted:
+                    if current is None:
+                        addr = next(pending, None)
+                        if addr is None:
+                            exhausted = True
+                            break
+                        current = (addr, self.clock() + (self.pacer.reserve(addr) if self.pacer else 0.0))
+                    addr, due = current
+                    if due > now:
+                        break
+                    seq = (seq + 1) & 0xffff
+                    try:
+                        sock.sendto(echo_packet(self.ident, seq), (addr, 0))
+                    except OSError as e:
+                        if isinstance(e, BlockingIOError) or e.errno == errno.ENOBUFS:
+                            # buffer di invio pieno: riproviamo fra 1 ms, intanto leggiamo le risposte
+                            current = (addr, now + 0.001)
+                            break
+                        # es. EACCES verso un broadcast, ENETUNREACH: l'host conta come non raggiungibile
+                        self.errors += 1
+                        current = None
+                        continue
+                    now = self.clock()
+                    self.sent += 1
+                    outstanding[addr] = (seq, now)
+                    deadlines.append((now + self.timeout, addr))
+                    current = None
+
+                while deadlines and deadlines[0][0] <= now:
+                    _, addr = deadlines.popleft()
+                    outstanding.pop(addr, None)
+                if exhausted and not outstanding:
+                    return
+
+                wait = self.timeout
+                if current is not None:
+                    wait = min(wait, current[1] - now)
+                if deadlines:
+                    wait = min(wait, deadlines[0][0] - now)
+                if not sel.select(max(wait, 0.0)):
+                    continue
+                while True:
+                    try:
+                        data, (addr, _) = sock.recvfrom(1024)
+                    except (BlockingIOError, InterruptedError):
+                        break
+                    received = self.clock()
+                    parsed = parse_reply(data, raw)
+                    entry = outstanding.get(addr)
+                    if parsed is None or entry is None:
+                        continue
+                    icmp_type, ident, reply_seq = parsed
+                    # col socket raw arrivano anche le risposte ai ping di altri processi
+                    if icmp_type != ECHO_REPLY or reply_seq != entry[0] or (raw and ident != self.ident):
+                        continue
+                    del outstanding[addr]
+                    self.received += 1
+                    yield addr, received - entry[1]
+        finally:
+            sel.close()
+            sock.close()
+
+    def stats(self):
+        return {'sent': self.sent, 'received': self.received, 'errors': self.errors}
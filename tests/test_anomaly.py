@@ -0,0 +1,35 @@
+import numpy as np
+from anomaly import LatencyDetector
+
+def _fleet(n=40):
+    ips = [f'10.0.0.{i}' for i in range(n)]
+    groups = {ip: ('EOLO' if i % 2 else 'TIM') for i, ip in enumerate(ips)}
+    return ips, groups
+
+def test_group_shift_emits_single_event():
+    ips, groups = _fleet()
+    det = LatencyDetector(alpha=0.1, z_threshold=4, warmup=5, min_std=2, group_min=5, group_fraction=0.3,
+                          cooldown=600)
+    rng = np.random.default_rng(0)
+    fresh = np.ones(len(ips), dtype=bool)
+    base = np.linspace(10, 50, len(ips))
+    for c in range(20):
+        assert det.update(ips, base + rng.normal(0, 0.5, len(ips)), fresh, float(c), groups=lambda: groups) is None
+
+    rtt = base.copy()
+    rtt[1::2] += 40                     # tutte le linee EOLO
+    rtt[0] += 40                        # un singolo outlier TIM non basta per il gruppo
+    event = det.update(ips, rtt, fresh, 100.0)
+    assert [g['group'] for g in event['groups']] == ['EOLO']
+    assert event['groups'][0]['outliers'] == 20 and event['outliers'] == 21
+    # cooldown: lo stesso gruppo non viene segnalato di nuovo nel ciclo successivo
+    assert det.update(ips, rtt, fresh, 101.0) is None
+
+def test_realign_keeps_baselines_and_skips_stale_rows():
+    ips, groups = _fleet(4)
+    det = LatencyDetector(warmup=1)
+    det.update(ips, np.array([10.0, 20.0, np.nan, 40.0]), np.array([True, True, True, False]), 0.0,
+               groups=lambda: groups)
+    assert det.count.tolist() == [1, 1, 0, 0]
+    det.update(ips[::-1] + ['10.0.0.9'], np.full(5, np.nan), np.zeros(5, dtype=bool), 1.0, groups=lambda: groups)
+    assert det.mean.tolist()[:4] == [0.0, 0.0, 20.0, 10.0]
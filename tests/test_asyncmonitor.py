@@ -0,0 +1,96 @@
+import os
+import time
+import asyncio
+import tempfile
+from contextlib import aclosing
+from threading import Event
+from unittest.mock import patch
+from asyncmonitor import AsyncMonitor
+from monitor import Monitor
+
+
+class ListFeed:
+    def __init__(self):
+        self.events = []
+
+    def publish(self, event):
+        self.events.append(event)
+
+    def close(self):
+        pass
+
+
+def _slow_ping(ip, timeout):
+    if ip == '10.0.0.9':
+        time.sleep(0.5)
+        return None
+    return 0.01
+
+
+def _monitor(d):
+    monitor = Monitor(config_path=os.path.join(d, 'c.json'), status_path=os.path.join(d, 's.json'),
+                      history_path=os.path.join(d, 'h.jsonl'), db_path='')
+    monitor.feed = ListFeed()
+    for i in (1, 2, 9):
+        monitor.add_connection(f'Host {i}', f'10.0.0.{i}')
+    return monitor
+
+
+def test_iter_results_streams_and_honours_deadline():
+    with tempfile.TemporaryDirectory() as d:
+        monitor = _monitor(d)
+        with patch('monitor.ping', side_effect=_slow_ping):
+            # i risultati arrivano prima che l'host lento vada in timeout
+            start = time.monotonic()
+            stream = monitor.iter_results()
+            first = next(stream)
+            assert time.monotonic() - start < 0.4
+            assert first['ip'] != '10.0.0.9' and (first['prev'], first['status']) == ('UNKNOWN', 'UP')
+            stream.close()
+            event = monitor.feed.events[-1]
+            assert (event['type'], event['probed'], event['skipped']) == ('cycle', 1, 2)
+
+            # con la scadenza l'host lento resta com'era ed è dovuto al ciclo successivo
+            results = {r['ip']: r['status'] for r in monitor.iter_results(deadline=0.2)}
+            assert results == {'10.0.0.1': 'UP', '10.0.0.2': 'UP'}
+            event = monitor.feed.events[-1]
+            assert (event['type'], event['probed'], event['skipped']) == ('cycle', 2, 1)
+            assert [c['ip'] for c in monitor.due_connections()] == ['10.0.0.9']
+
+            # cancel interrompe allo stesso modo; ping_all resta il ciclo completo
+            cancel = Event()
+            cancel.set()
+            assert list(monitor.iter_results(cancel=cancel)) == []
+            with patch.object(monitor, 'schedule_confirm_down'):
+                results = {r['ip']: (r['prev'], r['status']) for r in monitor.ping_all()}
+        assert results == {'10.0.0.1': ('UP', 'UP'), '10.0.0.2': ('UP', 'UP'), '10.0.0.9': ('UNKNOWN', 'CHECKING')}
+
+
+def test_async_monitor_yields_and_cancels():
+    async def scenario(am, monitor):
+        seen = []
+        async with aclosing(am.results(deadline=5)) as results:
+            async for r in results:
+                seen.append(r['ip'])
+                break                               # uscita anticipata: il ciclo viene chiuso
+        # ciclo già chiuso all'uscita: l'host lento non è stato sondato
+        assert monitor.feed.events[-1]['type'] == 'cycle'
+        assert [c['ip'] for c in monitor.due_connections()] == ['10.0.0.9']
+        task = asyncio.ensure_future(am.ping_due())
+        await asyncio.sleep(0.1)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        return seen
+
+    with tempfile.TemporaryDirectory() as d:
+        monitor = _monitor(d)
+        with patch('monitor.ping', side_effect=_slow_ping), patch.object(monitor, 'schedule_confirm_down'):
+            seen = asyncio.run(scenario(AsyncMonitor(monitor), monitor))
+            assert len(seen) == 1 and seen[0] != '10.0.0.9'
+            # il task cancellato ha chiuso il ciclo: l'host lento resta da sondare
+            assert monitor.feed.events[-1]['type'] == 'cycle' and monitor.feed.events[-1]['skipped'] >= 1
+            results = asyncio.run(AsyncMonitor(monitor).ping_all(deadline=0.2))
+        assert {r['ip'] for r in results} == {'10.0.0.1', '10.0.0.2'}
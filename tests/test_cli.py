@@ -20,4 +20,11 @@ def test_cli_add_remove_list():
         assert 'Totali:' in result.output
         assert 'UP=1' in result.output
         assert 'DOWN=0' in result.output
-        assert 'Pausa=0' in result.output
\ No newline at end of file
+        assert 'Pausa=0' in result.output
+def test_cli_add_duplicate_fails():
+    runner = CliRunner()
+    with patch('cli.Monitor') as MockMonitor:
+        MockMonitor.return_value.add_connection.side_effect = ValueError('Connessione con IP 1.2.3.4 già presente')
+        result = runner.invoke(cli, ['conn', 'add', '--name', 'Test', '--ip', '1.2.3.4'])
+    assert result.exit_code != 0
+    assert 'già presente' in result.output and 'Aggiunta connessione' not in result.output
@@ -0,0 +1,40 @@
+import os
+import time
+import tempfile
+import threading
+from feed import ChangeFeed, Subscriber, subscribe, transition_event
+
+def test_subscriber_queue_coalesces_and_drops():
+    sub = Subscriber(None, maxlen=2)
+    sub.push(transition_event('1.1.1.1', 'A', 'UP', 'CHECKING', ts=1))
+    sub.push(transition_event('1.1.1.1', 'A', 'CHECKING', 'DOWN', ts=2))
+    sub.push(transition_event('2.2.2.2', 'B', 'UP', 'CHECKING', ts=3))
+    sub.push(transition_event('3.3.3.3', 'C', None, 'UP', ts=4))
+    assert sub.fill()
+    lines = sub.buffer.decode().splitlines()
+    # 1.1.1.1 (fuso UP -> DOWN) è il più vecchio ed è stato scartato quando la coda era piena
+    assert lines[0] == '{"type": "dropped", "count": 1}'
+    assert [l.split('"ip": ')[1][:9] for l in lines[1:]] == ['"2.2.2.2"', '"3.3.3.3"']
+    sub = Subscriber(None, maxlen=10)
+    sub.push(transition_event('1.1.1.1', 'A', 'UP', 'CHECKING', ts=1))
+    sub.push(transition_event('1.1.1.1', 'A', 'CHECKING', 'DOWN', ts=2))
+    assert sub.pending['1.1.1.1']['from'] == 'UP' and sub.pending['1.1.1.1']['coalesced'] == 2
+
+def test_feed_streams_to_subscribers():
+    with tempfile.TemporaryDirectory() as d:
+        feed = ChangeFeed(os.path.join(d, 'feed.sock'))
+        try:
+            events = subscribe(feed.path, timeout=5)
+            # il primo next() si connette: pubblichiamo dopo che il client è registrato
+            def produce():
+                while not feed.subscribers:
+                    time.sleep(0.01)
+                for i in range(3):
+                    feed.publish(transition_event(f'10.0.0.{i}', 'X', 'UP', 'CHECKING'))
+            threading.Thread(target=produce, daemon=True).start()
+            got = [next(events)['ip'] for _ in range(3)]
+            assert got == ['10.0.0.0', '10.0.0.1', '10.0.0.2']
+            events.close()
+        finally:
+            feed.close()
+        assert not os.path.exists(feed.path)
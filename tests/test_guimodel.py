@@ -0,0 +1,51 @@
+from guimodel import ConnectionRows
+
+
+def _connections(n):
+    return [{'name': f'Cliente - host {i:05d}', 'ip': f'10.0.{i // 250}.{i % 250 + 1}', 'enabled': i % 100 != 0}
+            for i in range(n)]
+
+
+def test_rows_window_and_incremental_totals():
+    rows = ConnectionRows(height=25)
+    rows.load(_connections(10000), {'10.0.0.1': 'UP'})
+    assert len(rows) == 10000
+    t = rows.totals()
+    assert (t['total'], t['up'], t['unknown'], t['paused']) == (10000, 1, 9999, 100)
+    assert rows.visible()[0] == '10.0.0.1' and len(rows.visible()) == 25
+
+    # solo le righe cambiate risultano da ridisegnare; i totali restano coerenti
+    assert rows.update('10.0.0.2', status='DOWN', rtt=None)
+    assert not rows.update('10.0.0.2', status='DOWN')
+    assert rows.update('10.0.0.3', rtt=12.34)
+    assert rows.values('10.0.0.3')[3] == '12.3 ms'
+    t = rows.totals()
+    assert (t['down'], t['unknown']) == (1, 9998)
+
+    # scorrimento limitato all'elenco e slot dell'IP nella finestra visibile
+    assert rows.slot_of('10.0.0.2') == 1
+    assert rows.scroll(100000) and rows.offset == 10000 - 25
+    assert rows.slot_of('10.0.0.2') is None
+    assert not rows.scroll(1)
+    assert rows.fraction() == ((10000 - 25) / 10000, 1.0)
+
+    # la ricerca seleziona e rende visibile la prima corrispondenza
+    found = rows.search('host 05000')
+    assert len(found) == 1
+    rows.see(found[0])
+    rows.selected = {rows.rows[found[0]]['ip']}
+    assert rows.rows[found[0]]['ip'] in rows.visible()
+    assert rows.first_selected()['name'] == 'Cliente - host 05000'
+
+    # il ricaricamento (dopo una rimozione) scarta la selezione non più valida
+    rows.load(_connections(100))
+    assert rows.selected == set() and rows.offset == 75
+
+
+def test_rows_paused_icon_and_sort_by_name_after_dash():
+    rows = ConnectionRows(height=5)
+    rows.load([{'name': 'EOLO - Zeta', 'ip': '1.1.1.1', 'enabled': True},
+               {'name': 'TIM - Alfa', 'ip': '2.2.2.2', 'enabled': False}], {'1.1.1.1': 'UP'})
+    assert rows.visible() == ['2.2.2.2', '1.1.1.1']
+    assert rows.values('2.2.2.2')[0] == '⏸️'
+    assert rows.values('1.1.1.1')[0] == '✅'
@@ -0,0 +1,53 @@
+import random
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from hosttable import HostTable, StatusView, DownTimesView, pack_ip, unpack_ip, to_epoch
+
+def test_add_remove_keeps_index_consistent():
+    ips = [f'10.0.{i // 256}.{i % 256}' for i in range(3000)]
+    table = HostTable(ips)
+    for i, ip in enumerate(ips):
+        table.set_state(ip, 'UP' if i % 2 else 'DOWN')
+    random.seed(1)
+    removed = set(random.sample(ips, 1000))
+    for ip in removed:
+        table.remove(ip)
+    assert len(table) == 2000
+    for i, ip in enumerate(ips):
+        if ip in removed:
+            assert ip not in table
+        else:
+            assert table.get_state(ip) == ('UP' if i % 2 else 'DOWN')
+    kept = [ip for ip in ips if ip not in removed][:10] + ['2001:db8::1']
+    table.sync(kept)
+    assert table.status_dict() == {ip: table.get_state(ip) for ip in kept}
+    assert table.get_state('2001:db8::1') is None
+
+def test_views_and_packing():
+    table = HostTable(['1.2.3.4'])
+    status = StatusView(table)
+    down = DownTimesView(table, ZoneInfo('Europe/Rome'))
+    status['1.2.3.4'] = 'CHECKING'
+    assert dict(status) == {'1.2.3.4': 'CHECKING'}
+    assert '1.2.3.4' not in down
+    when = datetime(2025, 1, 1, 12, 0, tzinfo=ZoneInfo('Europe/Rome'))
+    down['1.2.3.4'] = when
+    assert down['1.2.3.4'] == when
+    del down['1.2.3.4']
+    assert len(down) == 0
+    table.set_metrics('1.2.3.4', {'loss': 40.0, 'rtt_avg': 12.5, 'jitter': None})
+    assert table.metrics_dict() == {'1.2.3.4': {'loss': 40.0, 'rtt_avg': 12.5, 'jitter': None}}
+    assert unpack_ip(*pack_ip('1.2.3.4')) == '1.2.3.4'
+    assert unpack_ip(*pack_ip('2001:db8::1')) == '2001:db8::1'
+    assert pack_ip('router.example') == (0, 0)
+
+def test_epoch_columns_are_compact_whole_seconds():
+    table = HostTable(['1.2.3.4'], clock=lambda: 1_700_000_000.9)
+    for col in (table.changed, table.down_since, table.next_due, table.next_check, table.last_ok):
+        assert col.itemsize == 4
+    table.set_state('1.2.3.4', 'UP')
+    assert table.changed[0] == 1_700_000_000
+    assert to_epoch(0.0) == 0 and to_epoch(None) == 0
+    table.restore_runtime('1.2.3.4', {'changed': 1_700_000_000.5, 'down_since': 1_700_000_100.75, 'attempts': 3, 'next_due': 1_700_000_130.2})
+    assert table.runtime_dict()['1.2.3.4'] == {'changed': 1_700_000_000, 'down_since': 1_700_000_100,
+                                               'attempts': 3, 'next_due': 1_700_000_130}
@@ -0,0 +1,29 @@
+import os
+import json
+import tempfile
+import pytest
+from jsoncache import JsonFileCache, thaw
+
+def test_cache_hit_and_atomic_replace_invalidation():
+    cache = JsonFileCache()
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, 'status.json')
+        with open(path, 'w') as f:
+            json.dump({'last_status': {'1.1.1.1': 'UP'}}, f)
+        first = cache.load(path)
+        assert cache.load(path) is first
+        assert (cache.hits, cache.misses) == (1, 1)
+        with pytest.raises(TypeError):
+            first['last_status']['1.1.1.1'] = 'DOWN'
+
+        # stessa dimensione, nuovo inode tramite os.replace
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'last_status': {'1.1.1.1': 'NO'}}, f)
+        os.replace(tmp, path)
+        second = cache.load(path)
+        assert second['last_status']['1.1.1.1'] == 'NO'
+        assert thaw(second) == {'last_status': {'1.1.1.1': 'NO'}}
+
+        os.remove(path)
+        assert cache.load(path) is None
@@ -0,0 +1,119 @@
+import os
+import json
+import tempfile
+from datetime import datetime
+from unittest.mock import patch
+from zoneinfo import ZoneInfo
+from clock import VirtualClock
+from maintenance import IntervalIndex, MaintenanceSchedule, cron_occurrences
+from monitor import Monitor
+
+
+def test_cron_occurrences_and_interval_index():
+    tz = ZoneInfo('Europe/Rome')
+    since = datetime(2025, 3, 1, tzinfo=tz).timestamp()    # sabato
+    # domenica alle 02:00 e alle 02:30; il 30 marzo 2025 è il giorno del cambio d'ora
+    got = [datetime.fromtimestamp(t, tz) for t in cron_occurrences('0,30 2 * * 0', since, since + 31 * 86400)]
+    assert [(d.day, d.hour, d.minute) for d in got][:2] == [(2, 2, 0), (2, 2, 30)]
+    assert all(d.weekday() == 6 for d in got)
+
+    index = IntervalIndex()
+    for start, end in [(30, 40), (10, 20), (15, 25), (100, 110)]:
+        index.add('h', start, end)
+    index.build()
+    assert index.find('h', 12) == 25        # intervalli sovrapposti fusi
+    assert index.find('h', 25) is None      # fine esclusa
+    assert index.find('h', 105) == 110
+    assert index.find('x', 12) is None
+    assert index.next_start('h', 26) == 30
+
+
+def test_maintenance_window_suppresses_confirm_and_verifies_at_end():
+    with tempfile.TemporaryDirectory() as d:
+        start = 1_700_000_000.0
+        clock = VirtualClock(start)
+        path = os.path.join(d, 'maintenance.json')
+        with patch.dict(os.environ, {'MP_MAINTENANCE_FILE': path, 'MP_FEED_SOCKET': '', 'MP_SHM_PATH': ''}):
+            schedule = MaintenanceSchedule()
+            schedule.add({'id': 'eolo', 'targets': ['group:EOLO'], 'start': start + 100, 'end': start + 7300})
+            with open(path) as f:
+                assert json.load(f)[0]['targets'] == ['group:EOLO']
+            monitor = Monitor(config_path=os.path.join(d, 'c.json'), status_path=os.path.join(d, 's.json'),
+                              history_path=os.path.join(d, 'h.jsonl'), db_path='', clock=clock)
+        monitor.add_connection('EOLO - Cliente', '10.0.0.1')
+        monitor.add_connection('TIM - Cliente', '10.0.0.2')
+
+        with patch('monitor.ping', return_value=0.01) as ping, patch.object(monitor, 'send_email_alert') as alert:
+            monitor.ping_all()
+            assert alert.call_count == 0
+
+            clock.run_until(start + 200)
+            ping.return_value = None
+            results = {r['ip']: r['status'] for r in monitor.ping_all()}
+            # in manutenzione: DOWN subito, senza conferma né email; l'altro host segue la procedura normale
+            assert results == {'10.0.0.1': 'DOWN', '10.0.0.2': 'CHECKING'}
+            assert set(monitor.retry_threads) == {'10.0.0.2'}
+            assert alert.call_count == 0
+            assert monitor._maintenance_status() == {'active': {'10.0.0.1': start + 7300}, 'silenced': ['10.0.0.1']}
+            # durante la finestra il probe è diradato (x4) ma non oltre la fine
+            assert monitor.hosts.next_check[monitor.hosts.row('10.0.0.1')] == start + 200 + 3600
+            clock.run_until(start + 3800)
+            monitor._run_cycle([monitor._connection('10.0.0.1')])
+            assert monitor.hosts.next_check[monitor.hosts.row('10.0.0.1')] == start + 7300
+            # fuori manutenzione la conferma è andata avanti e ha segnalato il DOWN
+            assert [call.args[1:3] for call in alert.call_args_list] == [('10.0.0.2', 'DOWN')]
+
+            # verifica di fine finestra: tornato su senza email (il DOWN non era stato segnalato)
+            clock.run_until(start + 7300)
+            alert.reset_mock()
+            ping.return_value = 0.01
+            results = {r['ip']: r['status'] for r in monitor.ping_due()}
+        assert results['10.0.0.1'] == 'UP'
+        assert all(call.args[1] != '10.0.0.1' for call in alert.call_args_list)
+        assert monitor.silenced == set()
+
+
+def test_recovery_during_window_of_down_alerted_before_it():
+    with tempfile.TemporaryDirectory() as d:
+        start = 1_700_000_000.0
+        clock = VirtualClock(start)
+        path = os.path.join(d, 'maintenance.json')
+        with patch.dict(os.environ, {'MP_MAINTENANCE_FILE': path, 'MP_FEED_SOCKET': '', 'MP_SHM_PATH': ''}):
+            schedule = MaintenanceSchedule()
+            schedule.add({'id': 'eolo', 'targets': ['10.0.0.1'], 'start': start + 3600, 'end': start + 7200})
+            monitor = Monitor(config_path=os.path.join(d, 'c.json'), status_path=os.path.join(d, 's.json'),
+                              history_path=os.path.join(d, 'h.jsonl'), db_path='', clock=clock)
+        monitor.add_connection('EOLO - Cliente', '10.0.0.1')
+
+        with patch('monitor.ping', return_value=None) as ping, patch.object(monitor, 'send_email_alert') as alert:
+            monitor.ping_all()
+            clock.run_until(start + 1800)
+            assert [call.args[1:3] for call in alert.call_args_list] == [('10.0.0.1', 'DOWN')]
+            assert '10.0.0.1' in monitor.down_times
+
+            # il DOWN era già segnalato: il ripristino durante la finestra manda l'email UP
+            clock.run_until(start + 4000)
+            ping.return_value = 0.01
+            results = {r['ip']: r['status'] for r in monitor.ping_all()}
+        assert results == {'10.0.0.1': 'UP'}
+        assert [call.args[1:3] for call in alert.call_args_list] == [('10.0.0.1', 'DOWN'), ('10.0.0.1', 'UP')]
+        assert '10.0.0.1' not in monitor.down_times and monitor.silenced == set()
+
+
+def test_silenced_hosts_survive_restart():
+    with tempfile.TemporaryDirectory() as d:
+        start = 1_700_000_000.0
+        clock = VirtualClock(start)
+        path = os.path.join(d, 'maintenance.json')
+        paths = dict(config_path=os.path.join(d, 'c.json'), status_path=os.path.join(d, 's.json'),
+                     history_path=os.path.join(d, 'h.jsonl'), db_path='', clock=clock)
+        with patch.dict(os.environ, {'MP_MAINTENANCE_FILE': path, 'MP_FEED_SOCKET': '', 'MP_SHM_PATH': ''}):
+            MaintenanceSchedule().add({'id': 'eolo', 'targets': ['10.0.0.1'], 'start': start, 'end': start + 3600})
+            monitor = Monitor(**paths)
+            monitor.add_connection('EOLO - Cliente', '10.0.0.1')
+            with patch('monitor.ping', return_value=None), patch.object(monitor, 'send_email_alert'):
+                monitor.ping_all()
+            assert monitor.silenced == {'10.0.0.1'}
+            monitor.dump_status()
+            restarted = Monitor(**paths)
+        assert restarted.silenced == {'10.0.0.1'}
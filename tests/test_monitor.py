@@ -1,5 +1,8 @@
 import os
+import json
 import tempfile
+import pytest
+from datetime import datetime, timedelta
 from monitor import Monitor
 from unittest.mock import patch
 
@@ -13,6 +16,9 @@ def test_add_and_remove_connection():
         monitor = Monitor(config_path=config_path, status_path=status_path)
         monitor.add_connection('Test', '1.2.3.4')
         assert any(c['ip'] == '1.2.3.4' for c in monitor.connections)
+        with pytest.raises(ValueError):
+            monitor.add_connection('Doppione', '1.2.3.4')
+        assert [c['name'] for c in monitor.connections if c['ip'] == '1.2.3.4'] == ['Test']
         monitor.remove_connection(ip='1.2.3.4')
         assert not any(c['ip'] == '1.2.3.4' for c in monitor.connections)
     finally:
@@ -38,4 +44,83 @@ def test_ping_all_mock():
         try:
             os.remove(status_path)
         except Exception:
-            pass
\ No newline at end of file
+            pass
+
+def test_burst_degraded_state():
+    with tempfile.TemporaryDirectory() as d:
+        monitor = Monitor(config_path=os.path.join(d, 'c.json'), status_path=os.path.join(d, 's.json'),
+                          history_path=os.path.join(d, 'h.jsonl'))
+        monitor.burst = 10
+        monitor.probers['icmp'].pipeline = None     # echo dalla funzione di ping sostituita
+        monitor.add_connection('Test', '1.2.3.4')
+        # 4 echo persi su 10 -> 40% di perdita, sopra la soglia di default (20%)
+        replies = iter([0.01, None, 0.01, None, 0.01, None, 0.01, None, 0.01, 0.01])
+        with patch('monitor.ping', side_effect=lambda ip, timeout: next(replies)), \
+                patch.object(monitor, 'send_email_alert') as alert:
+            results = monitor.ping_all()
+        assert results[0]['status'] == 'DEGRADED'
+        assert results[0]['metrics']['loss'] == 40.0
+        assert alert.call_args[0][2] == 'DEGRADED'
+        with patch('monitor.ping', return_value=0.01), patch.object(monitor, 'send_email_alert') as alert:
+            results = monitor.ping_all()
+        assert results[0]['status'] == 'UP'
+        assert results[0]['metrics']['jitter'] == 0.0
+        assert alert.call_args[0][2] == 'UP'
+
+def test_warm_restart_resumes_confirmation():
+    with tempfile.TemporaryDirectory() as d:
+        paths = dict(config_path=os.path.join(d, 'c.json'), status_path=os.path.join(d, 's.json'),
+                     history_path=os.path.join(d, 'h.jsonl'))
+        monitor = Monitor(**paths)
+        monitor.add_connection('Checking', '1.1.1.1')
+        monitor.add_connection('Down', '2.2.2.2')
+        monitor.last_status['1.1.1.1'] = 'CHECKING'
+        monitor._set_attempts('1.1.1.1', 7, next_due=1.0)
+        monitor.last_status['2.2.2.2'] = 'DOWN'
+        monitor.down_times['2.2.2.2'] = datetime.now(monitor.local_tz) - timedelta(minutes=5)
+        monitor.dump_status()
+
+        # nuovo processo: la conferma riprende dall'ottavo tentativo, l'host DOWN viene riprovato subito
+        restarted = Monitor(**paths)
+        restarted.retries = 10
+        restarted.retry_interval = 0
+        assert restarted.hosts.attempts[restarted.hosts.row('1.1.1.1')] == 7
+        probes = []
+        def fake_ping(ip, timeout):
+            probes.append(ip)
+            return None if ip == '1.1.1.1' else 0.01
+        with patch('monitor.ping', side_effect=fake_ping), patch.object(restarted, 'send_email_alert') as alert:
+            restarted.resume_pending()
+            worker = restarted.retry_threads.get('1.1.1.1')
+            if worker:
+                worker.join(5)
+        assert probes.count('1.1.1.1') == 3
+        assert restarted.last_status == {'1.1.1.1': 'DOWN', '2.2.2.2': 'UP'}
+        up = next(c for c in alert.call_args_list if c[0][2] == 'UP')
+        assert 'Tempo di DOWN: 5 minuti' in up[0][3]
+
+def test_save_connections_never_truncates_in_place():
+    with tempfile.TemporaryDirectory() as d:
+        config = os.path.join(d, 'c.json')
+        monitor = Monitor(config_path=config, status_path=os.path.join(d, 's.json'))
+        monitor.add_connection('A', '1.1.1.1')
+        with open(config) as reader:
+            monitor.add_connection('B', '2.2.2.2')
+            # chi aveva aperto il file prima del salvataggio legge ancora l'inventario completo
+            assert [c['ip'] for c in json.load(reader)] == ['1.1.1.1']
+        with open(config) as f:
+            assert [c['ip'] for c in json.load(f)] == ['1.1.1.1', '2.2.2.2']
+
+
+def test_latency_anomaly_email_has_fleet_template():
+    with tempfile.TemporaryDirectory() as d:
+        monitor = Monitor(config_path=os.path.join(d, 'c.json'), status_path=os.path.join(d, 's.json'))
+        event = {'type': 'anomaly', 'outliers': 21, 'top_hosts': [{'ip': '10.0.0.1', 'rtt_ms': 80.0, 'z': 9.1}],
+                 'groups': [{'group': 'EOLO', 'outliers': 21, 'hosts': 40, 'rtt_baseline_ms': 12.0,
+                             'rtt_now_ms': 55.0, 'median_z': 6.3}]}
+        with patch.object(monitor, '_send_email') as send:
+            monitor._emit_anomaly(event)
+        subject, body = send.call_args[0]
+        assert subject == 'ANOMALIA LATENZA: EOLO (21 linee)'
+        assert 'Latenza anomala su 21 linee' in body and 'Gruppi coinvolti' in body and "L'indirizzo IP" not in body
+        assert '10.0.0.1: 80.0 ms' in body
@@ -0,0 +1,132 @@
+import os
+import json
+import tempfile
+from datetime import datetime
+from unittest.mock import patch
+import mp_status_backup as backup
+from clock import VirtualClock
+from monitor import Monitor
+
+def _write_status(path, last_status):
+    with open(path, 'w') as f:
+        json.dump({'timestamp': 'x', 'last_status': last_status}, f)
+
+def _snapshots(d):
+    return sorted(f for f in os.listdir(d) if backup.parse_snapshot_name(f))
+
+def test_dedup_links_unchanged_status():
+    with tempfile.TemporaryDirectory() as d:
+        status = os.path.join(d, 'status.json')
+        bdir = os.path.join(d, 'backups')
+        _write_status(status, {'1.2.3.4': 'UP'})
+        with patch.object(backup, 'MP_STATUS_FILE', status), patch.object(backup, 'MP_BACKUP_DIR', bdir), \
+                patch.object(backup, 'datetime', wraps=datetime) as dt:
+            dt.now.side_effect = [datetime(2025, 1, 1, 8, 30), datetime(2025, 1, 1, 8, 30)]
+            assert backup.backup_and_prune() == 0
+            dt.now.side_effect = [datetime(2025, 1, 1, 13, 30), datetime(2025, 1, 1, 13, 30)]
+            assert backup.backup_and_prune() == 0
+        files = _snapshots(bdir)
+        assert len(files) == 2
+        a, b = (os.stat(os.path.join(bdir, f)) for f in files)
+        assert a.st_ino == b.st_ino
+        assert backup.load_snapshot(os.path.join(bdir, files[1]))['last_status'] == {'1.2.3.4': 'UP'}
+
+def test_delta_roundtrip():
+    with tempfile.TemporaryDirectory() as d:
+        status = os.path.join(d, 'status.json')
+        bdir = os.path.join(d, 'backups')
+        with patch.object(backup, 'MP_STATUS_FILE', status), patch.object(backup, 'MP_BACKUP_DIR', bdir), \
+                patch.object(backup, 'MP_BACKUP_DELTA', True), \
+                patch.object(backup, 'datetime', wraps=datetime) as dt:
+            _write_status(status, {'1.1.1.1': 'UP', '2.2.2.2': 'UP'})
+            dt.now.side_effect = [datetime(2025, 1, 1, 8, 30), datetime(2025, 1, 1, 8, 30)]
+            backup.backup_and_prune()
+            _write_status(status, {'1.1.1.1': 'DOWN'})
+            dt.now.side_effect = [datetime(2025, 1, 1, 13, 30), datetime(2025, 1, 1, 13, 30)]
+            backup.backup_and_prune()
+        files = _snapshots(bdir)
+        assert files[1] == 'status_20250101_133000.delta-20250101_083000.json.gz'
+        data = backup.load_snapshot(os.path.join(bdir, files[1]))
+        assert data['last_status'] == {'1.1.1.1': 'DOWN'}
+
+def test_prune_uses_name_and_keeps_needed_base():
+    with tempfile.TemporaryDirectory() as d:
+        for name in ['status_20250101_083000.json.gz', 'status_20250102_083000.delta.json.gz',
+                     'status_20250301_083000.delta.json.gz', 'status_20241201_083000.json', 'other.txt']:
+            open(os.path.join(d, name), 'w').close()
+        with patch('os.stat', side_effect=AssertionError('stat non previsto')):
+            removed = backup.prune(d, now=datetime(2025, 3, 15))
+        assert removed == 2
+        assert sorted(os.listdir(d)) == ['other.txt', 'status_20250101_083000.json.gz',
+                                         'status_20250301_083000.delta.json.gz']
+
+def _run_at(when):
+    with patch.object(backup, 'datetime', wraps=datetime) as dt:
+        dt.now.side_effect = [when, when]
+        assert backup.backup_and_prune() == 0
+
+def test_prune_keeps_base_recorded_in_delta_after_dedup_link():
+    for legacy_state in (False, True):
+        with tempfile.TemporaryDirectory() as d:
+            status = os.path.join(d, 'status.json')
+            bdir = os.path.join(d, 'backups')
+            with patch.object(backup, 'MP_STATUS_FILE', status), patch.object(backup, 'MP_BACKUP_DIR', bdir), \
+                    patch.object(backup, 'MP_BACKUP_DELTA', True):
+                _write_status(status, {'1.1.1.1': 'UP'})
+                _run_at(datetime(2025, 1, 1, 8, 0))             # completo A
+                _run_at(datetime(2025, 1, 20, 8, 0))            # invariato: hard link A'
+                if legacy_state:
+                    # stato scritto prima della correzione: la base resta A
+                    state = backup._read_state(bdir)
+                    state['base'] = 'status_20250101_080000.json.gz'
+                    backup.atomic_write(os.path.join(bdir, backup.STATE_FILE), state)
+                _write_status(status, {'1.1.1.1': 'DOWN'})
+                _run_at(datetime(2025, 2, 5, 8, 0))             # delta
+            base = 'status_20250101_080000.json.gz' if legacy_state else 'status_20250120_080000.json.gz'
+            delta = os.path.join(bdir, f'status_20250205_080000.delta-{base[7:22]}.json.gz')
+            assert json.loads(backup.read_snapshot_bytes(delta))['base'] == base
+            backup.prune(bdir, now=datetime(2025, 2, 25))
+            assert _snapshots(bdir) == [base, os.path.basename(delta)]
+            assert backup.load_snapshot(delta)['last_status'] == {'1.1.1.1': 'DOWN'}
+
+def test_dedup_ignores_fields_rewritten_by_every_dump():
+    with tempfile.TemporaryDirectory() as d:
+        status = os.path.join(d, 'status.json')
+        bdir = os.path.join(d, 'backups')
+        clock = VirtualClock(1_700_000_000)
+        monitor = Monitor(config_path=os.path.join(d, 'c.json'), status_path=status,
+                          history_path=os.path.join(d, 'h.jsonl'), db_path='', clock=clock)
+        monitor.add_connection('Router', '1.2.3.4')
+        with patch.object(backup, 'MP_STATUS_FILE', status), patch.object(backup, 'MP_BACKUP_DIR', bdir):
+            with patch('monitor.ping', return_value=0.01):
+                monitor.ping_all()
+            monitor.dump_status()
+            _run_at(datetime(2025, 1, 1, 8, 0))
+            clock.run_until(1_700_000_600)
+            with patch('monitor.ping', return_value=0.02):
+                monitor.ping_all()
+            monitor.dump_status()
+            _run_at(datetime(2025, 1, 1, 9, 0))
+        a, b = (os.stat(os.path.join(bdir, f)) for f in _snapshots(bdir))
+        assert a.st_ino == b.st_ino
+
+def test_prune_reads_no_snapshot_and_keeps_state_files():
+    with tempfile.TemporaryDirectory() as d:
+        for name in ['status_20250101_083000.json.gz', 'status_20250110_083000.json.gz',
+                     'status_20250301_083000.delta-20250101_083000.json.gz']:
+            open(os.path.join(d, name), 'w').close()
+        with patch.object(backup, 'read_snapshot_bytes', side_effect=AssertionError('lettura non prevista')):
+            assert backup.prune(d, now=datetime(2025, 3, 15)) == 1
+        assert _snapshots(d) == ['status_20250101_083000.json.gz', 'status_20250301_083000.delta-20250101_083000.json.gz']
+
+def test_skip_mode_never_prunes_the_last_snapshot():
+    with tempfile.TemporaryDirectory() as d:
+        status = os.path.join(d, 'status.json')
+        bdir = os.path.join(d, 'backups')
+        _write_status(status, {'1.2.3.4': 'UP'})
+        with patch.object(backup, 'MP_STATUS_FILE', status), patch.object(backup, 'MP_BACKUP_DIR', bdir), \
+                patch.object(backup, 'MP_BACKUP_DEDUP', 'skip'):
+            _run_at(datetime(2025, 1, 1, 8, 0))
+            _run_at(datetime(2025, 3, 1, 8, 0))     # invariato: saltato, l'unico snapshot è fuori retention
+        assert _snapshots(bdir) == ['status_20250101_080000.json.gz']
+
@@ -0,0 +1,54 @@
+from pacer import Pacer, subnet_key
+from probes import IcmpProber
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+def test_global_budget_paces_burst():
+    clock = FakeClock()
+    pacer = Pacer(pps=100, burst=10, subnet_pps=0, group_pps=0, clock=clock, sleep=clock.sleep)
+    prober = IcmpProber(lambda host, timeout: 0.01, workers=1, pacer=pacer)
+    prober.probe_many([(f'h{i}', f'10.0.{i}.1', None) for i in range(20)], count=2)
+    # 40 echo: i primi 10 dal bucket, gli altri 30 distanziati di 10 ms
+    assert abs(clock.now - 0.3) < 1e-6
+    stats = pacer.stats()
+    assert (stats['sent'], stats['throttled'], stats['limited_by']['global']) == (40, 30, 30)
+
+def test_subnet_and_group_sub_limits():
+    clock = FakeClock()
+    pacer = Pacer(pps=0, burst=1, subnet_pps=10, group_pps=0, clock=clock, sleep=clock.sleep)
+    for _ in range(3):
+        pacer.acquire('192.0.2.10')
+    assert abs(clock.now - 0.2) < 1e-6
+    assert pacer.acquire('198.51.100.1') == 0.0     # altra /24: nessuna attesa
+    assert subnet_key('192.0.2.77') == '192.0.2.0/24'
+    assert subnet_key('router.example') is None
+
+    pacer = Pacer(pps=0, burst=1, subnet_pps=0, group_pps=10, clock=clock, sleep=clock.sleep)
+    pacer.groups = {'1.1.1.1': 'EOLO', '2.2.2.2': 'EOLO'}
+    pacer.acquire('1.1.1.1')
+    assert pacer.acquire('2.2.2.2') > 0
+    assert pacer.acquire('3.3.3.3') == 0.0
+
+def test_group_limit_follows_connection_key_of_resolved_hosts():
+    clock = FakeClock()
+    pacer = Pacer(pps=0, burst=1, subnet_pps=0, group_pps=10, clock=clock, sleep=clock.sleep)
+    pacer.groups = {'a.eolo.example': 'EOLO', 'b.eolo.example': 'EOLO'}
+    prober = IcmpProber(lambda host, timeout: 0.01, workers=1, pacer=pacer)
+    prober.probe_many([('a.eolo.example', '192.0.2.1', None), ('b.eolo.example', '198.51.100.1', None)])
+    assert pacer.stats()['limited_by']['group'] == 1
+
+def test_subnet_and_group_limits_together():
+    clock = FakeClock()
+    pacer = Pacer(pps=0, burst=1, subnet_pps=1000, group_pps=1, clock=clock, sleep=clock.sleep)
+    pacer.groups = {'a.eolo.example': 'EOLO', 'b.eolo.example': 'EOLO'}
+    pacer.acquire('192.0.2.1', 'a.eolo.example')
+    assert pacer.acquire('198.51.100.1', 'b.eolo.example') > 0
+    assert pacer.stats()['limited_by']['group'] == 1
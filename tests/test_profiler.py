@@ -0,0 +1,28 @@
+import os
+import time
+import tempfile
+import tracemalloc
+from unittest.mock import patch
+from monitor import Monitor
+from profiler import Profiler
+
+def test_profiler_reports_monitor_cycle():
+    with tempfile.TemporaryDirectory() as d:
+        monitor = Monitor(config_path=os.path.join(d, 'c.json'), status_path=os.path.join(d, 's.json'),
+                          history_path=os.path.join(d, 'h.jsonl'))
+        monitor.shm_path = os.path.join(d, 'shm')
+        monitor.add_connection('Test', '1.2.3.4')
+        profiler = Profiler(os.path.join(d, 'profile'), interval=1)
+        assert profiler.start()
+        with patch('monitor.ping', side_effect=lambda *a, **k: time.sleep(0.02) or 0.01):
+            for _ in range(5):
+                monitor.ping_all()
+                monitor.dump_status()
+        paths = profiler.stop()
+        assert not profiler.active and not tracemalloc.is_tracing()
+        assert all(os.path.getsize(p) for p in paths)
+        summary = open(paths[-1]).read()
+        assert 'ping_all' in summary and 'dump_status' in summary
+        assert '.collapsed' in paths[1]
+        # nessun report se la profilazione non è attiva
+        assert profiler.stop() == []
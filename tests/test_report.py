@@ -0,0 +1,50 @@
+import os
+import tempfile
+from history import TransitionLog
+from report import build_report, format_rows
+
+def _records():
+    # host A: UP da 0, DOWN 100-130, UP 130, DOWN 900-1000 (oltre la finestra)
+    # host B: UP da 0 senza outage
+    return [
+        {'ts': 0, 'ip': 'A', 'to': 'UP'},
+        {'ts': 0, 'ip': 'B', 'to': 'UP'},
+        {'ts': 90, 'ip': 'A', 'to': 'CHECKING'},
+        {'ts': 100, 'ip': 'A', 'to': 'DOWN'},
+        {'ts': 130, 'ip': 'A', 'to': 'UP'},
+        {'ts': 900, 'ip': 'A', 'to': 'DOWN'},
+        {'ts': 1000, 'ip': 'A', 'to': 'UP'},
+    ]
+
+def test_host_report():
+    rows = {r['key']: r for r in build_report(_records(), 0, 1000)}
+    a = rows['A']
+    assert a['outages'] == 2
+    assert a['downtime_s'] == 130.0
+    assert a['uptime_s'] == 870.0
+    assert a['longest_outage_s'] == 100.0
+    assert a['mttr_s'] == 65.0
+    assert a['availability'] == 87.0
+    b = rows['B']
+    assert b['availability'] == 100.0
+    assert b['outages'] == 0
+    assert b['mttr_s'] is None
+
+def test_window_clipping_and_groups():
+    # finestra 110-950: outage A ritagliate a 20s + 50s
+    rows = build_report(_records(), 110, 950, host_groups={'A': 'EOLO', 'B': 'EOLO'}, by='group')
+    assert len(rows) == 1
+    g = rows[0]
+    assert g['key'] == 'EOLO'
+    assert g['outages'] == 2
+    assert g['downtime_s'] == 70.0
+    assert g['longest_outage_s'] == 50.0
+    assert 'availability' in format_rows(rows, 'csv').splitlines()[0]
+
+def test_transition_log_roundtrip():
+    with tempfile.TemporaryDirectory() as d:
+        log = TransitionLog(os.path.join(d, 'history.jsonl'))
+        log.append('1.2.3.4', 'Test', None, 'UP', ts=10)
+        log.append('1.2.3.4', 'Test', 'UP', 'CHECKING', ts=20)
+        recs = list(log.iter_records(since=15))
+        assert [r['to'] for r in recs] == ['CHECKING']
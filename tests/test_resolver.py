@@ -0,0 +1,132 @@
+import os
+import socket
+import tempfile
+import threading
+import pytest
+from unittest.mock import patch
+from monitor import Monitor
+from resolver import ResolverCache, normalize_target
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def test_normalize_target():
+    assert normalize_target('2001:DB8::0:1') == '2001:db8::1'
+    assert normalize_target('Router.Example.COM.') == 'router.example.com'
+    for bad in ('1.2.3', 'bad_host', '-x.example', ''):
+        with pytest.raises(ValueError):
+            normalize_target(bad)
+
+def test_cache_ttl_negative_and_coalescing():
+    clock = FakeClock()
+    calls = []
+    gate = threading.Event()
+
+    def resolve(name):
+        calls.append(name)
+        gate.wait(5)
+        if name == 'missing.example':
+            raise socket.gaierror('NXDOMAIN')
+        return '192.0.2.1', 100
+
+    cache = ResolverCache(resolve=resolve, workers=4, clock=clock)
+    # due richieste concorrenti per lo stesso nome: una sola risoluzione
+    assert cache.lookup('host.example') is None and cache.lookup('host.example') is None
+    gate.set()
+    assert cache.resolve_many(['host.example', 'missing.example'], timeout=5) == {
+        'host.example': ('192.0.2.1', None), 'missing.example': (None, 'NXDOMAIN')}
+    assert calls.count('host.example') == 1
+    # risposta negativa in cache: nessuna nuova richiesta finché non scade
+    assert cache.resolve_many(['missing.example'])['missing.example'][0] is None
+    assert calls.count('missing.example') == 1
+    # rinnovo anticipato all'80% del TTL: intanto si usa l'indirizzo in cache
+    clock.now += 85
+    assert cache.lookup('host.example') == ('192.0.2.1', None)
+    cache._pool.shutdown(wait=True)
+    assert calls.count('host.example') == 2
+
+def test_unresolved_state_is_separate_from_down():
+    with tempfile.TemporaryDirectory() as d:
+        monitor = Monitor(config_path=os.path.join(d, 'c.json'), status_path=os.path.join(d, 's.json'),
+                          history_path=os.path.join(d, 'h.jsonl'))
+        monitor.resolver = ResolverCache(resolve=lambda name: (_ for _ in ()).throw(socket.gaierror('NXDOMAIN')))
+        monitor.add_connection('Router', 'Router.Example.com')
+        with patch('monitor.ping', return_value=0.01), patch.object(monitor, 'send_email_alert') as alert, \
+                patch.object(Monitor, 'schedule_confirm_down') as confirm:
+            results = monitor.ping_all()
+        assert results[0]['status'] == 'UNRESOLVED' and results[0]['ip'] == 'router.example.com'
+        assert alert.call_args[0][2] == 'UNRESOLVED'
+        assert not confirm.called
+
+        monitor.resolver = ResolverCache(resolve=lambda name: ('192.0.2.1', 60))
+        with patch('monitor.ping', return_value=0.01) as ping, patch.object(monitor, 'send_email_alert'):
+            assert monitor.ping_all()[0]['status'] == 'UP'
+        assert ping.call_args[0][0] == '192.0.2.1'
+
+def test_slow_dns_is_not_unresolved_and_confirmation_stops_on_resolution_failure():
+    from clock import VirtualClock
+    start = 1_700_000_000
+    with tempfile.TemporaryDirectory() as d:
+        monitor = Monitor(config_path=os.path.join(d, 'c.json'), status_path=os.path.join(d, 's.json'),
+                          history_path=os.path.join(d, 'h.jsonl'), db_path='', clock=VirtualClock(start))
+        monitor.probe_timeout = 0.05
+        gate = threading.Event()
+        answers = {'value': ('192.0.2.1', 60)}
+
+        def resolve(name):
+            gate.wait(5)
+            if answers['value'] is None:
+                raise socket.gaierror('NXDOMAIN')
+            return answers['value']
+
+        monitor.resolver = ResolverCache(resolve=resolve, clock=lambda: monitor.clock.time())
+        monitor.add_connection('Router', 'router.example.com')
+        with patch('monitor.ping', return_value=None), patch.object(monitor, 'send_email_alert') as alert:
+            # prima risoluzione più lenta del budget di attesa: host non sondato, nessuno stato né email
+            assert monitor.ping_all() == []
+            assert alert.call_count == 0 and monitor.last_status.get('router.example.com', 'UNKNOWN') == 'UNKNOWN'
+            gate.set()
+            monitor.resolver.resolve_many(['router.example.com'], timeout=5)
+            assert monitor.ping_all()[0]['status'] == 'CHECKING'
+
+            # il nome smette di risolversi durante la conferma: UNRESOLVED, mai DOWN
+            answers['value'] = None
+            monitor.resolver._entries.clear()
+            monitor.clock.run_until(start + monitor.retry_interval * monitor.retries + 1)
+        assert monitor.last_status['router.example.com'] == 'UNRESOLVED'
+        assert [c.args[2] for c in alert.call_args_list] == ['UNRESOLVED']
+        assert 'router.example.com' not in monitor.retry_threads
+
+def test_confirmation_stops_when_resolution_never_completes():
+    from clock import VirtualClock
+    start = 1_700_000_000
+    with tempfile.TemporaryDirectory() as d:
+        monitor = Monitor(config_path=os.path.join(d, 'c.json'), status_path=os.path.join(d, 's.json'),
+                          history_path=os.path.join(d, 'h.jsonl'), db_path='', clock=VirtualClock(start))
+        monitor.probe_timeout = 0.05
+        stuck = threading.Event()
+        release = threading.Event()
+
+        def resolve(name):
+            if stuck.is_set():
+                release.wait(5)
+            return ('192.0.2.1', 60)
+
+        monitor.resolver = ResolverCache(resolve=resolve, clock=lambda: monitor.clock.time())
+        monitor.add_connection('Router', 'router.example.com')
+        try:
+            with patch('monitor.ping', return_value=None), patch.object(monitor, 'send_email_alert') as alert:
+                assert monitor.ping_all()[0]['status'] == 'CHECKING'
+                # da qui la risoluzione resta sempre in corso: la conferma non deve ripetersi all'infinito
+                stuck.set()
+                monitor.resolver._entries.clear()
+                monitor.clock.run_until(start + monitor.retry_interval * (monitor.retries + 1))
+            assert monitor.last_status['router.example.com'] == 'UNRESOLVED'
+            assert 'router.example.com' not in monitor.retry_threads
+            assert all(call.args[2] != 'DOWN' for call in alert.call_args_list)
+        finally:
+            release.set()
@@ -0,0 +1,52 @@
+import os
+import math
+import tempfile
+import numpy as np
+from unittest.mock import patch
+from clock import VirtualClock
+from hosttable import HostTable
+from monitor import Monitor
+from rto import AdaptiveTimeout
+
+
+def test_estimator_clamp_and_retry():
+    table = HostTable()
+    a, b = table.add('10.0.0.1'), table.add('10.0.0.2')
+    rto = AdaptiveTimeout(2.0, minimum=0.2, factor=3, enabled=True)
+    assert rto.timeout(table, a) == 2.0                 # nessuna misura: timeout fisso
+    rto.observe(table, a, 0.010)
+    assert math.isclose(table.srtt[a], 10.0) and math.isclose(table.rttvar[a], 5.0)
+    assert rto.timeout(table, a) == 0.2                 # 3 * 30 ms sotto il minimo
+    rto.observe(table, b, 0.600)
+    assert rto.timeout(table, b) == 2.0                 # satellite: limitato al timeout fisso
+    assert rto.retry(0.2) == 0.4 and rto.retry(1.5) == 2.0 and rto.retry(2.0) is None
+
+    # la versione vettoriale coincide con quella per riga
+    other = HostTable()
+    rows = np.array([other.add('10.0.0.1'), other.add('10.0.0.2')])
+    rto.observe_many(other, rows, [0.010, 0.600])
+    for _ in range(20):
+        rto.observe(table, a, 0.100)
+        rto.observe_many(other, rows[:1], [0.100])
+    assert math.isclose(other.srtt[0], table.srtt[a], rel_tol=1e-5)
+    assert np.allclose(rto.timeouts(other, rows), [rto.timeout(table, a), rto.timeout(table, b)])
+    rto.enabled = False
+    assert rto.timeout(table, a) == 2.0 and list(rto.timeouts(other, rows)) == [2.0, 2.0]
+
+
+def test_early_timeout_is_retried_before_checking():
+    with tempfile.TemporaryDirectory() as d, patch.dict(os.environ, {'MP_ADAPTIVE_TIMEOUT': '1'}):
+        monitor = Monitor(config_path=os.path.join(d, 'c.json'), status_path=os.path.join(d, 's.json'),
+                          history_path=os.path.join(d, 'h.jsonl'), db_path='', clock=VirtualClock(1_700_000_000))
+        monitor.add_connection('LAN', '10.0.0.1')
+        with patch('monitor.ping', return_value=0.005) as ping:
+            for _ in range(3):
+                monitor.ping_all()
+            assert ping.call_args.kwargs['timeout'] == 0.2
+            # echo perso con il timeout adattivo, risposta alla ripetizione (timeout raddoppiato)
+            ping.side_effect = [None, 0.3]
+            ping.reset_mock()
+            results = {r['ip']: r['status'] for r in monitor.ping_all()}
+            assert results == {'10.0.0.1': 'UP'}
+            assert ping.call_args.kwargs['timeout'] == 0.4
+            assert (monitor.timeouts.retried, monitor.timeouts.recovered) == (1, 1)
@@ -0,0 +1,63 @@
+import os
+import tempfile
+import pytest
+from unittest.mock import patch
+from monitor import Monitor
+from scheduler import wfq_order, load_tier_config, parse_tier, DetectStats
+
+def test_wfq_order_serves_every_tier():
+    conns = ([{'ip': f'n{i}'} for i in range(20)] + [{'ip': f'l{i}', 'tier': 'low'} for i in range(5)]
+             + [{'ip': f'c{i}', 'tier': 'critical'} for i in range(10)])
+    order = [c['ip'] for c in wfq_order(conns, load_tier_config())]
+    # critical in testa, ma normal e low ricevono la loro quota già nella prima parte del ciclo
+    assert order[0] == 'c0'
+    assert order[:4] == ['c0', 'c1', 'c2', 'c3'] and 'n0' in order[:5] and 'l0' in order[:12]
+    assert [ip for ip in order if ip.startswith('n')] == [f'n{i}' for i in range(20)]
+    assert parse_tier(0) == 'critical' and parse_tier('HIGH') == 'high'
+    with pytest.raises(ValueError):
+        parse_tier('gold')
+
+def test_ping_due_uses_tier_intervals():
+    with tempfile.TemporaryDirectory() as d:
+        monitor = Monitor(config_path=os.path.join(d, 'c.json'), status_path=os.path.join(d, 's.json'),
+                          history_path=os.path.join(d, 'h.jsonl'), interval=100)
+        monitor.add_connection('Premium', '1.1.1.1', tier='critical')
+        monitor.add_connection('Base', '2.2.2.2')
+        with patch('monitor.ping', return_value=0.01):
+            assert len(monitor.ping_due()) == 2
+            assert monitor.ping_due() == []
+            later = monitor.ping_due(now=monitor.hosts.next_check[0] + 1)
+        assert [r['ip'] for r in later] == ['1.1.1.1']
+        with patch('monitor.ping', return_value=None), patch.object(Monitor, 'schedule_confirm_down'):
+            monitor.ping_all()
+        summary = monitor.detect_stats.summary()
+        assert set(summary) == {'critical', 'normal'} and summary['critical']['detect']['count'] == 1
+
+def test_detect_stats_summary():
+    stats = DetectStats()
+    for v in range(1, 101):
+        stats.record('critical', 'detect', float(v))
+    assert stats.summary()['critical']['detect'] == {'count': 100, 'avg': 50.5, 'p95': 96.0, 'max': 100.0}
+
+def test_priority_host_is_not_queued_behind_another_probe_kind():
+    import socket, time
+    server = socket.socket()
+    server.bind(('127.0.0.1', 0))
+    server.listen()
+    port = server.getsockname()[1]
+
+    def slow_ping(*args, **kwargs):
+        time.sleep(0.05)
+        return 0.01
+
+    with tempfile.TemporaryDirectory() as d:
+        monitor = Monitor(config_path=os.path.join(d, 'c.json'), status_path=os.path.join(d, 's.json'),
+                          history_path=os.path.join(d, 'h.jsonl'))
+        monitor.add_connections([monitor.new_connection(f'n{i}', f'10.0.0.{i}') for i in range(1, 61)])
+        monitor.add_connection('Router', '10.0.1.1', tier='high')
+        monitor.add_connection('Gateway', '127.0.0.1', probe=f'tcp:{port}', tier='high')
+        with patch('monitor.ping', side_effect=slow_ping):
+            order = [r['ip'] for r in monitor.iter_results()]
+    server.close()
+    # l'host high (tcp) non attende che siano sondati tutti gli host icmp
+    assert len(order) == 62 and order.index('127.0.0.1') < 20
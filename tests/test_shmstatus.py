@@ -0,0 +1,30 @@
+import os
+import struct
+import tempfile
+import pytest
+from hosttable import HostTable
+from shmstatus import ShmStatusWriter, read_live_status, SEQ_OFFSET
+
+def test_publish_and_read_consistent_view():
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, 'mp_ping')
+        table = HostTable([f'10.0.0.{i}' for i in range(5)])
+        table.set_state('10.0.0.1', 'DOWN')
+        table.set_metrics('10.0.0.2', {'loss': 20.0, 'rtt_avg': 12.5, 'jitter': 1.5})
+        writer = ShmStatusWriter(path, capacity=2)
+        writer.publish(table)      # capacità superata: il segmento viene ricreato
+        _, hosts = read_live_status(path)
+        assert [h['ip'] for h in hosts] == [f'10.0.0.{i}' for i in range(5)]
+        assert hosts[1]['status'] == 'DOWN'
+        assert hosts[2]['rtt'] == 12.5 and hosts[2]['loss'] == 20.0
+        assert hosts[0]['rtt'] is None
+
+        table.set_state('10.0.0.1', 'UP')
+        writer.update_row(table, table.row('10.0.0.1'))
+        assert read_live_status(path)[1][1]['status'] == 'UP'
+
+        # scrittura in corso (seq dispari): il lettore non restituisce una vista parziale
+        struct.pack_into('<Q', writer.mm, SEQ_OFFSET, writer.seq + 1)
+        with pytest.raises(RuntimeError):
+            read_live_status(path, retries=3)
+        writer.close()
@@ -0,0 +1,80 @@
+import os
+import tempfile
+from unittest.mock import patch
+from clock import VirtualClock
+from monitor import Monitor
+from simulate import Scenario, Simulation
+
+def test_confirmation_runs_in_virtual_time():
+    clock = VirtualClock(start=1_700_000_000)
+    with tempfile.TemporaryDirectory() as d:
+        monitor = Monitor(config_path=os.path.join(d, 'c.json'), status_path=os.path.join(d, 's.json'),
+                          history_path=os.path.join(d, 'h.jsonl'), db_path='', clock=clock)
+        monitor.retries, monitor.retry_interval = 10, 30
+        monitor.add_connection('Router', '1.2.3.4')
+        with patch('monitor.ping', return_value=None), patch.object(monitor, 'send_email_alert') as alert:
+            monitor.ping_all()
+            assert monitor.last_status['1.2.3.4'] == 'CHECKING'
+            clock.run_until(1_700_000_000 + 299)
+            assert monitor.last_status['1.2.3.4'] == 'CHECKING'
+            clock.run_until(1_700_000_000 + 300)
+        assert monitor.last_status['1.2.3.4'] == 'DOWN'
+        assert alert.call_args[0][2] == 'DOWN'
+        assert monitor.down_times['1.2.3.4'].timestamp() == 1_700_000_300
+        assert '1.2.3.4' not in monitor.retry_threads
+
+def test_replay_history_reports_alerts_and_latency():
+    start = 1_700_000_000
+    conns = [{'name': 'A', 'ip': '10.0.0.1', 'enabled': True}, {'name': 'B', 'ip': '10.0.0.2', 'enabled': True}]
+    records = [{'ts': start, 'ip': '10.0.0.1', 'from': None, 'to': 'UP'},
+               {'ts': start + 1000, 'ip': '10.0.0.1', 'from': 'UP', 'to': 'CHECKING'},
+               {'ts': start + 4000, 'ip': '10.0.0.1', 'from': 'DOWN', 'to': 'UP'},
+               {'ts': start + 5000, 'ip': '10.0.0.2', 'from': 'UP', 'to': 'CHECKING'},
+               {'ts': start + 5060, 'ip': '10.0.0.2', 'from': 'CHECKING', 'to': 'UP'}]
+    scenario = Scenario.from_history(conns, records, until=start + 86400)
+    assert scenario.outages == {'10.0.0.1': [(start + 1000, start + 4000)], '10.0.0.2': [(start + 5000, start + 5060)]}
+    sim = Simulation(scenario, interval=900, retries=10, retry_interval=30)
+    try:
+        result = sim.run()
+    finally:
+        sim.close()
+    # solo il disservizio lungo produce DOWN e UP; quello di un minuto non viene confermato
+    assert [(a['ip'], a['status']) for a in sim.alerts] == [('10.0.0.1', 'DOWN'), ('10.0.0.1', 'UP')]
+    assert result['latency']['normal']['confirm']['count'] == 1
+    assert result['missed'] == [] and result['false_down'] == []
+    assert result['resources']['cycles'] > 90
+
+def test_confirmation_storm_does_not_force_a_status_write_per_host():
+    clock = VirtualClock(start=1_700_000_000)
+    with tempfile.TemporaryDirectory() as d:
+        monitor = Monitor(config_path=os.path.join(d, 'c.json'), status_path=os.path.join(d, 's.json'),
+                          history_path=os.path.join(d, 'h.jsonl'), db_path='', clock=clock)
+        monitor.retries, monitor.retry_interval = 3, 30
+        monitor.add_connections([{'name': f'H{i}', 'ip': f'10.0.0.{i}', 'enabled': True} for i in range(1, 101)])
+        with patch('monitor.ping', return_value=None), patch.object(monitor, 'send_email_alert'), \
+                patch.object(monitor, 'dump_status') as dump:
+            monitor.ping_all()
+            clock.run_until(1_700_000_000 + 200)
+        assert set(monitor.last_status.values()) == {'DOWN'}
+        # al massimo un checkpoint ogni checkpoint_interval, non uno per conferma terminata
+        assert dump.call_count <= 200 // monitor.checkpoint_interval + 1
+        assert monitor._dirty
+
+def test_concurrent_checkpoints_write_once():
+    import threading
+    with tempfile.TemporaryDirectory() as d:
+        monitor = Monitor(config_path=os.path.join(d, 'c.json'), status_path=os.path.join(d, 's.json'),
+                          history_path=os.path.join(d, 'h.jsonl'), db_path='', clock=VirtualClock(1_700_000_000))
+        barrier = threading.Barrier(8)
+
+        def checkpoint():
+            barrier.wait()
+            monitor._checkpoint()
+
+        with patch.object(monitor, 'dump_status') as dump:
+            threads = [threading.Thread(target=checkpoint) for _ in range(8)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        assert dump.call_count == 1 and monitor._dirty
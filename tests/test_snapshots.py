@@ -0,0 +1,76 @@
+import os
+import gzip
+import json
+import time
+import tempfile
+from datetime import datetime, timezone
+from history import TransitionLog
+from snapshots import SnapshotIndex, status_at, _lookup
+
+def _epoch(s):
+    return time.mktime(datetime.strptime(s, '%Y%m%d_%H%M%S').timetuple())
+
+def test_lazy_lookup_stops_at_requested_ips():
+    doc = {'timestamp': 'x', 'hosts': {'a': {'nested': [1, {'b': '}'}]}},
+           'last_status': {'1.1.1.1': 'UP', '2.2.2.2': 'DOWN', '3.3.3.3': None}}
+    text = json.dumps(doc, indent=2)
+    assert _lookup(text, 'last_status', ['2.2.2.2']) == {'2.2.2.2': 'DOWN'}
+    assert _lookup(text, 'last_status') == doc['last_status']
+
+def test_status_at_combines_snapshot_and_history():
+    with tempfile.TemporaryDirectory() as d:
+        bdir = os.path.join(d, 'backups')
+        os.makedirs(bdir)
+        full = {'last_status': {'1.1.1.1': 'UP', '2.2.2.2': 'UP'}}
+        with open(os.path.join(bdir, 'status_20250101_083000.json.gz'), 'wb') as f:
+            f.write(gzip.compress(json.dumps(full).encode()))
+        delta = {'base': 'status_20250101_083000.json.gz',
+                 'delta': {'set': {'last_status': {'2.2.2.2': 'DOWN'}}}}
+        with open(os.path.join(bdir, 'status_20250101_133000.delta.json'), 'w') as f:
+            json.dump(delta, f)
+
+        log = TransitionLog(os.path.join(d, 'history.jsonl'))
+        log.append('1.1.1.1', 'A', 'UP', 'CHECKING', ts=_epoch('20250101_140000'))
+        log.append('1.1.1.1', 'A', 'CHECKING', 'DOWN', ts=_epoch('20250101_140500'))
+
+        index = SnapshotIndex(bdir)
+        assert len(index) == 2
+        assert index.find(_epoch('20250101_080000')) is None
+
+        snap, states = status_at(_epoch('20250101_120000'), index, log)
+        assert snap[1] == 'status_20250101_083000.json.gz'
+        assert states == {'1.1.1.1': 'UP', '2.2.2.2': 'UP'}
+
+        snap, states = status_at(_epoch('20250101_140200'), index, log, ips=['1.1.1.1', '2.2.2.2'])
+        assert snap[1] == 'status_20250101_133000.delta.json'
+        assert states == {'1.1.1.1': 'CHECKING', '2.2.2.2': 'DOWN'}
+
+def test_status_at_replays_history_from_snapshot_timestamp():
+    with tempfile.TemporaryDirectory() as d:
+        bdir = os.path.join(d, 'backups')
+        os.makedirs(bdir)
+        # stato scritto alle 08:20, copiato dal backup alle 08:30
+        written = datetime.fromtimestamp(_epoch('20250101_082000'), timezone.utc).replace(tzinfo=None)
+        full = {'timestamp': written.isoformat() + 'Z', 'last_status': {'1.1.1.1': 'UP'}}
+        with open(os.path.join(bdir, 'status_20250101_083000.json.gz'), 'wb') as f:
+            f.write(gzip.compress(json.dumps(full).encode()))
+        delta = {'base': 'status_20250101_083000.json.gz', 'delta': {'set': {}}}
+        with open(os.path.join(bdir, 'status_20250101_093000.delta.json'), 'w') as f:
+            json.dump(delta, f)
+        log = TransitionLog(os.path.join(d, 'history.jsonl'))
+        log.append('1.1.1.1', 'A', 'UP', 'CHECKING', ts=_epoch('20250101_082500'))
+
+        index = SnapshotIndex(bdir)
+        assert index.read_timestamp('status_20250101_093000.delta.json') == _epoch('20250101_082000')
+        for at in ('20250101_090000', '20250101_093500'):
+            snap, states = status_at(_epoch(at), index, log)
+            assert states == {'1.1.1.1': 'CHECKING'}
+
+def test_history_seek():
+    with tempfile.TemporaryDirectory() as d:
+        log = TransitionLog(os.path.join(d, 'history.jsonl'))
+        for t in range(100):
+            log.append(f'10.0.0.{t}', None, 'UP', 'DOWN', ts=t)
+        assert [r['ts'] for r in log.iter_records(since=42.5, until=45)] == [43, 44, 45]
+        assert [r['ts'] for r in log.iter_records(since=0, until=1)] == [0, 1]
+        assert list(log.iter_records(since=1000)) == []
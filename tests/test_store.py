@@ -0,0 +1,61 @@
+import os
+import json
+import sqlite3
+import tempfile
+from unittest.mock import patch
+from monitor import Monitor
+from store import SqliteStore
+
+def test_store_row_level_updates_and_queries():
+    with tempfile.TemporaryDirectory() as d:
+        store = SqliteStore(os.path.join(d, 'mp.db'))
+        added = store.add_connections([
+            {'name': 'EOLO - A', 'ip': '1.1.1.1', 'enabled': True, 'probe': 'tcp:443'},
+            {'name': 'TIM - B', 'ip': '2.2.2.2', 'enabled': True},
+            {'name': 'dup', 'ip': '1.1.1.1', 'enabled': True},
+        ])
+        assert len(added) == 2
+        store.update_connection('2.2.2.2', enabled=False)
+        store.set_state('1.1.1.1', 'DOWN')
+        conns = store.list_connections()
+        assert conns[0] == {'name': 'EOLO - A', 'ip': '1.1.1.1', 'enabled': True, 'probe': 'tcp:443'}
+        assert conns[1]['enabled'] is False
+        assert [c['ip'] for c in store.find_connections(status='DOWN')] == ['1.1.1.1']
+        assert [c['ip'] for c in store.find_connections(name='tim')] == ['2.2.2.2']
+        assert [c['ip'] for c in store.find_connections(keyword='eolo')] == ['1.1.1.1']
+        assert [c['ip'] for c in store.find_connections(keyword='2.2')] == ['2.2.2.2']
+        assert store.find_connections(keyword='_') == []        # nessun jolly LIKE
+        assert store.export_status()['last_status'] == {'1.1.1.1': 'DOWN', '2.2.2.2': None}
+        mode = sqlite3.connect(os.path.join(d, 'mp.db')).execute('PRAGMA journal_mode').fetchone()[0]
+        assert mode == 'wal'
+
+def test_monitor_migrate_and_use_db():
+    with tempfile.TemporaryDirectory() as d:
+        config = os.path.join(d, 'connections.json')
+        status = os.path.join(d, 'status.json')
+        history = os.path.join(d, 'history.jsonl')
+        with open(config, 'w') as f:
+            json.dump([{'name': 'Test', 'ip': '1.2.3.4', 'enabled': True}], f)
+        with open(status, 'w') as f:
+            json.dump({'last_status': {'1.2.3.4': 'UP'}}, f)
+        with open(history, 'w') as f:
+            f.write(json.dumps({'ts': 1, 'ip': '1.2.3.4', 'from': None, 'to': 'UP'}) + '\n')
+
+        monitor = Monitor(config_path=config, status_path=status, history_path=history,
+                          db_path=os.path.join(d, 'mp.db'))
+        assert monitor.migrate_to_db() == (1, 1)
+
+        # un secondo processo (CLI) aggiunge una connessione: il daemon la vede al ricaricamento
+        cli_monitor = Monitor(config_path=config, status_path=status, db_path=os.path.join(d, 'mp.db'))
+        assert cli_monitor.last_status == {'1.2.3.4': 'UP'}
+        cli_monitor.add_connection('Nuova', '5.6.7.8')
+        monitor.reload_connections()
+        assert [c['ip'] for c in monitor.connections] == ['1.2.3.4', '5.6.7.8']
+
+        with patch('monitor.ping', return_value=None), patch.object(Monitor, 'schedule_confirm_down'):
+            monitor.ping_all()
+        records = list(monitor.history.iter_records(since=2))
+        assert {(r['ip'], r['to']) for r in records} == {('1.2.3.4', 'CHECKING'), ('5.6.7.8', 'CHECKING')}
+        monitor.dump_status()
+        with open(status) as f:
+            assert json.load(f)['last_status']['5.6.7.8'] == 'CHECKING'
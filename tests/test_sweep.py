@@ -0,0 +1,35 @@
+import os
+import tempfile
+import pytest
+from monitor import Monitor
+from pacer import Pacer
+from sweep import IcmpSweeper, parse_network, sweep_order, echo_packet, checksum
+
+def test_parse_network_and_order():
+    with pytest.raises(ValueError):
+        parse_network('10.0.0.0/8')
+    with pytest.raises(ValueError):
+        parse_network('2001:db8::/120')
+    order = sweep_order(parse_network('10.20.0.0/22'))
+    assert len(order) == 1022
+    # le /24 si alternano: nessuna raffica verso la stessa sottorete
+    assert order[:4] == ['10.20.1.0', '10.20.2.0', '10.20.3.0', '10.20.0.1']
+    assert checksum(echo_packet(1, 1)) == 0
+
+def test_sweep_loopback_streams_responders():
+    sweeper = IcmpSweeper(pacer=Pacer(pps=1000, burst=10), timeout=0.5)
+    try:
+        found = dict(sweeper.stream(sweep_order(parse_network('127.0.0.0/29'))))
+    except PermissionError:
+        pytest.skip('socket ICMP non permessi in questo ambiente')
+    assert sorted(found) == [f'127.0.0.{i}' for i in range(1, 7)]
+    assert sweeper.stats()['sent'] == 6
+
+def test_add_connections_skips_existing():
+    with tempfile.TemporaryDirectory() as d:
+        monitor = Monitor(config_path=os.path.join(d, 'c.json'), status_path=os.path.join(d, 's.json'),
+                          history_path=os.path.join(d, 'h.jsonl'))
+        monitor.add_connection('Router', '10.0.0.1')
+        added = monitor.add_connections([monitor.new_connection(f'Host {i}', f'10.0.0.{i}') for i in (1, 2, 3)])
+        assert [c['ip'] for c in added] == ['10.0.0.2', '10.0.0.3']
+        assert [c['name'] for c in monitor.load_connections()] == ['Router', 'Host 2', 'Host 3']